@@ -7,7 +7,9 @@ from lib.response import response
 
 
 #应用工厂模式
-def create_app():
+# start_background=True 只用于对外服务的进程（gunicorn入口），启动时即开始回放遗留的暂存数据；
+# 命令行（flask db upgrade 等）与运维脚本使用默认值，不启动任何后台线程
+def create_app(start_background=False):
     # 创建 Flask 应用实例（核心对象）
     app = Flask(__name__)
     # 从配置文件加载应用配置
@@ -57,6 +59,12 @@ def create_app():
     import router
     router.init_app(app)
 
+    # 开启落盘暂存时，服务进程启动即开始回放上次遗留（如worker被回收、容器重启）的暂存数据
+    # 其它情况下在首次接收上报时（submit_samples）按需启动
+    if start_background:
+        from lib.async_tasks import start_spool
+        start_spool(app)
+
     return app
 
 
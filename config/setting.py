@@ -61,6 +61,85 @@ if DEBUG:
 else:
     DEFAULT_API_KEY = os.getenv('DEFAULT_API_KEY', f'key_{secrets.token_urlsafe(16)}')
 
+# Agent上报签名校验配置
+API_SIGN_EXPIRE_SECONDS = int(os.getenv('API_SIGN_EXPIRE_SECONDS', '60'))         # 请求时间戳与服务器时间的最大偏差（秒）
+API_CREDENTIAL_RELOAD_SECONDS = int(os.getenv('API_CREDENTIAL_RELOAD_SECONDS', '30'))  # 凭证缓存定期从数据库刷新的间隔（秒）
+API_NONCE_CACHE_MAX = int(os.getenv('API_NONCE_CACHE_MAX', '200000'))             # 防重放nonce缓存的最大条数（限制内存）
+API_ALLOW_LEGACY_SIGN = os.getenv('API_ALLOW_LEGACY_SIGN', 'false').lower() == 'true'  # 是否接受旧版 sha256 拼接签名（默认拒绝）
+
+# ==================== 监控数据写入配置 ====================
+# 监控数据不再逐条commit，而是先在内存中攒批，满足任一条件即合并为一条多行INSERT写入
+INGEST_FLUSH_SIZE = int(os.getenv('INGEST_FLUSH_SIZE', '500'))                  # 攒够N条立即写入
+INGEST_FLUSH_INTERVAL_MS = int(os.getenv('INGEST_FLUSH_INTERVAL_MS', '1000'))   # 最长等待T毫秒写入一次
+INGEST_BUFFER_MAX = int(os.getenv('INGEST_BUFFER_MAX', '20000'))                # 内存缓冲上限，写库变慢时阻塞生产者
+INGEST_SLOW_FLUSH_MS = int(os.getenv('INGEST_SLOW_FLUSH_MS', '500'))            # 单次写入耗时超过该值记为慢写入
+INGEST_BATCH_MAX_RECORDS = int(os.getenv('INGEST_BATCH_MAX_RECORDS', '5000'))   # 批量上报接口单次最多接收的记录数
+INGEST_MAX_BODY_BYTES = int(os.getenv('INGEST_MAX_BODY_BYTES', str(16 * 1024 * 1024)))  # 上报请求体解压后的最大字节数
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '10'))                         # 后台处理线程数
+INGEST_QUEUE_MAX = int(os.getenv('INGEST_QUEUE_MAX', '10000'))                  # 待处理样本数上限，超过则拒绝上报（背压）
+INGEST_RETRY_AFTER = int(os.getenv('INGEST_RETRY_AFTER', '5'))                  # 拒绝上报时建议客户端的重试间隔（秒）
+INGEST_EXTRA_MAX_KEYS = int(os.getenv('INGEST_EXTRA_MAX_KEYS', '64'))           # 单条样本扩展指标最多的键数
+INGEST_EXTRA_MAX_BYTES = int(os.getenv('INGEST_EXTRA_MAX_BYTES', '8192'))       # 单条样本扩展指标序列化后的最大字节数
+
+# ==================== 落盘暂存配置 ====================
+# 开启后，上报数据先追加写入本地暂存文件（组提交刷盘）再返回"已接收"，由回放线程写库，进程重启不丢数据
+SPOOL_ENABLED = os.getenv('SPOOL_ENABLED', 'False').lower() == 'true'
+SPOOL_DIR = os.getenv('SPOOL_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'spool'))
+SPOOL_SEGMENT_MB = int(os.getenv('SPOOL_SEGMENT_MB', '64'))                     # 单个段文件大小，写满后轮转
+SPOOL_USE_MMAP = os.getenv('SPOOL_USE_MMAP', 'False').lower() == 'true'         # 是否使用内存映射写入段文件
+SPOOL_GROUP_COMMIT_MS = int(os.getenv('SPOOL_GROUP_COMMIT_MS', '2'))            # 组提交等待时间，合并并发写入后一次刷盘
+SPOOL_REPLAY_INTERVAL_MS = int(os.getenv('SPOOL_REPLAY_INTERVAL_MS', '500'))    # 回放线程轮询间隔
+SPOOL_SEAL_SECONDS = int(os.getenv('SPOOL_SEAL_SECONDS', '60'))                 # 当前段写入超过该时间即封存，便于删除已回放的数据
+SPOOL_MAX_BACKLOG_MB = int(os.getenv('SPOOL_MAX_BACKLOG_MB', '1024'))           # 未回放数据超过该值时拒绝上报（背压）
+SPOOL_REPLAY_MAX_ATTEMPTS = int(os.getenv('SPOOL_REPLAY_MAX_ATTEMPTS', '5'))     # 同一批回放连续失败的次数上限，超过后逐条写入并隔离坏样本
+
+# ==================== 监控数据存储后端配置 ====================
+# rdbms：原始数据逐行写入 monitor_data 表（默认）
+# chunks：按 (服务器, 时间块) 压缩为列式数据块保存（见 lib/chunk_store.py），单点只占几个字节，需安装 numpy
+METRICS_BACKEND = os.getenv('METRICS_BACKEND', 'rdbms').lower()
+CHUNK_STORAGE = os.getenv('CHUNK_STORAGE', 'file').lower()                       # 数据块保存位置：file 本地文件 / mysql monitor_chunks 表
+CHUNK_DIR = os.getenv('CHUNK_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'chunks'))
+CHUNK_SECONDS = int(os.getenv('CHUNK_SECONDS', '7200'))                         # 时间块长度（秒）
+
+# ==================== 数据保留配置 ====================
+# monitor_data 按天分区，过期数据整分区删除（见 lib/partition.py、scripts/maintain_partitions.py）
+MONITOR_RETENTION_DAYS = int(os.getenv('MONITOR_RETENTION_DAYS', '7'))          # 原始监控数据保留天数
+PARTITION_DAYS_AHEAD = int(os.getenv('PARTITION_DAYS_AHEAD', '7'))              # 提前创建未来多少天的分区
+# 分级保留策略（scripts/cleanup_data.py），0 表示永久保留
+RETENTION_ROLLUP_1M_DAYS = int(os.getenv('RETENTION_ROLLUP_1M_DAYS', '14'))     # 1分钟汇总保留天数
+RETENTION_ROLLUP_5M_DAYS = int(os.getenv('RETENTION_ROLLUP_5M_DAYS', '90'))     # 5分钟汇总保留天数
+RETENTION_ROLLUP_1H_DAYS = int(os.getenv('RETENTION_ROLLUP_1H_DAYS', '730'))    # 1小时汇总保留天数
+RETENTION_ALERT_HISTORY_DAYS = int(os.getenv('RETENTION_ALERT_HISTORY_DAYS', '180'))  # 告警历史保留天数
+RETENTION_AUDIT_LOG_DAYS = int(os.getenv('RETENTION_AUDIT_LOG_DAYS', '365'))    # 审计日志保留天数
+RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', '5000'))           # 单次删除的最大行数（主键范围）
+RETENTION_SLEEP_MS = int(os.getenv('RETENTION_SLEEP_MS', '100'))                # 每批删除之间的休眠时间，给写入让出资源
+RETENTION_LOCK_WAIT_TIMEOUT = int(os.getenv('RETENTION_LOCK_WAIT_TIMEOUT', '5'))  # 清理会话的行锁等待超时（秒），超时后稍后重试该批
+
+# ==================== 服务器身份缓存配置 ====================
+# 入库与告警链路按IP查询服务器的结果缓存在进程内，服务器/用户/规则变更时主动失效
+SERVER_CACHE_TTL = int(os.getenv('SERVER_CACHE_TTL', '60'))                     # 缓存有效期（秒）
+SERVER_CACHE_NEGATIVE_TTL = int(os.getenv('SERVER_CACHE_NEGATIVE_TTL', '10'))   # 不存在的服务器缓存有效期（秒）
+
+# ==================== 总览接口响应缓存配置 ====================
+# /monitor/data、/monitor/stats 按最新样本ID生成ETag，未变化时返回304（见 lib/response_cache.py）
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'  # 是否开启条件GET与响应缓存
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', '5'))                  # 数据版本号在进程内的缓存时间（秒），其它worker写入最迟在此后可见
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '256'))  # 缓存的响应数上限（接口+查询参数）
+
+# ==================== 历史数据流式导出配置 ====================
+# 历史查询带 stream=ndjson/json 时边查边输出（见 MonitorData.iter_history_rows）
+HISTORY_STREAM_BATCH = int(os.getenv('HISTORY_STREAM_BATCH', '1000'))           # 服务端游标每次读取的行数，也是每次写出的行数
+HISTORY_STREAM_MAX_HOURS = int(os.getenv('HISTORY_STREAM_MAX_HOURS', str(24 * 31)))  # 单次导出的最大时间范围（小时）
+
+# ==================== 查询预算配置 ====================
+# 列表接口声明SQL条数上限（见 lib/query_budget.py），超出时记录应用日志告警，开启时直接返回500
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', str(DEBUG)).lower() == 'true'
+
+# ==================== 持续告警配置 ====================
+# 每台服务器最近的样本保存在进程内环形缓冲中，持续告警只在缓冲上计算（见 lib/recent_samples.py）
+ALERT_SUSTAINED_MINUTES = int(os.getenv('ALERT_SUSTAINED_MINUTES', '2'))        # 持续告警的判断窗口（分钟）
+ALERT_RING_SIZE = int(os.getenv('ALERT_RING_SIZE', '128'))                      # 每台服务器缓冲的样本数，需覆盖判断窗口
+
 # ==================== 邮件配置 ====================
 # SMTP邮件服务器配置，用于发送告警邮件
 SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.qq.com')           # QQ邮箱SMTP服务器
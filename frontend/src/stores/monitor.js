@@ -15,7 +15,6 @@ export const useMonitorStore = defineStore('monitor', () => {
     const latest = cpuData.value[cpuData.value.length - 1]
     if (!latest) return null
     return {
-      id: latest.id,
       name: latest.server?.server_name || 'Unknown',
       usage: parseFloat(String(latest.cpu_value)) || 0,
       cores: 'N/A', // 后端没有核心数字段
@@ -28,7 +27,6 @@ export const useMonitorStore = defineStore('monitor', () => {
     const latest = memData.value[memData.value.length - 1]
     if (!latest) return null
     return {
-      id: latest.id,
       name: latest.server?.server_name || 'Unknown',
       usage: parseFloat(String(latest.memory_value)) || 0,
       total: 0, // 后端没有总量字段
@@ -42,7 +40,6 @@ export const useMonitorStore = defineStore('monitor', () => {
     const latest = diskData.value[diskData.value.length - 1]
     if (!latest) return null
     return {
-      id: latest.id,
       name: latest.server?.server_name || 'Unknown',
       usage: parseFloat(String(latest.disk_value)) || 0,
       total: 0, // 后端没有总量字段
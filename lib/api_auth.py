@@ -1,44 +1,167 @@
 
 #API密钥认证工具模块
+# 凭证（AppID + SecretKey）保存在数据库 api_credentials 表中，进程内缓存并定期热加载；
+# 签名支持两种方式（请求头 X-Sign-Method 指定），服务端记录 X-Nonce 防重放：
+# 1. hmac-sha256（默认）：hmac_sha256(secret_key, "app_id\ntimestamp\nnonce")，必须携带 X-Nonce
+# 2. sha256（旧版Agent，已弃用）：sha256(app_id + secret_key + timestamp + nonce)，仅在 API_ALLOW_LEGACY_SIGN 开启时接受，
+#    用于升级过渡：旧版Agent不带 X-Sign-Method 与 X-Nonce，此时按旧版签名校验（无nonce则没有防重放保护），
+#    每个AppID首次出现时记录弃用告警；全部Agent重新部署后应关闭该开关
+# 两种方式的签名比对都使用 hmac.compare_digest（恒定时间），单次校验耗时在微秒级
 
 
 from functools import wraps
-from flask import request
+from collections import OrderedDict
+from flask import request, g, current_app
 from lib.response import response
-from config.setting import DEFAULT_API_KEY, DEBUG
+from config.setting import (DEFAULT_API_KEY, DEBUG, API_SIGN_EXPIRE_SECONDS, API_CREDENTIAL_RELOAD_SECONDS,
+                            API_NONCE_CACHE_MAX, API_ALLOW_LEGACY_SIGN)
 import hashlib
+import hmac
+import threading
 import time
 
-# ==================== API认证配置 ====================
-# AppID 和 SecretKey 配置
-# AppID用于标识客户端身份，SecretKey用于签名加密（必须保密）
-API_CREDENTIALS = {
-    # AppID : SecretKey
-    "default_client": "sk_default_123456",
-    "server_1": "sk_abc123def456",
-    "server_2": "sk_xyz789uvw012",
-    "server_3": "sk_mno345pqr678"
-}
-
 # 签名有效时间窗口（秒）
 # 防止重放攻击，请求的时间戳必须在当前时间的前后范围内
-SIGN_EXPIRE_SECONDS = 60
+SIGN_EXPIRE_SECONDS = API_SIGN_EXPIRE_SECONDS
+
+SIGN_METHOD_LEGACY = 'sha256'
+SIGN_METHOD_HMAC = 'hmac-sha256'
 
 # 生成签名函数
-def generate_signature(app_id, secret_key, timestamp, nonce=None):
+def generate_signature(app_id, secret_key, timestamp, nonce=None, method=SIGN_METHOD_HMAC):
     """
     生成签名
-    算法：sha256(app_id + secret_key + timestamp + nonce)
+    sha256:      sha256(app_id + secret_key + timestamp + nonce)
+    hmac-sha256: hmac_sha256(secret_key, app_id + "\\n" + timestamp + "\\n" + nonce)
     """
+    if method == SIGN_METHOD_HMAC:
+        message = f"{app_id}\n{timestamp}\n{nonce or ''}"
+        return hmac.new(secret_key.encode('utf-8'), message.encode('utf-8'), hashlib.sha256).hexdigest()
+
     # 组合待签名字符串
     raw_str = f"{app_id}{secret_key}{timestamp}"
     if nonce:
         raw_str += nonce
-        
+
     # 计算哈希值
     return hashlib.sha256(raw_str.encode('utf-8')).hexdigest()
 
+
+class CredentialCache:
+    """
+    AppID -> 凭证 的进程内缓存
+    - 每隔 reload_seconds 从数据库整体重新加载一次（热加载），加载期间其它请求继续使用旧快照
+    - 遇到未知AppID时提前触发一次加载（最短间隔 miss_reload_seconds），新建的凭证无需等待定期刷新
+    - 轮换/停用凭证后调用 invalidate()，当前进程立即生效，其它gunicorn worker在下次刷新时生效
+    """
+
+    def __init__(self, reload_seconds=30, miss_reload_seconds=5):
+        self.reload_seconds = reload_seconds
+        self.miss_reload_seconds = miss_reload_seconds
+        self._credentials = {}       # app_id -> (secret_key, server_id)
+        self._loaded_at = None       # 上次加载的单调时间，None表示未加载
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def get(self, app_id):
+        """返回 (secret_key, server_id)，不存在或已停用返回None"""
+        now = time.monotonic()
+        loaded_at = self._loaded_at
+        if loaded_at is None or now - loaded_at > self.reload_seconds:
+            self._reload(now)
+        credential = self._credentials.get(app_id)
+        if credential is None and now - (self._loaded_at or 0) > self.miss_reload_seconds:
+            self._reload(now)
+            credential = self._credentials.get(app_id)
+        return credential
+
+    def _reload(self, now):
+        # 只让一个线程去查库，其余线程不等待，直接使用当前快照（首次加载除外）
+        if not self._lock.acquire(blocking=self._loaded_at is None):
+            return
+        try:
+            if self._loaded_at is not None and self._loaded_at >= now:
+                return
+            from model import ApiCredential
+            self._credentials = {
+                credential.app_id: (credential.secret_key, credential.server_id)
+                for credential in ApiCredential.get_enabled()
+            }
+            self._loaded_at = time.monotonic()
+            self.reloads += 1
+        except Exception as e:
+            print(f"加载API凭证失败: {e}")
+        finally:
+            self._lock.release()
+
+    def invalidate(self):
+        """下一次请求时重新加载"""
+        self._loaded_at = None
+
+    def stats(self):
+        return {'size': len(self._credentials), 'reloads': self.reloads, 'reload_seconds': self.reload_seconds}
+
+
+class NonceCache:
+    """
+    有界TTL的nonce缓存，用于拒绝签名有效期内的重放请求
+    按插入顺序保存（TTL固定，所以插入顺序即过期顺序），每次写入前从头部清理已过期的条目；
+    条数达到上限时淘汰最旧的条目，保证高并发下内存有上限（被淘汰的nonce失去防重放保护，计入 evicted）
+    注意：缓存在每个gunicorn worker进程内独立存在，不同进程之间不共享
+    """
+
+    def __init__(self, ttl, max_size=200000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._items = OrderedDict()   # key -> 过期时间
+        self._lock = threading.Lock()
+        self.replays = 0
+        self.evicted = 0
+
+    def check_and_add(self, key, now=None):
+        """首次出现返回True并记录；有效期内重复出现返回False"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            items = self._items
+            while items:
+                oldest_key, expires_at = next(iter(items.items()))
+                if expires_at > now:
+                    break
+                del items[oldest_key]
+
+            expires_at = items.get(key)
+            if expires_at is not None and expires_at > now:
+                self.replays += 1
+                return False
+
+            if len(items) >= self.max_size:
+                items.popitem(last=False)
+                self.evicted += 1
+            items[key] = now + self.ttl
+            return True
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._items), 'max_size': self.max_size, 'replays': self.replays, 'evicted': self.evicted}
+
+
+# 全局凭证缓存与nonce缓存
+credential_cache = CredentialCache(reload_seconds=API_CREDENTIAL_RELOAD_SECONDS)
+# 时间戳允许前后各偏差 SIGN_EXPIRE_SECONDS，nonce需要记住两倍窗口才能覆盖整个有效期
+nonce_cache = NonceCache(ttl=2 * SIGN_EXPIRE_SECONDS, max_size=API_NONCE_CACHE_MAX)
+
+# 已记录过弃用告警的AppID（每个进程每个AppID只告警一次）
+_legacy_warned = set()
+
+
+def _warn_legacy_sign(app_id):
+    if app_id in _legacy_warned:
+        return
+    _legacy_warned.add(app_id)
+    current_app.logger.warning(f"AppID {app_id} 仍在使用已弃用的 sha256 签名，请重新部署Agent后关闭 API_ALLOW_LEGACY_SIGN")
+
 # API签名认证装饰器
+# 验证通过后 g.api_server_id 为凭证绑定的服务器ID（通用凭证为None），供接口限制可上报的服务器
 def api_key_required(func):
     @wraps(func)
     def decorated_function(*args, **kwargs):
@@ -46,16 +169,30 @@ def api_key_required(func):
         app_id = request.headers.get('X-App-ID')
         timestamp = request.headers.get('X-Timestamp')
         sign = request.headers.get('X-Sign')
-        nonce = request.headers.get('X-Nonce', '') # 随机字符串，可选
+        nonce = request.headers.get('X-Nonce') # 随机字符串，每个请求唯一
+        method = request.headers.get('X-Sign-Method')
+        if method is None:
+            # 旧版Agent既不带签名方式也不带nonce，过渡期内按旧版签名处理
+            legacy_agent = API_ALLOW_LEGACY_SIGN and not nonce
+            method = SIGN_METHOD_LEGACY if legacy_agent else SIGN_METHOD_HMAC
+        method = method.lower()
 
         # 2. 检查参数完整性
         if not all([app_id, timestamp, sign]):
             return response(message="缺少认证参数(X-App-ID, X-Timestamp, X-Sign)", code=401)
-
-        # 3. 检查AppID是否存在
-        secret_key = API_CREDENTIALS.get(app_id)
-        if not secret_key:
+        if method == SIGN_METHOD_LEGACY:
+            if not API_ALLOW_LEGACY_SIGN:
+                return response(message="不支持的签名方式", code=401)
+        elif method != SIGN_METHOD_HMAC:
+            return response(message="不支持的签名方式", code=401)
+        elif not nonce:
+            return response(message="缺少认证参数(X-Nonce)", code=401)
+
+        # 3. 检查AppID是否存在（走进程内凭证缓存）
+        credential = credential_cache.get(app_id)
+        if not credential:
             return response(message="无效的AppID", code=401)
+        secret_key, server_id = credential
 
         # 4. 检查时间戳有效期（防重放攻击）
         try:
@@ -67,14 +204,19 @@ def api_key_required(func):
         except ValueError:
             return response(message="时间戳格式错误", code=401)
 
-        # 5. 服务端重新计算签名
-        server_sign = generate_signature(app_id, secret_key, timestamp, nonce)
-
-        # 6. 比对签名
-        if server_sign != sign:
+        # 5. 服务端重新计算签名，恒定时间比对
+        server_sign = generate_signature(app_id, secret_key, timestamp, nonce, method)
+        if not hmac.compare_digest(server_sign.encode('utf-8'), sign.lower().encode('utf-8')):
             return response(message="签名验证失败", code=401)
 
+        # 6. 签名通过后再记录nonce，避免伪造请求占满nonce缓存
+        if nonce and not nonce_cache.check_and_add(f"{app_id}:{nonce}"):
+            return response(message="重复的请求", code=401)
+        if method == SIGN_METHOD_LEGACY:
+            _warn_legacy_sign(app_id)
+
         # 验证通过，执行原函数
+        g.api_server_id = server_id
         return func(*args, **kwargs)
     return decorated_function
 
@@ -1,41 +1,406 @@
+import atexit
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
 from flask import current_app
-from model import db, MonitorData, Server
+from model import db, MonitorData
 from mail.alert import check_and_send_alert_by_ip
+from lib.server_cache import server_cache
+from lib.recent_samples import recent_samples
+from lib.response_cache import response_cache
+from config.setting import (
+    INGEST_FLUSH_SIZE, INGEST_FLUSH_INTERVAL_MS, INGEST_BUFFER_MAX, INGEST_SLOW_FLUSH_MS,
+    INGEST_WORKERS, INGEST_QUEUE_MAX, INGEST_RETRY_AFTER,
+    SPOOL_ENABLED, SPOOL_DIR, SPOOL_SEGMENT_MB, SPOOL_USE_MMAP, SPOOL_GROUP_COMMIT_MS,
+    SPOOL_REPLAY_INTERVAL_MS, SPOOL_SEAL_SECONDS, SPOOL_MAX_BACKLOG_MB, SPOOL_REPLAY_MAX_ATTEMPTS
+)
 
 # 创建全局线程池
-# max_workers=10 表示最多同时有10个线程在后台处理任务
-executor = ThreadPoolExecutor(max_workers=10)
+# max_workers 表示最多同时有多少个线程在后台处理任务
+executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS)
 
-def async_process_monitor_data(app, server_ip, metrics):
+
+class IngestQueueFull(Exception):
+    """上报队列已满，调用方应拒绝请求并提示客户端稍后重试"""
+
+    def __init__(self, retry_after):
+        super().__init__('上报队列已满')
+        self.retry_after = retry_after
+
+
+class BoundedIngestQueue:
+    """
+    有界上报队列
+    解决痛点：ThreadPoolExecutor 自带的工作队列是无界的，MySQL变慢时积压会一直增长直到内存耗尽
+    做法：按样本数统计已提交但未处理完的任务量，超过 max_pending 时直接抛出 IngestQueueFull，
+    由接口返回 503 + Retry-After，把压力推回给客户端。
+    """
+
+    def __init__(self, executor, max_pending=10000, retry_after=5):
+        self.executor = executor
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+
+        self._pending = OrderedDict()  # 任务序号 -> (样本数, 入队时间)，按入队先后排列
+        self._pending_weight = 0
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rejected_samples = 0
+
+    def submit(self, fn, *args, weight=1):
+        """提交任务，weight 为该任务包含的样本数；队列已满时抛出 IngestQueueFull"""
+        with self._lock:
+            # 队列为空时总是放行，避免超大批次永远无法提交
+            if self._pending and self._pending_weight + weight > self.max_pending:
+                self.rejected += 1
+                self.rejected_samples += weight
+                raise IngestQueueFull(self.retry_after)
+            seq = next(self._seq)
+            self._pending[seq] = (weight, time.monotonic())
+            self._pending_weight += weight
+            self.submitted += 1
+
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self._done(seq)
+            raise
+        future.add_done_callback(lambda _: self._done(seq))
+        return future
+
+    def reject(self, weight=1):
+        """调用方自行判定积压过多（如落盘暂存未回放的数据）时，记录一次拒绝并抛出 IngestQueueFull"""
+        with self._lock:
+            self.rejected += 1
+            self.rejected_samples += weight
+        raise IngestQueueFull(self.retry_after)
+
+    def _done(self, seq):
+        with self._lock:
+            entry = self._pending.pop(seq, None)
+            if entry:
+                self._pending_weight -= entry[0]
+                self.completed += 1
+
+    def stats(self):
+        with self._lock:
+            oldest_age = 0.0
+            if self._pending:
+                _, enqueued_at = next(iter(self._pending.values()))
+                oldest_age = time.monotonic() - enqueued_at
+            return {
+                'workers': self.executor._max_workers,
+                'max_pending': self.max_pending,
+                'pending_tasks': len(self._pending),
+                'pending_samples': self._pending_weight,
+                'oldest_pending_age_ms': round(oldest_age * 1000, 2),
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'rejected_samples': self.rejected_samples,
+                'retry_after': self.retry_after
+            }
+
+
+# 全局有界上报队列，接口层统一通过它提交后台任务
+ingest_queue = BoundedIngestQueue(executor, max_pending=INGEST_QUEUE_MAX, retry_after=INGEST_RETRY_AFTER)
+
+
+class MonitorDataWriter:
+    """
+    监控数据批量写入器
+    解决痛点：每条监控数据单独 add + commit，大量Agent上报时MySQL的时间都耗在提交刷盘上
+    做法：样本先进入内存缓冲区，攒够 flush_size 条或距第一条超过 flush_interval_ms 毫秒，
+    由后台线程合并为一条多行INSERT一次提交。缓冲区超过 max_buffer 时阻塞生产者，避免写库变慢时内存无限增长。
+    """
+
+    def __init__(self, flush_size=500, flush_interval_ms=1000, max_buffer=20000, slow_flush_ms=500):
+        self.flush_size = flush_size
+        self.flush_interval_ms = flush_interval_ms
+        self.max_buffer = max_buffer
+        self.slow_flush_ms = slow_flush_ms
+
+        self._buffer = []
+        self._first_added_at = None  # 当前缓冲区中第一条数据的入队时间（单调时钟）
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # 保证同一时刻只有一个线程在写库
+        self._app = None
+        self._thread = None
+
+        # 写入统计
+        self._flush_count = 0
+        self._rows_written = 0
+        self._rows_failed = 0
+        self._slow_flush_count = 0
+        self._total_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._last_flush_ms = 0.0
+        self._last_flush_rows = 0
+        self._last_flush_at = None
+
+    def start(self, app):
+        """启动后台写入线程（幂等，首次调用时绑定应用对象）"""
+        if self._thread is not None:
+            return
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._app = app
+            self._thread = threading.Thread(target=self._run, name='monitor-data-writer', daemon=True)
+            self._thread.start()
+
+    def add(self, row):
+        """追加一条监控数据（字典，字段与 monitor_data 表一致）"""
+        self.add_many([row])
+
+    def add_many(self, rows):
+        """追加多条监控数据，缓冲区已满时阻塞等待后台线程写出"""
+        if not rows:
+            return
+        with self._cond:
+            while len(self._buffer) >= self.max_buffer:
+                self._cond.wait()
+            if not self._buffer:
+                self._first_added_at = time.monotonic()
+            self._buffer.extend(rows)
+            if len(self._buffer) >= self.flush_size:
+                self._cond.notify_all()
+
+    def _take_batch(self):
+        """取出当前缓冲区的全部数据，调用方需持有 self._cond"""
+        rows = self._buffer
+        self._buffer = []
+        self._first_added_at = None
+        self._cond.notify_all()  # 唤醒因缓冲区已满而阻塞的生产者
+        return rows
+
+    def _run(self):
+        interval = self.flush_interval_ms / 1000.0
+        while True:
+            with self._cond:
+                while True:
+                    if len(self._buffer) >= self.flush_size:
+                        break
+                    if self._buffer:
+                        waited = time.monotonic() - self._first_added_at
+                        if waited >= interval:
+                            break
+                        self._cond.wait(interval - waited)
+                    else:
+                        self._cond.wait()
+                rows = self._take_batch()
+            self._flush(rows)
+
+    def flush(self):
+        """立即写出缓冲区中的全部数据（进程退出时调用）"""
+        with self._cond:
+            rows = self._take_batch()
+        self._flush(rows)
+
+    def _flush(self, rows):
+        if not rows or self._app is None:
+            return
+        with self._flush_lock:
+            start = time.perf_counter()
+            try:
+                with self._app.app_context():
+                    try:
+                        MonitorData.bulk_create(rows)
+                    except Exception:
+                        db.session.rollback()
+                        raise
+            except Exception as e:
+                self._rows_failed += len(rows)
+                print(f"批量写入监控数据失败({len(rows)}条): {str(e)}")
+                return
+            # 新样本已提交，总览接口的ETag与响应缓存随之失效
+            response_cache.invalidate()
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._flush_count += 1
+            self._rows_written += len(rows)
+            self._total_flush_ms += elapsed_ms
+            self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+            self._last_flush_ms = elapsed_ms
+            self._last_flush_rows = len(rows)
+            self._last_flush_at = datetime.now()
+            if elapsed_ms > self.slow_flush_ms:
+                self._slow_flush_count += 1
+                print(f"监控数据慢写入: {len(rows)}条耗时{elapsed_ms:.1f}ms")
+
+    def stats(self):
+        """返回写入器配置与运行统计"""
+        with self._cond:
+            buffered = len(self._buffer)
+        return {
+            'flush_size': self.flush_size,
+            'flush_interval_ms': self.flush_interval_ms,
+            'max_buffer': self.max_buffer,
+            'slow_flush_ms': self.slow_flush_ms,
+            'buffered_rows': buffered,
+            'flush_count': self._flush_count,
+            'rows_written': self._rows_written,
+            'rows_failed': self._rows_failed,
+            'slow_flush_count': self._slow_flush_count,
+            'avg_flush_ms': round(self._total_flush_ms / self._flush_count, 2) if self._flush_count else 0.0,
+            'max_flush_ms': round(self._max_flush_ms, 2),
+            'last_flush_ms': round(self._last_flush_ms, 2),
+            'last_flush_rows': self._last_flush_rows,
+            'last_flush_at': str(self._last_flush_at) if self._last_flush_at else None
+        }
+
+
+# 全局批量写入器
+writer = MonitorDataWriter(
+    flush_size=INGEST_FLUSH_SIZE,
+    flush_interval_ms=INGEST_FLUSH_INTERVAL_MS,
+    max_buffer=INGEST_BUFFER_MAX,
+    slow_flush_ms=INGEST_SLOW_FLUSH_MS
+)
+# 进程正常退出（如gunicorn回收worker）时写出剩余数据
+atexit.register(writer.flush)
+
+
+# 落盘暂存（开启 SPOOL_ENABLED 时在每个进程内按需创建）
+_spool = None
+_replayer = None
+_spool_lock = threading.Lock()
+# 开启落盘暂存时，因队列满而跳过告警检查的批次数与样本数
+_skipped_alerts = {'batches': 0, 'records': 0}
+
+
+def start_spool(app):
+    """在当前进程内创建落盘暂存与回放线程（幂等），启动时即开始排空遗留的暂存数据"""
+    global _spool, _replayer
+    if not SPOOL_ENABLED or _spool is not None:
+        return
+    with _spool_lock:
+        if _spool is not None:
+            return
+        from lib.spool import SampleSpool, SpoolReplayer
+
+        def write_rows(rows):
+            with app.app_context():
+                try:
+                    MonitorData.bulk_create(rows)
+                except Exception:
+                    db.session.rollback()
+                    raise
+            response_cache.invalidate()
+
+        def ping():
+            with app.app_context():
+                try:
+                    db.session.execute(db.text('SELECT 1'))
+                finally:
+                    db.session.remove()
+
+        spool = SampleSpool(
+            SPOOL_DIR,
+            segment_bytes=SPOOL_SEGMENT_MB * 1024 * 1024,
+            group_commit_ms=SPOOL_GROUP_COMMIT_MS,
+            use_mmap=SPOOL_USE_MMAP
+        )
+        replayer = SpoolReplayer(
+            spool,
+            write_rows,
+            batch_size=INGEST_FLUSH_SIZE,
+            interval_ms=SPOOL_REPLAY_INTERVAL_MS,
+            seal_seconds=SPOOL_SEAL_SECONDS,
+            max_attempts=SPOOL_REPLAY_MAX_ATTEMPTS,
+            ping=ping
+        )
+        replayer.start()
+        _spool, _replayer = spool, replayer
+
+
+def submit_samples(app, rows):
+    """
+    接收一批已解析好的样本（接口层调用），返回后即可向客户端确认
+    - 开启落盘暂存：先写入暂存文件（组提交落盘），写库由回放线程完成；最近样本缓冲在请求线程内写入，
+      后台任务只做告警检查，队列满时跳过本批告警检查并计数
+    - 未开启：整批提交到有界队列，由后台任务交给批量写入器写库并做告警检查
+    积压超过上限时抛出 IngestQueueFull
+    """
+    if not SPOOL_ENABLED:
+        ingest_queue.submit(async_process_monitor_batch, app, rows, False, weight=len(rows))
+        return
+
+    start_spool(app)
+    if _replayer.backlog_bytes > SPOOL_MAX_BACKLOG_MB * 1024 * 1024:
+        ingest_queue.reject(len(rows))
+    _spool.append_many(rows)
+    # 内存追加，开销很小；放在请求线程内，队列满时持续告警的判断窗口也不缺样本
+    recent_samples.add_rows(rows)
+    try:
+        ingest_queue.submit(async_process_monitor_batch, app, rows, True, weight=len(rows))
+    except IngestQueueFull:
+        # 数据已落盘，队列满时仅跳过本批的告警检查
+        with _spool_lock:
+            _skipped_alerts['batches'] += 1
+            _skipped_alerts['records'] += len(rows)
+
+
+def async_process_monitor_batch(app, rows, persisted=False):
     """
     异步处理监控数据：入库 + 告警
+    整批交给写入器一次写入并写入最近样本缓冲（已落盘暂存的由回放线程写库，缓冲已在接收时写入），
+    再对每台服务器时间最新的一条样本做告警检查（持续告警在缓冲上计算，不查库）
     注意：由于是异步线程，需要手动创建应用上下文
     """
+    writer.start(app)
     with app.app_context():
         try:
-            # 1. 数据入库
-            # 支持两种字段名格式
-            cpu_value = metrics.get('cpu_value', metrics.get('cpu', 0.0))
-            memory_value = metrics.get('memory_value', metrics.get('memory', 0.0))
-            disk_value = metrics.get('disk_value', metrics.get('disk', 0.0))
-
-            MonitorData.create_by_ip(
-                server_ip,
-                cpu_value,
-                memory_value,
-                disk_value
-            )
-            
-            # 2. 告警检查
-            alert_metrics = {
-                'cpu': cpu_value,
-                'memory': memory_value,
-                'disk': disk_value
-            }
-            for metric_type, value in alert_metrics.items():
-                check_and_send_alert_by_ip(server_ip, metric_type, float(value))
-                
+            if not persisted:
+                writer.add_many(rows)
+                recent_samples.add_rows(rows)
+
+            # 缓冲补传的历史数据不逐条告警，只检查每台服务器时间最新的一条
+            latest = {}
+            for row in rows:
+                current = latest.get(row['server_id'])
+                if current is None or row['recorded_at'] >= current['recorded_at']:
+                    latest[row['server_id']] = row
+            for row in latest.values():
+                _check_alerts(row['ip_address'], row['cpu_value'], row['memory_value'], row['disk_value'],
+                              row['recorded_at'])
+
         except Exception as e:
             # 实际项目中应记录日志
             print(f"异步处理监控数据失败: {str(e)}")
+
+
+def _check_alerts(server_ip, cpu_value, memory_value, disk_value, recorded_at=None):
+    """对一条样本的三项指标依次做告警检查"""
+    alert_metrics = {
+        'cpu': cpu_value,
+        'memory': memory_value,
+        'disk': disk_value
+    }
+    for metric_type, value in alert_metrics.items():
+        check_and_send_alert_by_ip(server_ip, metric_type, float(value), recorded_at)
+
+
+def ingest_stats():
+    """汇总监控数据写入链路的运行统计"""
+    stats = {
+        'queue': ingest_queue.stats(),
+        'writer': writer.stats(),
+        'server_cache': server_cache.stats(),
+        'recent_samples': recent_samples.stats(),
+        'response_cache': response_cache.stats(),
+        'spool': None
+    }
+    if _spool is not None:
+        with _spool_lock:
+            skipped = {'skipped_alert_batches': _skipped_alerts['batches'],
+                       'skipped_alert_records': _skipped_alerts['records']}
+        stats['spool'] = dict(_spool.stats(), **_replayer.stats(), **skipped)
+    return stats
@@ -0,0 +1,275 @@
+# 压缩分块时序存储模块（monitor_data 的可选存储后端，METRICS_BACKEND=chunks 时启用）
+# 解决痛点：原始数据每个点一行ORM记录（自增id + server_id + 冗余的ip字符串 + 3个指标列 + 时间 + 索引），
+# 单点占用数十字节，长时间范围的查询要逐行反序列化
+# 做法：
+# 1. 按 (服务器, 时间块) 组织数据，时间块长度 CHUNK_SECONDS（默认2小时），块内按列存储
+# 2. 时间戳(秒)做二阶差分(delta-of-delta)：固定上报间隔下几乎全为0；
+#    指标值按存储精度转为整数(百分之一)后与前一个值做XOR：变化小的相邻值只剩低位
+#    各列拼接后整体 zlib 压缩，单点通常只占几个字节
+# 3. 解码全部用 NumPy 向量化完成（cumsum / bitwise_xor.accumulate），范围查询直接返回 NumPy 数组
+# 4. 块保存在本地文件（CHUNK_STORAGE=file）或 MySQL 的 monitor_chunks 表（CHUNK_STORAGE=mysql）
+#    写入时对目标块"加锁 -> 读出 -> 合并去重 -> 重新编码 -> 写回"，多个gunicorn worker并发写同一块也不会丢数据；
+#    文件后端先写临时文件并 fsync，再原子替换并 fsync 目录，掉电后块文件要么是旧内容要么是新内容
+# 注意：块内只保存 cpu/memory/disk 三项核心指标，扩展指标（extra_metrics）不进入分块存储
+
+import os
+import shutil
+import struct
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+METRICS = ('cpu', 'memory', 'disk')
+
+# 块头：魔数、版本、点数、首个时间戳
+_HEADER = struct.Struct('<4sHIq')
+_MAGIC = b'MCK1'
+_VERSION = 1
+# 指标值的定点精度，与 monitor_data 的百分比存储精度（0.01%，见 model/types.py）一致，编解码无损
+_SCALE = 100
+
+
+def encode_chunk(timestamps, values):
+    """
+    编码一个时间块
+    timestamps: 按时间升序、无重复的整数秒时间戳数组
+    values: {'cpu': 数组, 'memory': 数组, 'disk': 数组}
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    count = len(timestamps)
+    if count == 0:
+        return _HEADER.pack(_MAGIC, _VERSION, 0, 0)
+
+    # 时间戳：一阶差分的差分，第一个值保存在块头
+    deltas = np.diff(timestamps, prepend=timestamps[0])
+    dod = np.diff(deltas, prepend=0).astype(np.int32)
+    parts = [dod.tobytes()]
+
+    # 指标值：定点整数与前一个值XOR
+    for metric in METRICS:
+        scaled = np.rint(np.asarray(values[metric], dtype=np.float64) * _SCALE).astype(np.int32)
+        xored = scaled ^ np.concatenate(([0], scaled[:-1])).astype(np.int32)
+        parts.append(xored.tobytes())
+
+    return _HEADER.pack(_MAGIC, _VERSION, count, int(timestamps[0])) + zlib.compress(b''.join(parts), 6)
+
+
+def decode_chunk(blob):
+    """解码一个时间块，返回 (timestamps int64数组, {'cpu': float64数组, ...})"""
+    magic, version, count, first = _HEADER.unpack_from(blob)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError('无法识别的数据块格式')
+    if count == 0:
+        return np.empty(0, dtype=np.int64), {metric: np.empty(0) for metric in METRICS}
+
+    columns = np.frombuffer(zlib.decompress(blob[_HEADER.size:]), dtype=np.int32).reshape(1 + len(METRICS), count)
+    deltas = np.cumsum(columns[0], dtype=np.int64)
+    timestamps = first + np.cumsum(deltas)
+    values = {}
+    for index, metric in enumerate(METRICS, start=1):
+        values[metric] = np.bitwise_xor.accumulate(columns[index]) / float(_SCALE)
+    return timestamps, values
+
+
+def merge_points(timestamps, values, new_timestamps, new_values):
+    """合并两组数据点并按时间排序，同一时间戳保留新数据"""
+    all_timestamps = np.concatenate((new_timestamps, timestamps))
+    # np.unique 返回每个时间戳第一次出现的位置，新数据排在前面，因此重复时间戳取新值
+    merged_timestamps, index = np.unique(all_timestamps, return_index=True)
+    merged_values = {metric: np.concatenate((new_values[metric], values[metric]))[index] for metric in METRICS}
+    return merged_timestamps, merged_values
+
+
+#同步目录项，使 os.replace 的重命名落盘（Windows 不支持打开目录，跳过）
+def _fsync_dir(directory):
+    if os.name == 'nt':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class FileChunkBackend:
+    """块保存在本地目录：<root>/<server_id>/<块起始时间戳>.chunk，每台服务器一个锁文件"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _dir(self, server_id):
+        return os.path.join(self.root, str(server_id))
+
+    def _path(self, server_id, chunk_start):
+        return os.path.join(self._dir(server_id), f'{chunk_start}.chunk')
+
+    def read(self, server_id, chunk_start):
+        try:
+            with open(self._path(server_id, chunk_start), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def update(self, server_id, chunk_start, merge):
+        """在服务器锁内读出块、调用 merge(旧块或None) 得到新块，落盘后原子替换"""
+        os.makedirs(self._dir(server_id), exist_ok=True)
+        with open(os.path.join(self._dir(server_id), '.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                blob = merge(self.read(server_id, chunk_start))
+                path = self._path(server_id, chunk_start)
+                tmp_path = f'{path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(blob)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+                _fsync_dir(self._dir(server_id))
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read_range(self, server_id, start, end):
+        """返回起始时间在 [start, end] 内的块 [(块起始时间戳, 数据)]"""
+        chunks = []
+        for chunk_start in self._chunk_starts(server_id, start, end):
+            blob = self.read(server_id, chunk_start)
+            if blob:
+                chunks.append((chunk_start, blob))
+        return chunks
+
+    def _chunk_starts(self, server_id, start, end):
+        try:
+            names = os.listdir(self._dir(server_id))
+        except FileNotFoundError:
+            return []
+        starts = (int(name[:-6]) for name in names if name.endswith('.chunk'))
+        return sorted(chunk_start for chunk_start in starts if start <= chunk_start <= end)
+
+    def drop_before(self, cutoff):
+        """删除起始时间早于 cutoff（时间戳）的块，返回删除的块数"""
+        dropped = 0
+        if not os.path.isdir(self.root):
+            return 0
+        for server_dir in os.listdir(self.root):
+            for chunk_start in self._chunk_starts(server_dir, 0, cutoff - 1):
+                os.remove(self._path(server_dir, chunk_start))
+                dropped += 1
+        return dropped
+
+    def drop_server(self, server_id):
+        shutil.rmtree(self._dir(server_id), ignore_errors=True)
+
+
+class MySQLChunkBackend:
+    """块保存在 monitor_chunks 表，与汇总表的更新在同一事务内，由调用方（MonitorData.bulk_create）提交"""
+
+    def update(self, server_id, chunk_start, merge):
+        from model import MonitorChunk
+
+        # 先 INSERT IGNORE 占位再 SELECT ... FOR UPDATE：块已存在时直接加行锁，
+        # 多个进程同时创建同一块时后到者等待先到者提交，读到的总是最新内容
+        chunk_start = datetime.fromtimestamp(chunk_start)
+        MonitorChunk.ensure(server_id, chunk_start, encode_chunk([], {}))
+        blob = merge(MonitorChunk.get_for_update(server_id, chunk_start).data)
+        MonitorChunk.save(server_id, chunk_start, blob, _HEADER.unpack_from(blob)[2])
+
+    def read_range(self, server_id, start, end):
+        from model import MonitorChunk
+
+        chunks = MonitorChunk.get_range(server_id, datetime.fromtimestamp(start), datetime.fromtimestamp(end))
+        return [(int(chunk.chunk_start.timestamp()), chunk.data) for chunk in chunks]
+
+    def drop_before(self, cutoff):
+        from model import MonitorChunk
+
+        return MonitorChunk.delete_before(datetime.fromtimestamp(cutoff))
+
+    def drop_server(self, server_id):
+        from model import MonitorChunk
+
+        # 不提交事务，与删除服务器一起提交
+        MonitorChunk.query.filter_by(server_id=server_id).delete()
+
+
+class ChunkStore:
+    def __init__(self, backend, chunk_seconds=7200):
+        self.backend = backend
+        self.chunk_seconds = chunk_seconds
+
+    def chunk_of(self, timestamp):
+        return int(timestamp) // self.chunk_seconds * self.chunk_seconds
+
+    def append(self, rows):
+        """写入一批监控数据行（monitor_data 字典），按 (服务器, 时间块) 分组后逐块合并写回，返回写入的块数"""
+        groups = {}
+        for row in rows:
+            timestamp = int(row['recorded_at'].timestamp())
+            key = (row['server_id'], self.chunk_of(timestamp))
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = ([], {metric: [] for metric in METRICS})
+            group[0].append(timestamp)
+            for metric in METRICS:
+                group[1][metric].append(float(row[f'{metric}_value']))
+
+        # 固定加锁顺序，避免并发写入时死锁
+        for (server_id, chunk_start) in sorted(groups):
+            new_timestamps, new_values = groups[(server_id, chunk_start)]
+            new_timestamps = np.asarray(new_timestamps, dtype=np.int64)
+            new_values = {metric: np.asarray(new_values[metric], dtype=np.float64) for metric in METRICS}
+
+            def merge(blob):
+                timestamps, values = decode_chunk(blob) if blob else (
+                    np.empty(0, dtype=np.int64), {metric: np.empty(0) for metric in METRICS})
+                return encode_chunk(*merge_points(timestamps, values, new_timestamps, new_values))
+
+            self.backend.update(server_id, chunk_start, merge)
+        return len(groups)
+
+    def scan(self, server_id, start, end):
+        """
+        范围查询 [start, end]（datetime），返回 (timestamps int64数组, {'cpu': float64数组, ...})
+        只读取与时间范围相交的块，整块解码后用布尔掩码截取
+        """
+        start_ts, end_ts = int(start.timestamp()), int(end.timestamp())
+        timestamp_parts, value_parts = [], {metric: [] for metric in METRICS}
+        for _, blob in self.backend.read_range(server_id, self.chunk_of(start_ts), end_ts):
+            timestamps, values = decode_chunk(blob)
+            mask = (timestamps >= start_ts) & (timestamps <= end_ts)
+            timestamp_parts.append(timestamps[mask])
+            for metric in METRICS:
+                value_parts[metric].append(values[metric][mask])
+
+        if not timestamp_parts:
+            return np.empty(0, dtype=np.int64), {metric: np.empty(0) for metric in METRICS}
+        return np.concatenate(timestamp_parts), {metric: np.concatenate(value_parts[metric]) for metric in METRICS}
+
+    def drop_before(self, cutoff):
+        """删除全部数据都早于 cutoff（datetime）的块，返回删除的块数"""
+        # 块 [起始, 起始 + chunk_seconds) 整块过期的条件：起始 + chunk_seconds <= cutoff
+        return self.backend.drop_before(int(cutoff.timestamp()) - self.chunk_seconds + 1)
+
+    def drop_server(self, server_id):
+        """删除服务器的全部数据块（删除服务器时调用）"""
+        self.backend.drop_server(server_id)
+
+
+_chunk_store = None
+
+
+def get_chunk_store():
+    """按配置创建全局分块存储（首次调用时创建）"""
+    global _chunk_store
+    if _chunk_store is None:
+        from config.setting import CHUNK_STORAGE, CHUNK_DIR, CHUNK_SECONDS
+        backend = MySQLChunkBackend() if CHUNK_STORAGE == 'mysql' else FileChunkBackend(CHUNK_DIR)
+        _chunk_store = ChunkStore(backend, chunk_seconds=CHUNK_SECONDS)
+    return _chunk_store
@@ -0,0 +1,131 @@
+# 上报数据解码模块
+# 解决痛点：Agent缓冲上报时JSON大量重复字段名，既浪费广域网带宽又消耗服务端JSON解析CPU
+# 支持：
+# 1. Content-Encoding: gzip / deflate / zstd 压缩
+# 2. Content-Type:
+#    - application/json（默认）
+#    - application/msgpack（二进制JSON）
+#    - application/x-monitor-packed（紧凑定长格式，仅批量接口，见下方说明）
+
+import json
+import struct
+import zlib
+
+try:
+    import msgpack
+except ImportError:  # 未安装时不支持 msgpack 格式
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # 未安装时不支持 zstd 压缩
+    zstandard = None
+
+# ==================== 紧凑定长格式 ====================
+# 一个请求体由若干帧首尾相接组成，每帧对应一台服务器的一段连续样本（小端字节序）：
+# 帧头: | 魔数 b'MP' | 版本 uint8 | IP长度 uint8 | IP(ASCII) | 基准时间戳 uint32 | 样本数 uint16 |
+# 样本: | 时间增量 uint16（秒，相对上一条，第一条相对基准时间戳）| CPU uint16 | 内存 uint16 | 磁盘 uint16 |
+# 指标值以百分之一为单位存储（12.34% -> 1234），每条样本固定8字节
+PACKED_MAGIC = b'MP'
+PACKED_VERSION = 1
+PACKED_FRAME_HEAD = struct.Struct('<2sBB')
+PACKED_FRAME_META = struct.Struct('<IH')
+PACKED_SAMPLE = struct.Struct('<HHHH')
+
+CONTENT_TYPE_JSON = 'application/json'
+CONTENT_TYPE_MSGPACK = 'application/msgpack'
+CONTENT_TYPE_PACKED = 'application/x-monitor-packed'
+
+
+class PayloadDecodeError(Exception):
+    """请求体无法解码，code 为对应的HTTP状态码（400 格式错误 / 413 过大 / 415 不支持）"""
+
+    def __init__(self, message, code=400):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+def decompress(data, content_encoding, max_bytes):
+    """按 Content-Encoding 解压，解压后超过 max_bytes 视为异常请求（防止压缩炸弹）"""
+    encoding = (content_encoding or '').strip().lower()
+    if not encoding or encoding == 'identity':
+        result = data
+    elif encoding in ('gzip', 'x-gzip', 'deflate'):
+        # wbits: 16+MAX_WBITS 解 gzip，MAX_WBITS 解 zlib 格式的 deflate
+        wbits = 16 + zlib.MAX_WBITS if encoding != 'deflate' else zlib.MAX_WBITS
+        try:
+            decompressor = zlib.decompressobj(wbits)
+            result = decompressor.decompress(data, max_bytes + 1)
+        except zlib.error:
+            raise PayloadDecodeError('请求体解压失败')
+    elif encoding == 'zstd':
+        if zstandard is None:
+            raise PayloadDecodeError('服务端不支持zstd压缩', code=415)
+        try:
+            with zstandard.ZstdDecompressor().stream_reader(data) as reader:
+                result = reader.read(max_bytes + 1)
+        except zstandard.ZstdError:
+            raise PayloadDecodeError('请求体解压失败')
+    else:
+        raise PayloadDecodeError(f'不支持的Content-Encoding: {encoding}', code=415)
+
+    if len(result) > max_bytes:
+        raise PayloadDecodeError('请求体过大', code=413)
+    return result
+
+
+def decode_body(data, content_type, content_encoding, max_bytes=16 * 1024 * 1024):
+    """把原始请求体解码为与JSON请求相同结构的字典"""
+    data = decompress(data, content_encoding, max_bytes)
+    mimetype = (content_type or CONTENT_TYPE_JSON).split(';')[0].strip().lower()
+
+    if mimetype in (CONTENT_TYPE_MSGPACK, 'application/x-msgpack'):
+        if msgpack is None:
+            raise PayloadDecodeError('服务端不支持msgpack格式', code=415)
+        try:
+            body = msgpack.unpackb(data, raw=False)
+        except Exception:
+            raise PayloadDecodeError('msgpack格式错误')
+    elif mimetype == CONTENT_TYPE_PACKED:
+        body = {'records': decode_packed(data)}
+    else:
+        try:
+            body = json.loads(data)
+        except ValueError:
+            raise PayloadDecodeError('JSON格式错误')
+
+    if not isinstance(body, dict):
+        raise PayloadDecodeError('请求体必须为对象')
+    return body
+
+
+def decode_packed(data):
+    """解码紧凑定长格式，返回与批量接口JSON结构一致的记录列表"""
+    records = []
+    view = memoryview(data)
+    offset = 0
+    try:
+        while offset < len(view):
+            magic, version, ip_len = PACKED_FRAME_HEAD.unpack_from(view, offset)
+            if magic != PACKED_MAGIC or version != PACKED_VERSION:
+                raise PayloadDecodeError('紧凑格式帧头错误')
+            offset += PACKED_FRAME_HEAD.size
+            ip_address = bytes(view[offset:offset + ip_len]).decode('ascii')
+            offset += ip_len
+            timestamp, count = PACKED_FRAME_META.unpack_from(view, offset)
+            offset += PACKED_FRAME_META.size
+            if offset + count * PACKED_SAMPLE.size > len(view):
+                raise PayloadDecodeError('紧凑格式数据不完整')
+
+            for delta, cpu, memory, disk in PACKED_SAMPLE.iter_unpack(view[offset:offset + count * PACKED_SAMPLE.size]):
+                timestamp += delta
+                records.append({
+                    'server': ip_address,
+                    'timestamp': timestamp,
+                    'metrics': {'cpu': cpu / 100.0, 'memory': memory / 100.0, 'disk': disk / 100.0}
+                })
+            offset += count * PACKED_SAMPLE.size
+    except (struct.error, UnicodeDecodeError):
+        raise PayloadDecodeError('紧凑格式数据不完整')
+    return records
@@ -0,0 +1,95 @@
+# 历史数据降采样模块
+# 解决痛点：趋势图一次拿到几千个点，每条曲线都逐点渲染，响应体和浏览器渲染都慢，而屏幕宽度只有几百像素
+# 做法：服务端把数据降到 max_points 个点以内，保留的都是原始样本（整行保留，三项指标时间对齐）
+# 1. lttb（默认）：Largest-Triangle-Three-Buckets，每个桶选出与前一个选中点、下一个桶均值构成三角形面积最大的样本，
+#    面积为 cpu/memory/disk 三条曲线面积之和（三项指标都是百分比，量纲一致），任一指标的尖峰都会让该样本胜出
+# 2. minmax：每个桶保留每项指标的最小值、最大值所在的样本（以及首尾样本），尖峰一定保留，点数上限为 max_points
+# 两种方法都用 NumPy 对三列同时计算；lttb 只在桶之间循环（桶数 = max_points），桶内向量化
+
+from datetime import datetime
+
+import numpy as np
+
+METRIC_FIELDS = ('cpu_value', 'memory_value', 'disk_value')
+METHODS = ('lttb', 'minmax')
+# 各方法的 max_points 下限：lttb 首尾加至少一个桶；minmax 首尾加一个桶（每项指标的最小、最大值）
+MIN_POINTS = {'lttb': 3, 'minmax': 2 * len(METRIC_FIELDS) + 2}
+
+
+def lttb_indices(x, y, max_points):
+    """
+    x: 长度为 n 的时间数组；y: 形状 (指标数, n) 的数组
+    返回保留样本的下标（升序，包含首尾）
+    """
+    n = len(x)
+    if max_points >= n or max_points < MIN_POINTS['lttb']:
+        return np.arange(n)
+
+    # 首尾各单独成桶，中间 n-2 个点均分为 max_points-2 个桶
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    # 每个桶的均值一次算好，作为"下一个桶"的代表点
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[:, 1:n - 1], edges[:-1] - 1, axis=1)
+    sizes = np.diff(edges)
+    mean_x = np.append(sums_x / sizes, x[n - 1])
+    mean_y = np.column_stack((sums_y / sizes, y[:, n - 1]))
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    a = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        ax, ay = x[a], y[:, a:a + 1]
+        cx, cy = mean_x[i + 1], mean_y[:, i + 1:i + 2]
+        # 三角形面积（省略1/2），三项指标求和
+        area = np.abs((ax - cx) * (y[:, start:end] - ay) - (ax - x[start:end]) * (cy - ay)).sum(axis=0)
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+
+def minmax_indices(y, max_points):
+    """每个桶保留各指标最小值、最大值所在的样本下标（升序，包含首尾），总数不超过 max_points"""
+    metrics, n = y.shape
+    per_bucket = 2 * metrics
+    if max_points >= n or max_points < MIN_POINTS['minmax']:
+        return np.arange(n)
+
+    buckets = (max_points - 2) // per_bucket
+    size = -(-n // buckets)  # 向上取整，最后一个桶可能不满
+    buckets = -(-n // size)
+    # 末尾补NaN后整形为 (指标数, 桶数, 桶大小)，一次求出所有桶的最小/最大值位置
+    padded = np.full((metrics, buckets * size), np.nan)
+    padded[:, :n] = y
+    padded = padded.reshape(metrics, buckets, size)
+    offsets = np.arange(buckets) * size
+    indices = np.concatenate((
+        (np.nanargmin(padded, axis=2) + offsets).ravel(),
+        (np.nanargmax(padded, axis=2) + offsets).ravel(),
+        [0, n - 1]
+    ))
+    return np.unique(indices)
+
+
+def downsample_rows(rows, max_points, method='lttb'):
+    """
+    对历史数据行（dict，含 recorded_at 与 cpu/memory/disk_value）降采样，按时间升序返回保留的行
+    行数不超过 max_points 时原样返回
+    """
+    if not max_points or len(rows) <= max_points:
+        return rows
+
+    y = np.array([[row[field] for row in rows] for field in METRIC_FIELDS], dtype=np.float64)
+    if method == 'minmax':
+        indices = minmax_indices(y, max_points)
+    else:
+        x = np.array([_timestamp(row['recorded_at']) for row in rows], dtype=np.float64)
+        indices = lttb_indices(x - x[0], y, max_points)
+    return [rows[i] for i in indices.tolist()]
+
+
+def _timestamp(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
@@ -0,0 +1,80 @@
+# 游标（keyset）分页模块
+# 解决痛点：告警历史、审计日志原先使用 query.paginate，每页都要 COUNT(*) 全表计数，并用 OFFSET 跳过前面所有行，
+# 表到百万行后越往后翻越慢
+# 做法：
+# 1. 按 (时间, id) 倒序排列，下一页从上一页最后一行之后开始：
+#    WHERE 时间 < t OR (时间 = t AND id < i) ORDER BY 时间 DESC, id DESC LIMIT n+1，
+#    配合 (时间, id) 复合索引，每一页都只是一次索引范围扫描，第N页与第1页代价相同
+#    时间为 NULL 的行无法参与 (时间, id) 比较，也无法编码为游标，不出现在分页结果中
+# 2. 游标是 (时间, id) 编码后的不透明字符串，前端原样回传即可；多取一行用于判断是否还有下一页
+# 3. 总数可选：不传 total 时不计数；total=estimate 取表统计信息中的估算行数（带筛选条件时无法估算，返回 null）；
+#    total=exact 执行精确 COUNT
+
+import json
+import base64
+from datetime import datetime
+from model import db
+
+MAX_PER_PAGE = 100
+TOTAL_MODES = ('none', 'estimate', 'exact')
+
+
+def encode_cursor(sort_value, row_id):
+    """把 (时间, id) 编码为URL安全的游标字符串"""
+    raw = json.dumps([sort_value.isoformat(), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游标，格式不正确时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+
+
+def keyset_page(query, time_column, id_column, cursor=None, per_page=20):
+    """
+    按 (time_column, id_column) 倒序取一页
+    返回 (本页对象列表, 下一页游标)，没有下一页时游标为 None；time_column 为 NULL 的行不返回
+    """
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    query = query.filter(time_column.isnot(None))
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        query = query.filter(db.or_(
+            time_column < sort_value,
+            db.and_(time_column == sort_value, id_column < row_id)
+        ))
+    items = query.order_by(time_column.desc(), id_column.desc()).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, time_column.key), getattr(last, id_column.key))
+    return items, next_cursor
+
+
+#读取InnoDB表统计信息中的估算行数，取不到时（如非MySQL数据库）返回 None
+def estimate_total(table_name):
+    try:
+        return db.session.execute(db.text(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table_name"
+        ), {'table_name': table_name}).scalar()
+    except Exception as e:
+        db.session.rollback()
+        print(f"读取 {table_name} 估算行数失败: {e}")
+        return None
+
+
+def page_total(query, table_name, mode, filtered=False):
+    """按 total 参数计算总数：none 不计数，estimate 估算（有筛选条件时为 None），exact 精确计数"""
+    if mode == 'exact':
+        return query.order_by(None).count()
+    if mode == 'estimate' and not filtered:
+        return estimate_total(table_name)
+    return None
@@ -0,0 +1,102 @@
+# monitor_data 按天分区维护模块
+# 解决痛点：monitor_data 持续增长，按时间 DELETE 清理旧数据会长时间锁表、撑大undo日志
+# 做法：monitor_data 使用 RANGE(TO_DAYS(recorded_at)) 按天分区（迁移 c5e07f3a9d12），每天一个分区 pYYYYMMDD，
+# 另有 p_future（VALUES LESS THAN MAXVALUE）兜底接收未预建分区日期的数据。
+# - 预建分区：把空的 p_future 拆分出未来N天的分区（REORGANIZE PARTITION，p_future为空时只改元数据）
+# - 过期清理：整分区 DROP PARTITION，耗时与数据量无关
+# - 按 recorded_at 范围查询时，MySQL 自动裁剪到相关分区
+
+from datetime import date, datetime, timedelta
+from sqlalchemy import text
+
+TABLE_NAME = 'monitor_data'
+FUTURE_PARTITION = 'p_future'
+# MySQL TO_DAYS('0001-01-01') = 366，Python date(1, 1, 1).toordinal() = 1
+_TO_DAYS_OFFSET = 365
+
+
+def to_days(day):
+    """与 MySQL TO_DAYS() 一致的天数"""
+    return day.toordinal() + _TO_DAYS_OFFSET
+
+
+def from_days(days):
+    return date.fromordinal(days - _TO_DAYS_OFFSET)
+
+
+def partition_name(day):
+    """保存 day 当天数据的分区名"""
+    return f"p{day:%Y%m%d}"
+
+
+def partition_clause(day):
+    return f"PARTITION {partition_name(day)} VALUES LESS THAN ({to_days(day + timedelta(days=1))})"
+
+
+def list_partitions(session, table=TABLE_NAME):
+    """
+    返回 [(分区名, 上界日期或None(MAXVALUE), 估算行数), ...]，按分区顺序排列
+    上界日期为开区间：分区内数据都早于该日期；未分区的表返回空列表
+    """
+    rows = session.execute(text(
+        "SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION"
+    ), {'table': table}).all()
+    partitions = []
+    for name, description, table_rows in rows:
+        upper = None if description == 'MAXVALUE' else from_days(int(description))
+        partitions.append((name, upper, table_rows or 0))
+    return partitions
+
+
+def is_partitioned(session, table=TABLE_NAME):
+    return bool(list_partitions(session, table))
+
+
+def ensure_future_partitions(session, days_ahead=7, today=None, dry_run=False):
+    """预建从今天起 days_ahead 天内缺失的日分区，返回新建的分区名列表"""
+    today = today or date.today()
+    partitions = list_partitions(session)
+    if not partitions:
+        return []
+
+    # 已有的最大上界之后才需要新建（RANGE分区只能在末尾追加）；维护任务中断过时会补齐中间缺失的日期
+    bounded = [upper for _, upper, _ in partitions if upper is not None]
+    start = max(bounded) if bounded else today
+    days = [start + timedelta(days=i) for i in range((today + timedelta(days=days_ahead) - start).days + 1)]
+    if not days:
+        return []
+
+    clauses = [partition_clause(day) for day in days]
+    if partitions[-1][0] == FUTURE_PARTITION:
+        sql = (f"ALTER TABLE {TABLE_NAME} REORGANIZE PARTITION {FUTURE_PARTITION} INTO ("
+               + ", ".join(clauses) + f", PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE)")
+    else:
+        sql = f"ALTER TABLE {TABLE_NAME} ADD PARTITION (" + ", ".join(clauses) + ")"
+    if not dry_run:
+        session.execute(text(sql))
+    return [partition_name(day) for day in days]
+
+
+def drop_expired_partitions(session, retention_days=7, today=None, dry_run=False):
+    """
+    删除全部数据都早于保留期的分区（上界 <= 今天 - retention_days），返回 [(分区名, 估算行数), ...]
+    按天粒度删除，实际保留的数据可能比 retention_days 多不到一天；至少保留一个有界分区
+    """
+    today = today or date.today()
+    cutoff = today - timedelta(days=retention_days)
+    partitions = list_partitions(session)
+    bounded = [(name, upper, table_rows) for name, upper, table_rows in partitions if upper is not None]
+
+    expired = [(name, table_rows) for name, upper, table_rows in bounded[:-1] if upper <= cutoff]
+    if expired and not dry_run:
+        session.execute(text(f"ALTER TABLE {TABLE_NAME} DROP PARTITION " + ", ".join(name for name, _ in expired)))
+    return expired
+
+
+def maintain(session, retention_days=7, days_ahead=7, dry_run=False):
+    """预建未来分区并删除过期分区，返回执行结果"""
+    created = ensure_future_partitions(session, days_ahead, dry_run=dry_run)
+    dropped = drop_expired_partitions(session, retention_days, dry_run=dry_run)
+    return {'created': created, 'dropped': dropped, 'checked_at': str(datetime.now())}
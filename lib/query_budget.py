@@ -0,0 +1,62 @@
+# SQL查询预算模块
+# 解决痛点：列表接口逐行访问关联对象（server.users、server.group）产生N+1查询，服务器越多查询越多，
+# 而问题只在服务器数量大时才暴露
+# 做法：
+# 1. 在 SQLAlchemy 引擎上监听 before_cursor_execute，统计当前线程内执行的SQL条数
+# 2. 接口用 @query_budget(n) 声明SQL条数上限（与服务器数量无关的常数）；
+#    超出时通过应用日志记录告警，QUERY_BUDGET_STRICT 开启（默认随调试模式）时直接返回500，便于开发时发现
+# 3. tests/test_query_budget.py 与 scripts/check_query_budget.py 在不同服务器数量下调用接口，检查SQL条数保持不变且不超出预算
+
+import threading
+from functools import wraps
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from lib.response import response
+from config.setting import QUERY_BUDGET_STRICT
+
+_local = threading.local()
+
+
+class QueryCounter:
+    """统计 with 块内当前线程执行的SQL条数，可嵌套使用"""
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __enter__(self):
+        stack = getattr(_local, 'counters', None)
+        if stack is None:
+            stack = _local.counters = []
+        stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _local.counters.remove(self)
+        return False
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    for counter in getattr(_local, 'counters', ()):
+        counter.count += 1
+        counter.statements.append(statement)
+
+
+# 接口SQL条数预算装饰器，放在权限装饰器之上，鉴权查询也计入预算
+def query_budget(max_queries):
+    def decorator(func):
+        @wraps(func)
+        def decorated_function(*args, **kwargs):
+            with QueryCounter() as counter:
+                result = func(*args, **kwargs)
+            if counter.count > max_queries:
+                message = f"{func.__qualname__} 执行了 {counter.count} 条SQL，超出预算 {max_queries} 条"
+                current_app.logger.warning(message)
+                if QUERY_BUDGET_STRICT:
+                    return response(message=message, code=500)
+            return result
+        decorated_function.query_budget = max_queries
+        return decorated_function
+    return decorator
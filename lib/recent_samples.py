@@ -0,0 +1,132 @@
+# 最近样本环形缓冲模块
+# 解决痛点：持续告警检查每次都按IP查询最近2分钟的监控数据（每项指标一次范围扫描），
+# 且查询起点用 datetime.utcnow() 与 datetime.now() 写入的 recorded_at 比较，时区不一致导致窗口错位
+# 做法：
+# 1. 每台服务器一个定长环形缓冲（array 存储时间戳与 cpu/memory/disk），上报样本进入写入链路时同步写入
+# 2. 持续告警只在缓冲上计算，时间统一使用样本自身的 recorded_at（本地时间），窗口以被检查样本的时间为终点
+# 3. 仅在冷启动时查库：本进程第一次检查某台服务器时，从数据库加载一次窗口内的数据，之后只用缓冲中的样本
+# 注意：缓冲在每个gunicorn worker进程内独立存在，同一服务器的样本可能分散在不同进程，
+# 每个进程只按自己收到的样本判断；缓冲样本不足时视为数据不足，不再查库补齐
+
+import threading
+from array import array
+from datetime import timedelta
+from config.setting import ALERT_RING_SIZE, ALERT_SUSTAINED_MINUTES
+
+METRICS = ('cpu', 'memory', 'disk')
+
+
+class SampleRing:
+    """定长环形缓冲，保存最近 capacity 条样本；写满后覆盖最旧的样本"""
+
+    def __init__(self, capacity=128):
+        self.capacity = capacity
+        self._timestamps = array('d', [0.0]) * capacity
+        self._values = {metric: array('d', [0.0]) * capacity for metric in METRICS}
+        self._next = 0      # 下一次写入的位置
+        self._size = 0
+
+    def append(self, timestamp, cpu_value, memory_value, disk_value):
+        index = self._next
+        self._timestamps[index] = timestamp
+        self._values['cpu'][index] = cpu_value
+        self._values['memory'][index] = memory_value
+        self._values['disk'][index] = disk_value
+        self._next = (index + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def timestamps(self):
+        return set(self._timestamps[i] for i in range(self._size))
+
+    def window(self, metric_type, start, end):
+        """返回时间在 [start, end] 内的该指标取值（不要求样本按时间顺序写入）"""
+        timestamps = self._timestamps
+        values = self._values[metric_type]
+        return [values[i] for i in range(self._size) if start <= timestamps[i] <= end]
+
+    def __len__(self):
+        return self._size
+
+
+class RecentSampleStore:
+    def __init__(self, capacity=128, window_minutes=2):
+        self.capacity = capacity
+        self.window_minutes = window_minutes
+        self._rings = {}          # server_id -> SampleRing
+        self._loaded = set()      # 已从数据库加载过的 server_id（冷启动只加载一次）
+        self._lock = threading.Lock()
+        self.cold_loads = 0
+
+    def add_rows(self, rows):
+        """写入一批监控数据行（monitor_data 字典）"""
+        with self._lock:
+            for row in rows:
+                ring = self._rings.get(row['server_id'])
+                if ring is None:
+                    ring = self._rings[row['server_id']] = SampleRing(self.capacity)
+                ring.append(row['recorded_at'].timestamp(), float(row['cpu_value']),
+                            float(row['memory_value']), float(row['disk_value']))
+
+    def window(self, server_id, metric_type, end, minutes=None, min_points=3):
+        """
+        返回服务器在 [end - minutes, end] 窗口内该指标的取值
+        本进程第一次检查该服务器且样本数不足 min_points 时从数据库加载一次（需在应用上下文中调用），
+        之后只在缓冲上计算
+        """
+        minutes = minutes or self.window_minutes
+        start = end - timedelta(minutes=minutes)
+        start_ts, end_ts = start.timestamp(), end.timestamp()
+
+        with self._lock:
+            ring = self._rings.get(server_id)
+            values = ring.window(metric_type, start_ts, end_ts) if ring else []
+        if len(values) >= min_points or not self._load(server_id, start, end):
+            return values
+
+        with self._lock:
+            return self._rings[server_id].window(metric_type, start_ts, end_ts)
+
+    def _load(self, server_id, start, end):
+        """冷启动：从数据库加载窗口内缓冲中没有的样本，每台服务器只执行一次，返回是否执行了加载"""
+        with self._lock:
+            if server_id in self._loaded:
+                return False
+            self._loaded.add(server_id)
+
+        from model import MonitorData
+        try:
+            rows = MonitorData.get_values(server_id, start, end)
+        except Exception:
+            # 查询失败时允许下次检查重新加载
+            with self._lock:
+                self._loaded.discard(server_id)
+            raise
+
+        with self._lock:
+            ring = self._rings.get(server_id)
+            if ring is None:
+                ring = self._rings[server_id] = SampleRing(self.capacity)
+            existing = ring.timestamps()
+            for recorded_at, cpu_value, memory_value, disk_value in rows:
+                timestamp = recorded_at.timestamp()
+                if timestamp not in existing:
+                    ring.append(timestamp, float(cpu_value), float(memory_value), float(disk_value))
+            self.cold_loads += 1
+        return True
+
+    def forget(self, server_id):
+        """服务器删除时清理缓冲"""
+        with self._lock:
+            self._rings.pop(server_id, None)
+            self._loaded.discard(server_id)
+
+    def stats(self):
+        with self._lock:
+            return {'servers': len(self._rings), 'capacity': self.capacity, 'cold_loads': self.cold_loads}
+
+
+# 全局最近样本缓冲
+recent_samples = RecentSampleStore(
+    capacity=ALERT_RING_SIZE,
+    window_minutes=ALERT_SUSTAINED_MINUTES
+)
@@ -0,0 +1,143 @@
+# 总览接口响应缓存模块
+# 解决痛点：首页每30秒轮询 /monitor/data、/monitor/stats，没有新样本时每次仍要查库、组装并序列化完整响应
+# 做法：
+# 1. 数据版本号取最新样本ID（MonitorData.latest_version），进程内缓存 RESPONSE_CACHE_TTL 秒；
+#    本进程写入器落库成功后立即失效，其它gunicorn worker的版本号最迟在TTL后刷新
+# 2. ETag = 数据版本号 + 接口与查询参数摘要，响应头带 Cache-Control: private, no-cache，浏览器每次轮询都带
+#    If-None-Match 重新验证；版本未变时直接返回 304，不查业务数据也不序列化
+# 3. 需要返回完整响应时，按 接口+查询参数 缓存已序列化的JSON，版本号相同则直接复用
+# 注意：ETag只随监控数据变化；服务器/用户等管理变更由当前进程主动失效，其它进程在下一个样本写入后生效
+
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from functools import wraps
+from flask import request, current_app
+from lib.serializer import dumps
+from config.setting import RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_ENTRIES
+
+CACHE_CONTROL = 'private, no-cache'
+
+
+class ResponseCache:
+    def __init__(self, ttl=5, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._version = None
+        self._version_expires = 0.0
+        self._generation = 0      # 管理变更计数，计入ETag
+        self._entries = OrderedDict()  # 缓存键 -> (数据版本, 已序列化的响应体)
+        self._lock = threading.Lock()
+
+        self.not_modified = 0
+        self.hits = 0
+        self.misses = 0
+        self.version_loads = 0
+        self.invalidations = 0
+
+    def version(self):
+        """当前数据版本（字符串），TTL内不查库"""
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and self._version_expires > now:
+                return self._version
+            invalidations, generation = self.invalidations, self._generation
+        from model import MonitorData
+        version = f"{MonitorData.latest_version()}.{generation}"
+        with self._lock:
+            self.version_loads += 1
+            # 查询期间发生了失效则不保存，下次请求重新读取
+            if self.invalidations == invalidations:
+                self._version = version
+                self._version_expires = now + self.ttl
+        return version
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def mark_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def put(self, key, version, body):
+        with self._lock:
+            self._entries[key] = (version, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, metadata=False):
+        """
+        数据写入后调用：下次请求重新读取版本号
+        metadata=True 表示服务器、用户等管理数据变更，此时版本号不变也要让ETag与缓存失效
+        """
+        with self._lock:
+            self.invalidations += 1
+            self._version = None
+            if metadata:
+                self._generation += 1
+                self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'ttl': self.ttl,
+                'entries': len(self._entries),
+                'version': self._version,
+                'not_modified': self.not_modified,
+                'hits': self.hits,
+                'misses': self.misses,
+                'version_loads': self.version_loads,
+                'invalidations': self.invalidations
+            }
+
+
+# 全局响应缓存（每个gunicorn worker进程一份）
+response_cache = ResponseCache(ttl=RESPONSE_CACHE_TTL, max_entries=RESPONSE_CACHE_MAX_ENTRIES)
+
+
+#缓存键：接口 + 排序后的查询参数（接口仅管理员可访问，返回内容与具体用户无关）
+def _cache_key(func):
+    args = '&'.join(f"{key}={value}" for key, value in sorted(request.args.items(multi=True)))
+    return f"{func.__qualname__}?{args}"
+
+
+# 条件GET与响应缓存装饰器，放在权限装饰器之下，先鉴权再比对ETag
+# 只缓存成功响应（code为0），失败响应照常返回
+def cached_response(func):
+    @wraps(func)
+    def decorated_function(*args, **kwargs):
+        if not RESPONSE_CACHE_ENABLED:
+            return func(*args, **kwargs)
+
+        version = response_cache.version()
+        key = _cache_key(func)
+        etag = f"{version}-{zlib.crc32(key.encode()):08x}"
+        headers = {'Cache-Control': CACHE_CONTROL}
+
+        if request.if_none_match.contains_weak(etag):
+            response_cache.mark_not_modified()
+            resp = current_app.response_class(status=304, headers=headers)
+            resp.set_etag(etag)
+            return resp
+
+        body = response_cache.get(key, version)
+        if body is None:
+            result = func(*args, **kwargs)
+            if not isinstance(result, dict) or result.get('code') != 0:
+                return result
+            body = dumps(result)
+            response_cache.put(key, version, body)
+
+        resp = current_app.response_class(body, mimetype='application/json', headers=headers)
+        resp.set_etag(etag)
+        return resp
+    return decorated_function
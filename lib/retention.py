@@ -0,0 +1,195 @@
+# 数据分级保留模块
+# 解决痛点：清理脚本只会"一条 DELETE 删掉7天前的原始数据"，大表上长时间持有行锁、撑大undo日志，阻塞上报写入
+# 做法：
+# 1. 每类数据独立配置保留天数：原始数据、1m/5m/1h汇总、告警历史、审计日志（0表示永久保留）
+# 2. 原始数据已按天分区时直接删除过期分区（见 lib/partition.py），使用压缩数据块存储时整块删除
+# 3. 其余情况按主键范围分批删除：单批最多 batch_size 行、每批单独提交，批之间休眠让出资源；
+#    清理会话使用较短的行锁等待超时，遇到锁冲突时放弃该批、稍后重试，不与写入长时间互相等待
+# 4. 统计每类数据的删除行数、耗时、最慢一批耗时、锁超时次数，以及运行期间InnoDB行锁等待的增量
+
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from config.setting import (MONITOR_RETENTION_DAYS, RETENTION_ROLLUP_1M_DAYS, RETENTION_ROLLUP_5M_DAYS,
+                            RETENTION_ROLLUP_1H_DAYS, RETENTION_ALERT_HISTORY_DAYS, RETENTION_AUDIT_LOG_DAYS,
+                            RETENTION_BATCH_SIZE, RETENTION_SLEEP_MS, RETENTION_LOCK_WAIT_TIMEOUT, METRICS_BACKEND)
+
+# name: 策略名称；table: 表名；time_column: 判断过期的时间列；days: 保留天数
+# key: 'id' 按自增主键范围分批；'server_id' 按 (server_id, 时间) 复合主键逐台服务器分批
+RetentionPolicy = namedtuple('RetentionPolicy', ['name', 'table', 'time_column', 'days', 'key'])
+
+DEFAULT_POLICIES = (
+    RetentionPolicy('raw', 'monitor_data', 'recorded_at', MONITOR_RETENTION_DAYS, 'id'),
+    RetentionPolicy('rollup_1m', 'monitor_rollup_1m', 'bucket_start', RETENTION_ROLLUP_1M_DAYS, 'server_id'),
+    RetentionPolicy('rollup_5m', 'monitor_rollup_5m', 'bucket_start', RETENTION_ROLLUP_5M_DAYS, 'server_id'),
+    RetentionPolicy('rollup_1h', 'monitor_rollup_1h', 'bucket_start', RETENTION_ROLLUP_1H_DAYS, 'server_id'),
+    RetentionPolicy('alert_history', 'alert_history', 'triggered_at', RETENTION_ALERT_HISTORY_DAYS, 'id'),
+    RetentionPolicy('audit_logs', 'audit_logs', 'created_at', RETENTION_AUDIT_LOG_DAYS, 'id'),
+)
+
+# MySQL 行锁等待超时错误码
+_LOCK_WAIT_TIMEOUT = 1205
+
+
+class RetentionEngine:
+    def __init__(self, session, batch_size=RETENTION_BATCH_SIZE, sleep_ms=RETENTION_SLEEP_MS,
+                 lock_wait_timeout=RETENTION_LOCK_WAIT_TIMEOUT, max_retries=5, dry_run=False):
+        self.session = session
+        self.batch_size = batch_size
+        self.sleep_seconds = sleep_ms / 1000.0
+        self.lock_wait_timeout = lock_wait_timeout
+        self.max_retries = max_retries
+        self.dry_run = dry_run
+
+    def run(self, policies=DEFAULT_POLICIES, now=None):
+        """按策略依次清理，返回 {'policies': [每个策略的结果], 'elapsed_ms', 'row_lock_wait_ms', 'row_lock_waits'}"""
+        now = now or datetime.now()
+        if not self.dry_run:
+            self.session.execute(text("SET SESSION innodb_lock_wait_timeout = :timeout"),
+                                 {'timeout': self.lock_wait_timeout})
+        lock_before = self._row_lock_status()
+        start = time.perf_counter()
+
+        results = []
+        for policy in policies:
+            if policy.days <= 0:
+                results.append(self._result(policy, None, skipped='永久保留'))
+                continue
+            cutoff = now - timedelta(days=policy.days)
+            try:
+                results.append(self._purge(policy, cutoff))
+            except Exception as e:
+                self.session.rollback()
+                results.append(self._result(policy, cutoff, error=str(e)))
+
+        lock_after = self._row_lock_status()
+        return {
+            'policies': results,
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 1),
+            # InnoDB行锁等待为全库统计，包含运行期间其它会话的等待，用于判断清理是否影响了写入
+            'row_lock_wait_ms': lock_after[0] - lock_before[0] if lock_before and lock_after else None,
+            'row_lock_waits': lock_after[1] - lock_before[1] if lock_before and lock_after else None
+        }
+
+    def _purge(self, policy, cutoff):
+        if policy.table == 'monitor_data' and METRICS_BACKEND == 'chunks':
+            # 使用压缩数据块存储时整块删除，块数远少于行数
+            from lib.chunk_store import get_chunk_store
+            start = time.perf_counter()
+            result = self._result(policy, cutoff)
+            if not self.dry_run:
+                result.update(batches=get_chunk_store().drop_before(cutoff))
+            result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            return result
+        if policy.table == 'monitor_data':
+            from lib.partition import is_partitioned, drop_expired_partitions
+            if is_partitioned(self.session):
+                start = time.perf_counter()
+                today = (cutoff + timedelta(days=policy.days)).date()
+                dropped = drop_expired_partitions(self.session, policy.days, today=today, dry_run=self.dry_run)
+                result = self._result(policy, cutoff)
+                result.update(rows=sum(rows for _, rows in dropped), batches=len(dropped),
+                              partitions=[name for name, _ in dropped],
+                              elapsed_ms=round((time.perf_counter() - start) * 1000, 1))
+                return result
+        if policy.key == 'server_id':
+            return self._purge_by_server(policy, cutoff)
+        return self._purge_by_id(policy, cutoff)
+
+    def _purge_by_id(self, policy, cutoff):
+        """按自增主键范围分批删除：先取过期数据的主键范围，再按 batch_size 宽度的区间逐段删除"""
+        result = self._result(policy, cutoff)
+        start = time.perf_counter()
+        low, high = self.session.execute(text(
+            f"SELECT MIN(id), MAX(id) FROM {policy.table} WHERE {policy.time_column} < :cutoff"
+        ), {'cutoff': cutoff}).one()
+        self.session.commit()
+        if low is None:
+            result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            return result
+
+        sql = text(f"DELETE FROM {policy.table} WHERE id >= :low AND id < :high AND {policy.time_column} < :cutoff")
+        while low <= high:
+            params = {'low': low, 'high': low + self.batch_size, 'cutoff': cutoff}
+            if self._delete_batch(sql, params, result) is None:
+                break
+            low += self.batch_size
+        result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    def _purge_by_server(self, policy, cutoff):
+        """汇总表主键为 (server_id, 时间)，逐台服务器按主键前缀范围删除，每批最多 batch_size 行"""
+        result = self._result(policy, cutoff)
+        start = time.perf_counter()
+        server_ids = self.session.execute(text(f"SELECT DISTINCT server_id FROM {policy.table}")).scalars().all()
+        self.session.commit()
+
+        sql = text(f"DELETE FROM {policy.table} WHERE server_id = :server_id AND {policy.time_column} < :cutoff "
+                   f"ORDER BY {policy.time_column} LIMIT {self.batch_size}")
+        for server_id in server_ids:
+            while True:
+                deleted = self._delete_batch(sql, {'server_id': server_id, 'cutoff': cutoff}, result)
+                if deleted is None or deleted < self.batch_size or self.dry_run:
+                    break
+            if deleted is None:
+                break
+        result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    def _delete_batch(self, sql, params, result):
+        """执行一批删除并提交，锁等待超时时休眠后重试；返回删除行数，重试耗尽返回None"""
+        if self.dry_run:
+            result['batches'] += 1
+            return 0
+        for _ in range(self.max_retries + 1):
+            batch_start = time.perf_counter()
+            try:
+                deleted = self.session.execute(sql, params).rowcount
+                self.session.commit()
+            except OperationalError as e:
+                self.session.rollback()
+                if e.orig is None or e.orig.args[0] != _LOCK_WAIT_TIMEOUT:
+                    raise
+                result['lock_timeouts'] += 1
+                time.sleep(self.sleep_seconds * 10)
+                continue
+
+            batch_ms = (time.perf_counter() - batch_start) * 1000
+            result['rows'] += deleted
+            result['batches'] += 1
+            result['max_batch_ms'] = round(max(result['max_batch_ms'], batch_ms), 1)
+            if deleted:
+                time.sleep(self.sleep_seconds)
+            return deleted
+        result['error'] = '锁等待超时次数过多，已中止'
+        return None
+
+    def _row_lock_status(self):
+        """读取全局 Innodb_row_lock_time(毫秒) 与 Innodb_row_lock_waits，无权限时返回None"""
+        try:
+            status = dict(self.session.execute(text(
+                "SHOW GLOBAL STATUS WHERE Variable_name IN ('Innodb_row_lock_time', 'Innodb_row_lock_waits')"
+            )).all())
+            self.session.commit()
+            return int(status['Innodb_row_lock_time']), int(status['Innodb_row_lock_waits'])
+        except Exception:
+            self.session.rollback()
+            return None
+
+    @staticmethod
+    def _result(policy, cutoff, **extra):
+        result = {
+            'name': policy.name,
+            'table': policy.table,
+            'days': policy.days,
+            'cutoff': str(cutoff) if cutoff else None,
+            'rows': 0,
+            'batches': 0,
+            'max_batch_ms': 0.0,
+            'lock_timeouts': 0,
+            'elapsed_ms': 0.0
+        }
+        result.update(extra)
+        return result
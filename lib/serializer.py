@@ -0,0 +1,58 @@
+# JSON序列化模块
+# 解决痛点：所有接口的 response(...) 字典经 flask_restful 默认的标准库 json 编码，且 datetime/Decimal 无法直接编码，
+# 只能在模型和接口中逐字段 str()/float() 转换后再序列化，行数多时（历史数据、导出）序列化成为主要开销
+# 做法：
+# 1. 优先使用 orjson（C实现，直接输出UTF-8字节），未安装时回退到标准库 json，两者解析结果一致
+# 2. datetime 输出为与 str(datetime) 相同的 'YYYY-MM-DD HH:MM:SS' 格式，Decimal 输出为数字，
+#    调用方无需预先转换，已有接口的返回格式保持不变
+# 3. output_json 注册为 flask_restful 的 application/json 表示（见 router/__init__.py），所有接口生效；
+#    响应缓存与流式导出也使用同一序列化函数
+# 基准：scripts/bench_serializer.py
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from flask import make_response
+
+try:
+    import orjson
+except ImportError:  # 未安装时回退到标准库 json
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+#orjson 与标准库都不能直接编码的类型
+def _default(value):
+    if isinstance(value, datetime):
+        return str(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"无法序列化 {type(value).__name__} 类型")
+
+
+def stdlib_dumps(data, newline=True):
+    """标准库实现：紧凑分隔符，返回UTF-8字节（保留 ensure_ascii，标准库在此模式下编码更快）"""
+    text = json.dumps(data, separators=(',', ':'), default=_default)
+    return (text + '\n' if newline else text).encode('utf-8')
+
+
+if orjson is not None:
+    # datetime 交给 _default 处理，保持与 str(datetime) 相同的格式（orjson 原生输出带 'T' 的ISO格式）
+    _OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps(data, newline=True):
+        """序列化为UTF-8字节，newline=True 时末尾追加换行（与 flask_restful 默认输出一致）"""
+        return orjson.dumps(data, default=_default,
+                            option=(_OPTIONS | orjson.OPT_APPEND_NEWLINE) if newline else _OPTIONS)
+else:
+    dumps = stdlib_dumps
+
+
+def output_json(data, code, headers=None):
+    """flask_restful 的 application/json 表示：用 dumps 生成响应体"""
+    resp = make_response(dumps(data), code)
+    resp.headers.extend(headers or {})
+    return resp
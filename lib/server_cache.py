@@ -0,0 +1,181 @@
+# 服务器身份缓存模块
+# 解决痛点：一条监控数据在入库、告警链路上要按IP查询服务器至少5次，外加告警规则查询
+# 做法：进程内缓存 IP/ID -> 服务器身份（ID、名称、告警邮箱、告警规则阈值），带TTL过期；
+# 服务器、关联用户、告警规则变更时主动失效。稳定状态下入库与告警链路不再产生查库。
+# 注意：缓存在每个gunicorn worker进程内独立存在，主动失效只作用于当前进程，其它进程依赖TTL过期。
+
+import threading
+import time
+from collections import namedtuple
+from config.setting import SERVER_CACHE_TTL, SERVER_CACHE_NEGATIVE_TTL
+
+# 服务器身份快照（不可变，可安全地跨线程共享）
+# thresholds: {指标类型: 自定义阈值}，仅包含已启用的告警规则
+ServerIdentity = namedtuple('ServerIdentity', ['id', 'ip_address', 'server_name', 'emails', 'thresholds'])
+
+
+#缓存键统一为int：字符串形式的ID与整数ID命中同一条缓存，无法转换时返回None
+def _normalize_id(server_id):
+    if isinstance(server_id, bool):
+        return None
+    try:
+        return int(server_id)
+    except (TypeError, ValueError):
+        return None
+
+
+class ServerIdentityCache:
+    def __init__(self, ttl=60, negative_ttl=10):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl  # 不存在的IP/ID也缓存一小段时间，防止未登记的Agent反复打穿到数据库
+        self._by_ip = {}   # ip -> (ServerIdentity 或 None, 过期时间)
+        self._by_id = {}   # id -> (ServerIdentity 或 None, 过期时间)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_by_ip(self, ip_address):
+        """根据IP获取服务器身份，不存在返回None"""
+        return self._get(self._by_ip, ip_address, ip_addresses=[ip_address])
+
+    def get_by_id(self, server_id):
+        """根据ID获取服务器身份，不存在或ID不是整数返回None（"1" 与 1 视为同一ID）"""
+        server_id = _normalize_id(server_id)
+        if server_id is None:
+            return None
+        return self._get(self._by_id, server_id, server_ids=[server_id])
+
+    def get_many(self, server_ids=None, ip_addresses=None):
+        """
+        批量获取服务器身份，未命中的部分合并为一次查询加载
+        返回 (by_id, by_ip) 两个字典，只包含存在的服务器
+        """
+        server_ids = {server_id for server_id in map(_normalize_id, server_ids or []) if server_id is not None}
+        ip_addresses = set(ip_addresses or [])
+        by_id, by_ip = {}, {}
+        missing_ids, missing_ips = [], []
+
+        now = time.monotonic()
+        with self._lock:
+            for server_id in server_ids:
+                entry = self._by_id.get(server_id)
+                if entry and entry[1] > now:
+                    self.hits += 1
+                    if entry[0]:
+                        by_id[server_id] = entry[0]
+                else:
+                    self.misses += 1
+                    missing_ids.append(server_id)
+            for ip_address in ip_addresses:
+                entry = self._by_ip.get(ip_address)
+                if entry and entry[1] > now:
+                    self.hits += 1
+                    if entry[0]:
+                        by_ip[ip_address] = entry[0]
+                else:
+                    self.misses += 1
+                    missing_ips.append(ip_address)
+
+        if missing_ids or missing_ips:
+            loaded = self._load(missing_ids, missing_ips)
+            for identity in loaded:
+                if identity.id in server_ids:
+                    by_id[identity.id] = identity
+                if identity.ip_address in ip_addresses:
+                    by_ip[identity.ip_address] = identity
+        return by_id, by_ip
+
+    def _get(self, index, key, server_ids=None, ip_addresses=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = index.get(key)
+            if entry and entry[1] > now:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        loaded = self._load(server_ids or [], ip_addresses or [])
+        return loaded[0] if loaded else None
+
+    def _load(self, server_ids, ip_addresses):
+        """从数据库加载服务器身份：服务器+关联用户+告警规则，共3次查询，与数量无关"""
+        from model import db, Server, AlertRule
+
+        servers = Server.query.options(db.selectinload(Server.users)).filter(
+            db.or_(Server.id.in_(server_ids), Server.ip_address.in_(ip_addresses))
+        ).all()
+
+        thresholds = {server.id: {} for server in servers}
+        if servers:
+            rules = AlertRule.query.filter(
+                AlertRule.server_id.in_(list(thresholds.keys())),
+                AlertRule.is_enabled == True
+            ).all()
+            for rule in rules:
+                thresholds[rule.server_id].setdefault(rule.metric_type, float(rule.threshold))
+
+        identities = [
+            ServerIdentity(
+                id=server.id,
+                ip_address=server.ip_address,
+                server_name=server.server_name,
+                emails=tuple(user.email for user in server.users),
+                thresholds=thresholds[server.id]
+            )
+            for server in servers
+        ]
+
+        now = time.monotonic()
+        with self._lock:
+            for identity in identities:
+                self._by_id[identity.id] = (identity, now + self.ttl)
+                self._by_ip[identity.ip_address] = (identity, now + self.ttl)
+            # 查询不到的ID/IP做短时间的负缓存
+            found_ids = {identity.id for identity in identities}
+            found_ips = {identity.ip_address for identity in identities}
+            for server_id in server_ids:
+                if server_id not in found_ids:
+                    self._by_id[server_id] = (None, now + self.negative_ttl)
+            for ip_address in ip_addresses:
+                if ip_address not in found_ips:
+                    self._by_ip[ip_address] = (None, now + self.negative_ttl)
+        return identities
+
+    def invalidate(self, server_id=None, ip_address=None):
+        """使指定服务器的缓存失效，按ID失效时会同时清除其IP索引"""
+        with self._lock:
+            self.invalidations += 1
+            if server_id is not None:
+                entry = self._by_id.pop(server_id, None)
+                if entry and entry[0]:
+                    self._by_ip.pop(entry[0].ip_address, None)
+            if ip_address is not None:
+                entry = self._by_ip.pop(ip_address, None)
+                if entry and entry[0]:
+                    self._by_id.pop(entry[0].id, None)
+
+    def clear(self):
+        """清空全部缓存（如用户邮箱变更，影响面无法精确定位时）"""
+        with self._lock:
+            self.invalidations += 1
+            self._by_ip.clear()
+            self._by_id.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'ttl': self.ttl,
+                'negative_ttl': self.negative_ttl,
+                'size': len(self._by_id),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'invalidations': self.invalidations
+            }
+
+
+# 全局服务器身份缓存
+server_cache = ServerIdentityCache(ttl=SERVER_CACHE_TTL, negative_ttl=SERVER_CACHE_NEGATIVE_TTL)
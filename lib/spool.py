@@ -0,0 +1,499 @@
+# 监控数据落盘暂存模块（Spool）
+# 解决痛点：接口返回"已接收"时数据还在内存队列里，gunicorn回收worker或容器重启会丢数据
+# 做法：
+# 1. 接口确认前先把样本追加写入本地暂存文件（只追加、按大小分段轮转，可选mmap写入）；
+#    多个请求的写入由后台线程合并为一次 write + fsync（组提交），单请求只需等待所在组落盘。
+# 2. 回放线程持续把暂存文件中的样本批量写入 monitor_data，并记录检查点；整段写完后删除该段。
+# 3. 每个进程使用独立的子目录并持有文件锁；进程退出后，其它进程的回放线程会接管并排空该目录。
+# 4. 写库因数据本身出错（越界、格式错误等）或同一批反复失败时逐条写入，仍失败的样本移入 quarantine/ 目录并打印日志，
+#    不再阻塞后面的数据；数据库不可用时不隔离，保持在检查点处稍后重试。
+# 语义为"至少一次"：写库成功但检查点未更新时崩溃，重启后该批样本可能重复写入一次。
+
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy.exc import DataError, IntegrityError, StatementError
+
+# 记录格式：| 长度 uint32 | crc32 uint32 | JSON载荷 |，长度为0表示段内数据结束
+_HEADER = struct.Struct('<II')
+_SEGMENT_SUFFIX = '.seg'
+_CHECKPOINT_FILE = 'checkpoint.json'
+_LOCK_FILE = 'LOCK'
+_QUARANTINE_DIR = 'quarantine'
+
+
+def encode_record(row):
+    """把一条样本编码为暂存记录"""
+    payload = json.dumps({
+        's': row['server_id'],
+        'i': row['ip_address'],
+        'c': row['cpu_value'],
+        'm': row['memory_value'],
+        'd': row['disk_value'],
+        'x': row.get('extra_metrics'),
+        't': row['recorded_at'].timestamp()
+    }, separators=(',', ':')).encode('utf-8')
+    return _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def decode_record(payload):
+    """把暂存记录载荷还原为 monitor_data 行"""
+    item = json.loads(payload)
+    return {
+        'server_id': item['s'],
+        'ip_address': item['i'],
+        'cpu_value': item['c'],
+        'memory_value': item['m'],
+        'disk_value': item['d'],
+        'extra_metrics': item.get('x'),
+        'recorded_at': datetime.fromtimestamp(item['t'])
+    }
+
+
+def read_records(path, offset=0, limit=None):
+    """
+    从段文件 offset 处开始顺序读取记录，直到 limit、段结束标记或损坏的记录（崩溃时写了一半）为止
+    逐条产出 (记录结束偏移, 行数据)
+    """
+    with open(path, 'rb') as f:
+        if limit is None:
+            limit = os.fstat(f.fileno()).st_size
+        f.seek(offset)
+        while offset + _HEADER.size <= limit:
+            header = f.read(_HEADER.size)
+            length, crc = _HEADER.unpack(header)
+            if length == 0 or offset + _HEADER.size + length > limit:
+                break
+            payload = f.read(length)
+            if zlib.crc32(payload) != crc:
+                break
+            offset += _HEADER.size + length
+            yield offset, decode_record(payload)
+
+
+def records_end(path, offset=0):
+    """从 offset 处按记录头跳读到段结束标记（或文件末尾）为止，返回有效记录的结束偏移；不读载荷、不校验crc"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        while offset + _HEADER.size <= size:
+            f.seek(offset)
+            length, _ = _HEADER.unpack(f.read(_HEADER.size))
+            if length == 0 or offset + _HEADER.size + length > size:
+                break
+            offset += _HEADER.size + length
+    return offset
+
+
+def _segment_name(seq):
+    return f'{seq:012d}{_SEGMENT_SUFFIX}'
+
+
+def _list_segments(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(_SEGMENT_SUFFIX))
+
+
+def _fsync_dir(directory):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class _Segment:
+    """当前正在写入的段文件，普通文件模式用 write + fsync，mmap模式预分配文件后写内存映射 + flush"""
+
+    def __init__(self, path, max_bytes, use_mmap):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.use_mmap = use_mmap
+        self.size = 0
+        self.durable_size = 0  # 已落盘的字节数，回放线程只读到这里
+        self.created_at = time.monotonic()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._mm = None
+        if use_mmap:
+            os.ftruncate(self._fd, max_bytes)
+            self._mm = mmap.mmap(self._fd, max_bytes)
+
+    def fits(self, nbytes):
+        return self.size == 0 or self.size + nbytes <= self.max_bytes
+
+    def write(self, data):
+        if self._mm is not None:
+            if self.size + len(data) > self.max_bytes:
+                # 单次组提交超过段大小时退化为扩展文件后重新映射
+                self._mm.close()
+                os.ftruncate(self._fd, self.size + len(data))
+                self._mm = mmap.mmap(self._fd, self.size + len(data))
+                self.max_bytes = self.size + len(data)
+            self._mm[self.size:self.size + len(data)] = data
+        else:
+            os.pwrite(self._fd, data, self.size)
+        self.size += len(data)
+
+    def sync(self):
+        if self._mm is not None:
+            self._mm.flush()
+        else:
+            os.fsync(self._fd)
+        self.durable_size = self.size
+
+    def close(self):
+        self.sync()
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+            # 截掉预分配但未使用的部分
+            os.ftruncate(self._fd, self.size)
+            os.fsync(self._fd)
+        os.close(self._fd)
+
+
+class SampleSpool:
+    """
+    本进程的落盘暂存：append_many() 返回时数据已落盘
+    后台组提交线程把同一时刻等待中的所有写入合并成一次写盘
+    """
+
+    def __init__(self, root_dir, segment_bytes=64 * 1024 * 1024, group_commit_ms=2, use_mmap=False):
+        self.root_dir = root_dir
+        self.segment_bytes = segment_bytes
+        self.group_commit_ms = group_commit_ms
+        self.use_mmap = use_mmap
+        self.directory = os.path.join(root_dir, f'worker-{os.getpid()}')
+        os.makedirs(self.directory, exist_ok=True)
+
+        # 持有目录锁直到进程退出，回放线程据此判断目录是否已无主
+        # 容器重启后PID可能复用，此时若其它进程正在接管该目录则等待其完成
+        self._lock_fd = os.open(os.path.join(self.directory, _LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+
+        existing = _list_segments(self.directory)
+        self._next_seq = int(existing[-1][:-len(_SEGMENT_SUFFIX)]) + 1 if existing else 0
+        self._segment = None
+        self._io_lock = threading.Lock()  # 保护当前段的写入、刷盘、轮转与封存
+
+        self._cond = threading.Condition()
+        self._pending = []        # 等待写盘的 (记录字节, 记录条数, 票据序号)
+        self._next_ticket = 0
+        self._done_ticket = -1    # 已处理完（落盘或失败）的最大票据序号
+        self._failed = {}         # 写盘失败的票据序号 -> 异常
+        self._thread = threading.Thread(target=self._run, name='spool-group-commit', daemon=True)
+        self._thread.start()
+
+        self.appended_records = 0
+        self.group_commits = 0
+
+    def append_many(self, rows):
+        """追加多条样本，阻塞直到其所在的组提交落盘"""
+        data = b''.join(encode_record(row) for row in rows)
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._pending.append((data, len(rows), ticket))
+            self._cond.notify_all()
+            while self._done_ticket < ticket:
+                self._cond.wait()
+            error = self._failed.pop(ticket, None)
+        if error is not None:
+            raise IOError(f'写入暂存文件失败: {error}')
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # 稍等片刻让并发请求进入同一组，摊薄一次fsync的成本
+            if self.group_commit_ms:
+                time.sleep(self.group_commit_ms / 1000.0)
+            with self._cond:
+                batch = self._pending
+                self._pending = []
+            try:
+                data = b''.join(item[0] for item in batch)
+                with self._io_lock:
+                    if self._segment is None or not self._segment.fits(len(data)):
+                        self._rotate()
+                    self._segment.write(data)
+                    self._segment.sync()
+                error = None
+            except Exception as e:
+                error = e
+            with self._cond:
+                if error is None:
+                    self.appended_records += sum(item[1] for item in batch)
+                    self.group_commits += 1
+                else:
+                    for item in batch:
+                        self._failed[item[2]] = error
+                    print(f"写入暂存文件失败: {error}")
+                self._done_ticket = batch[-1][2]
+                self._cond.notify_all()
+
+    def _rotate(self):
+        """封存当前段并新建下一段，调用方需持有 self._io_lock"""
+        if self._segment is not None:
+            self._segment.close()
+        path = os.path.join(self.directory, _segment_name(self._next_seq))
+        self._next_seq += 1
+        self._segment = _Segment(path, self.segment_bytes, self.use_mmap)
+        _fsync_dir(self.directory)
+
+    def active_segment(self):
+        """返回 (当前写入段文件名, 已落盘字节数)，没有时返回 (None, 0)"""
+        with self._io_lock:
+            return self._active_segment()
+
+    def _active_segment(self):
+        if self._segment is None:
+            return None, 0
+        return os.path.basename(self._segment.path), self._segment.durable_size
+
+    def snapshot(self):
+        """
+        在写入锁内同时列出段文件与当前写入段，返回 (段文件名列表, 当前写入段文件名, 已落盘字节数)
+        轮转也在该锁内进行，所以列表中除当前写入段外都已封存；之后新建的段序号更大，不在列表中
+        """
+        with self._io_lock:
+            return (_list_segments(self.directory),) + self._active_segment()
+
+    def seal_if_idle(self, max_age_seconds):
+        """当前段写入超过指定时间后封存，使回放线程可以删除已写库的旧段"""
+        with self._io_lock:
+            if self._segment is not None and self._segment.size > 0 \
+                    and time.monotonic() - self._segment.created_at >= max_age_seconds:
+                self._segment.close()
+                self._segment = None
+
+    def backlog_bytes(self):
+        """
+        尚未回放写库的暂存数据量（字节）：各目录检查点之后的记录字节数
+        不计已写库的部分，也不计mmap模式下写入段预分配而未使用的空间
+        """
+        own_segments, active_name, active_size = self.snapshot()
+        total = 0
+        for directory in _spool_dirs(self.root_dir):
+            own = directory == self.directory
+            try:
+                segments = own_segments if own else _list_segments(directory)
+                checkpoint = _load_checkpoint(directory)
+                for index, name in enumerate(segments):
+                    path = os.path.join(directory, name)
+                    offset = checkpoint['offset'] if checkpoint.get('segment') == name else 0
+                    if own and name == active_name:
+                        end = active_size
+                    elif index == len(segments) - 1:
+                        # 其它进程的最后一段可能仍在写入，文件大小含预分配空间，按记录头确定实际结束位置
+                        end = records_end(path, offset)
+                    else:
+                        end = os.path.getsize(path)
+                    total += max(end - offset, 0)
+            except FileNotFoundError:
+                continue  # 回放线程刚删除了该段或目录
+        return total
+
+    def stats(self):
+        with self._cond:
+            return {
+                'directory': self.directory,
+                'use_mmap': self.use_mmap,
+                'segment_bytes': self.segment_bytes,
+                'group_commit_ms': self.group_commit_ms,
+                'appended_records': self.appended_records,
+                'group_commits': self.group_commits,
+                'avg_group_records': round(self.appended_records / self.group_commits, 2) if self.group_commits else 0.0
+            }
+
+
+def _spool_dirs(root_dir):
+    if not os.path.isdir(root_dir):
+        return []
+    return [os.path.join(root_dir, name) for name in sorted(os.listdir(root_dir))
+            if name.startswith('worker-') and os.path.isdir(os.path.join(root_dir, name))]
+
+
+class SpoolReplayer:
+    """
+    暂存回放线程：把暂存文件中的样本批量写入 monitor_data
+    - 本进程目录：读取到已落盘位置为止，持续追上写入进度
+    - 其它进程遗留的目录（文件锁可获取说明原进程已退出）：全部排空，保留空目录供复用该PID的新进程使用
+    """
+
+    def __init__(self, spool, write_rows, batch_size=500, interval_ms=500, seal_seconds=60,
+                 max_attempts=5, ping=None):
+        self.spool = spool
+        self.write_rows = write_rows  # 回调：把一批行写入数据库
+        self.batch_size = batch_size
+        self.interval_ms = interval_ms
+        self.seal_seconds = seal_seconds
+        self.max_attempts = max_attempts  # 同一批连续失败达到该次数后逐条写入，隔离坏样本
+        self.ping = ping  # 回调：数据库是否可用；逐条写入失败时据此区分"数据库故障"与"坏样本"
+        self.quarantine_dir = os.path.join(spool.root_dir, _QUARANTINE_DIR)
+        self._attempts = defaultdict(int)  # (目录, 段文件名, 起始偏移) -> 连续失败次数
+        self._thread = threading.Thread(target=self._run, name='spool-replayer', daemon=True)
+
+        self.replayed_records = 0
+        self.quarantined_records = 0
+        self.replay_errors = 0
+        self.adopted_dirs = 0
+        self.backlog_bytes = 0  # 每轮回放后统计一次，供接口层做背压判断
+        self.last_replay_at = None
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.replay_once()
+            except Exception as e:
+                self.replay_errors += 1
+                print(f"回放暂存数据失败: {e}")
+            time.sleep(self.interval_ms / 1000.0)
+
+    def replay_once(self):
+        self.spool.seal_if_idle(self.seal_seconds)
+        for directory in _spool_dirs(self.spool.root_dir):
+            if directory == self.spool.directory:
+                self._drain_dir(directory, own=True)
+            else:
+                self._adopt_dir(directory)
+        self.backlog_bytes = self.spool.backlog_bytes()
+
+    def _adopt_dir(self, directory):
+        try:
+            lock_fd = os.open(os.path.join(directory, _LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        except FileNotFoundError:
+            return
+        try:
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # 所属进程仍在运行，由它自己回放
+            if _list_segments(directory):
+                self._drain_dir(directory, own=False)
+                self.adopted_dirs += 1
+        finally:
+            os.close(lock_fd)
+
+    def _drain_dir(self, directory, own):
+        checkpoint = _load_checkpoint(directory)
+        if own:
+            # 段列表与当前写入段必须在同一次加锁内取得，否则刚新建的写入段会被当作已封存段读完并删除
+            segments, active_name, active_size = self.spool.snapshot()
+        else:
+            segments, active_name, active_size = _list_segments(directory), None, 0
+
+        for name in segments:
+            path = os.path.join(directory, name)
+            offset = checkpoint['offset'] if checkpoint.get('segment') == name else 0
+            limit = active_size if name == active_name else None
+
+            batch = []
+            for end_offset, row in read_records(path, offset, limit):
+                batch.append((end_offset, row))
+                if len(batch) >= self.batch_size:
+                    self._write(directory, name, offset, batch)
+                    offset = end_offset
+                    batch = []
+            if batch:
+                self._write(directory, name, offset, batch)
+
+            if name == active_name:
+                break  # 当前写入段只能读到已落盘位置，等待后续追加
+            os.remove(path)
+            _save_checkpoint(directory, None, 0)
+
+    def _write(self, directory, name, start_offset, batch):
+        """batch 为 [(记录结束偏移, 行数据)]，写库成功后检查点推进到最后一条之后"""
+        key = (directory, name, start_offset)
+        try:
+            self.write_rows([row for _, row in batch])
+        except Exception as e:
+            self._attempts[key] += 1
+            if not _is_data_error(e) and self._attempts[key] < self.max_attempts:
+                raise
+            print(f"回放暂存数据失败({directory}/{name}@{start_offset}, 第{self._attempts[key]}次): {e}，改为逐条写入")
+            self._write_one_by_one(directory, name, batch)
+        else:
+            _save_checkpoint(directory, name, batch[-1][0])
+            self.replayed_records += len(batch)
+            self.last_replay_at = datetime.now()
+        self._attempts.pop(key, None)
+
+    def _write_one_by_one(self, directory, name, batch):
+        """逐条写入，写不进去的样本移入隔离文件；数据库不可用时抛出，下轮从检查点重试"""
+        for end_offset, row in batch:
+            try:
+                self.write_rows([row])
+                self.replayed_records += 1
+            except Exception as e:
+                if not _is_data_error(e) and not self._database_ok():
+                    raise
+                self._quarantine(directory, name, row, e)
+            _save_checkpoint(directory, name, end_offset)
+        self.last_replay_at = datetime.now()
+
+    def _database_ok(self):
+        if self.ping is None:
+            return True
+        try:
+            self.ping()
+            return True
+        except Exception:
+            return False
+
+    def _quarantine(self, directory, name, row, error):
+        """把坏样本按暂存记录格式追加到 quarantine/<进程目录>-<段文件名>，可用 read_records 读回排查"""
+        os.makedirs(self.quarantine_dir, exist_ok=True)
+        path = os.path.join(self.quarantine_dir, f'{os.path.basename(directory)}-{name}')
+        with open(path, 'ab') as f:
+            f.write(encode_record(row))
+            f.flush()
+            os.fsync(f.fileno())
+        self.quarantined_records += 1
+        print(f"暂存样本无法写库，已隔离到 {path}: server_id={row.get('server_id')} "
+              f"recorded_at={row.get('recorded_at')} 错误: {error}")
+
+    def stats(self):
+        return {
+            'replayed_records': self.replayed_records,
+            'quarantined_records': self.quarantined_records,
+            'replay_errors': self.replay_errors,
+            'adopted_dirs': self.adopted_dirs,
+            'backlog_bytes': self.backlog_bytes,
+            'last_replay_at': str(self.last_replay_at) if self.last_replay_at else None
+        }
+
+
+#数据本身导致的写库错误（越界、类型/格式错误、约束冲突），重试不会成功
+def _is_data_error(error):
+    if isinstance(error, (DataError, IntegrityError)):
+        return True
+    if isinstance(error, StatementError) and isinstance(error.orig, (ValueError, TypeError)):
+        return True
+    return isinstance(error, (ValueError, TypeError, KeyError))
+
+
+def _load_checkpoint(directory):
+    try:
+        with open(os.path.join(directory, _CHECKPOINT_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_checkpoint(directory, segment, offset):
+    path = os.path.join(directory, _CHECKPOINT_FILE)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'segment': segment, 'offset': offset}, f)
+    os.replace(tmp, path)
@@ -1,18 +1,18 @@
 #告警模块
 
-from datetime import datetime, timedelta
-from config.setting import DEFAULT_THRESHOLDS, ALERT_TEMPLATES, SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASS, SMTP_SENDER
-from model import Server, User, AlertRule, AlertHistory
+from datetime import datetime
+from config.setting import ALERT_SUSTAINED_MINUTES, DEFAULT_THRESHOLDS, ALERT_TEMPLATES, SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASS, SMTP_SENDER
+from model import AlertHistory
+from lib.server_cache import server_cache
 
 
 # 获取服务器的告警阈值（优先使用自定义规则）
+# server 为服务器身份缓存中的 ServerIdentity，自定义规则阈值已随身份一起缓存
 def get_server_thresholds(server, metric_type):
-    # 尝试查询该服务器的自定义告警规则
-    rule = AlertRule.query.filter_by(server_id=server.id, metric_type=metric_type, is_enabled=True).first()
-    
-    if rule:
+    val = server.thresholds.get(metric_type)
+
+    if val is not None:
         # 如果有自定义规则，统一使用该阈值
-        val = float(rule.threshold)
         return {
             'warning': val,
             'critical': val,
@@ -22,16 +22,22 @@ def get_server_thresholds(server, metric_type):
         return DEFAULT_THRESHOLDS.get(metric_type)
 
 # 基于IP地址的持续告警检查，如果80%以上的数据都超过阈值，认为持续告警
-def check_sustained_alert_by_ip(ip_address, metric_type, value, minutes=2, thresholds=None):
-    from model import MonitorData
+# 在进程内最近样本缓冲上计算，只在本进程冷启动时查询一次数据库（见 lib/recent_samples.py）
+# recorded_at 为被检查样本的记录时间，窗口为其之前的 minutes 分钟，与 recorded_at 使用同一时钟（本地时间）
+def check_sustained_alert_by_ip(ip_address, metric_type, value, minutes=2, thresholds=None, recorded_at=None, server_id=None):
+    from lib.recent_samples import recent_samples
 
-    # 获取最近N分钟的数据
-    start_time = datetime.utcnow() - timedelta(minutes=minutes)
+    if server_id is None:
+        server = server_cache.get_by_ip(ip_address)
+        if not server:
+            return False
+        server_id = server.id
 
-    # 根据IP地址查询最近N分钟的数据
-    recent_data = MonitorData.get_by_ip(ip_address, start_time)
+    # 获取最近N分钟的数据
+    end_time = recorded_at or datetime.now()
+    recent_values = recent_samples.window(server_id, metric_type, end_time, minutes=minutes, min_points=3)
 
-    if len(recent_data) < 3:  # 至少需要3个数据点
+    if len(recent_values) < 3:  # 至少需要3个数据点
         return False
 
     # 获取阈值
@@ -45,40 +51,27 @@ def check_sustained_alert_by_ip(ip_address, metric_type, value, minutes=2, thres
 
     # 检查是否所有数据都超过对应阈值
     threshold_value = thresholds[alert_level]
-    sustained_count = 0
-
-    for data in recent_data:
-        if metric_type == 'cpu' and float(data.cpu_value) >= threshold_value:
-            sustained_count += 1
-        elif metric_type == 'memory' and float(data.memory_value) >= threshold_value:
-            sustained_count += 1
-        elif metric_type == 'disk' and float(data.disk_value) >= threshold_value:
-            sustained_count += 1
+    sustained_count = sum(1 for data_value in recent_values if data_value >= threshold_value)
 
     # 如果80%以上的数据都超过阈值，认为持续告警
-    return sustained_count >= len(recent_data) * 0.8
+    return sustained_count >= len(recent_values) * 0.8
 
 
 # 根据IP地址找到服务器告警检查，获取服务器的所有关联用户
-# 调用 check_sustained_alert_by_ip()检查是否持续超过阈值（2分钟）
-# 向所有关联用户的邮箱发送告警
-def check_and_send_alert_by_ip(ip_address, metric_type, value):
+# 调用 check_sustained_alert_by_ip()检查是否持续超过阈值（默认2分钟）
+# 向所有关联用户的邮箱发送告警；recorded_at 为样本的记录时间（不传时使用当前时间）
+def check_and_send_alert_by_ip(ip_address, metric_type, value, recorded_at=None):
     try:
-        # 1. 获取服务器信息
-        server = Server.get_by_ip(ip_address)
+        # 1. 获取服务器信息（走进程内缓存，稳定状态下不查库）
+        server = server_cache.get_by_ip(ip_address)
         if not server:
             pass  # 服务器不存在
             return False
 
-        # 2. 获取告警用户列表
-        alert_users = server.users # 之前的 get_alert_users() 似乎是 Server 类的方法，但 Server 模型并没有这个方法。
-        # 检查 Server 模型是否有 get_alert_users, 之前的代码是 server.get_alert_users()
-        # 但是在 server.py 中没有看到 get_alert_users 的定义，server.py 中只有 relationship users
-        # 也许在 server.py 中有定义，但我没读全。
-        # 如果没有，应该直接用 server.users
-        users_to_alert = server.users if server.users else []
-        
-        if not users_to_alert:
+        # 2. 获取告警用户邮箱列表
+        emails_to_alert = server.emails
+
+        if not emails_to_alert:
             pass  # 服务器没有关联用户
             return False
 
@@ -89,8 +82,9 @@ def check_and_send_alert_by_ip(ip_address, metric_type, value):
         alert_level = determine_alert_level(value, thresholds)
 
         if alert_level:
-            # 5. 检查是否持续超过阈值（2分钟）
-            if not check_sustained_alert_by_ip(ip_address, metric_type, value, minutes=2, thresholds=thresholds):
+            # 5. 检查是否持续超过阈值（默认2分钟）
+            if not check_sustained_alert_by_ip(ip_address, metric_type, value, minutes=ALERT_SUSTAINED_MINUTES,
+                                               thresholds=thresholds, recorded_at=recorded_at, server_id=server.id):
                  # 如果没有达到持续告警条件，直接返回 True (视为已处理但忽略)
                  # 或者返回 False 表示未触发
                 return True
@@ -101,9 +95,9 @@ def check_and_send_alert_by_ip(ip_address, metric_type, value):
             # 使用 float 转换阈值，确保 AlertHistory 存储正确
             threshold_val = float(thresholds[alert_level])
 
-            for user in users_to_alert:
+            for email in emails_to_alert:
                 success = send_alert_email(
-                    user.email,
+                    email,
                     server.server_name,
                     metric_type,
                     value,
@@ -0,0 +1,68 @@
+"""store percent columns as scaled SMALLINT
+
+Revision ID: a3d5e8f1c27b
+Revises: f7b3c9e2a514
+Create Date: 2026-10-18 18:47:31.902215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision = 'a3d5e8f1c27b'
+down_revision = 'f7b3c9e2a514'
+branch_labels = None
+depends_on = None
+
+# 表名 -> [(列名, 原DECIMAL精度, 新整数类型, 是否可空, 注释)]
+_METRICS = ('cpu', 'memory', 'disk')
+_METRIC_NAMES = {'cpu': 'CPU', 'memory': '内存', 'disk': '磁盘'}
+_USAGE_COLUMNS = [(f'{metric}_value', 5, 'SMALLINT', False, f'{_METRIC_NAMES[metric]}使用率') for metric in _METRICS]
+_ROLLUP_COLUMNS = []
+for _metric in _METRICS:
+    _name = _METRIC_NAMES[_metric]
+    _ROLLUP_COLUMNS += [
+        (f'{_metric}_min', 5, 'SMALLINT', False, f'{_name}最小值'),
+        (f'{_metric}_max', 5, 'SMALLINT', False, f'{_name}最大值'),
+        (f'{_metric}_sum', 12, 'INT', False, f'{_name}总和'),
+        (f'{_metric}_last', 5, 'SMALLINT', False, f'{_name}最后值'),
+    ]
+
+TABLES = {
+    'monitor_data': _USAGE_COLUMNS,
+    'server_latest_metrics': _USAGE_COLUMNS,
+    'alert_rules': [('threshold', 5, 'SMALLINT', False, '触发阈值')],
+    'alert_history': [('current_value', 5, 'SMALLINT', False, '当时数值'),
+                      ('threshold_snapshot', 5, 'SMALLINT', True, '当时阈值快照')],
+    'monitor_rollup_1m': _ROLLUP_COLUMNS,
+    'monitor_rollup_5m': _ROLLUP_COLUMNS,
+    'monitor_rollup_1h': _ROLLUP_COLUMNS,
+}
+
+
+def _modify(table, columns, type_of):
+    """一条 ALTER TABLE 同时修改表内全部列，每张表只重建一次"""
+    clauses = [
+        f"MODIFY {name} {type_of(precision, int_type)} {'NULL' if nullable else 'NOT NULL'} COMMENT '{comment}'"
+        for name, precision, int_type, nullable, comment in columns
+    ]
+    op.execute(f"ALTER TABLE {table} {', '.join(clauses)}")
+
+
+def upgrade():
+    # DECIMAL -> 按百分之一存储的整数：先放宽精度，乘以100后再改为整数类型（取值均为两位小数，转换无损）
+    # monitor_data 数据量大时耗时较长（两次重建 + 一次全表更新），建议在维护窗口执行
+    for table, columns in TABLES.items():
+        _modify(table, columns, lambda precision, int_type: f"DECIMAL({precision + 2}, 2)")
+        op.execute(f"UPDATE {table} SET " + ', '.join(f"{name} = {name} * 100" for name, *_ in columns))
+        _modify(table, [(name, precision, int_type, nullable, f'{comment}，单位0.01%')
+                        for name, precision, int_type, nullable, comment in columns],
+                lambda precision, int_type: int_type)
+
+
+def downgrade():
+    for table, columns in TABLES.items():
+        _modify(table, columns, lambda precision, int_type: f"DECIMAL({precision + 2}, 2)")
+        op.execute(f"UPDATE {table} SET " + ', '.join(f"{name} = {name} / 100" for name, *_ in columns))
+        _modify(table, columns, lambda precision, int_type: f"DECIMAL({precision}, 2)")
@@ -0,0 +1,73 @@
+"""partition monitor_data by day
+
+Revision ID: c5e07f3a9d12
+Revises: a81d4e7c2b90
+Create Date: 2026-10-18 14:20:11.265930
+
+把 monitor_data 改为按天 RANGE 分区，过期数据整分区删除（见 lib/partition.py）
+MySQL 分区表的限制：
+1. 分区键必须包含在所有唯一键中，主键改为 (id, recorded_at)，recorded_at 改为非空
+2. 分区表不支持外键，删除 server_id 外键（保留索引），服务器删除时由应用层清理监控数据
+注意：转换分区会重建整张表，数据量大时请在低峰期执行
+"""
+from datetime import date, timedelta
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision = 'c5e07f3a9d12'
+down_revision = 'a81d4e7c2b90'
+branch_labels = None
+depends_on = None
+
+# 初始预建的未来分区天数，之后由 scripts/maintain_partitions.py 每天维护
+DAYS_AHEAD = 7
+
+
+def _to_days(day):
+    # 与 MySQL TO_DAYS() 一致
+    return day.toordinal() + 365
+
+
+def upgrade():
+    conn = op.get_bind()
+
+    # 1. 删除外键（约束名由MySQL自动生成，需查询得到）
+    foreign_keys = conn.execute(sa.text(
+        "SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS "
+        "WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'monitor_data'"
+    )).scalars().all()
+    for name in foreign_keys:
+        op.drop_constraint(name, 'monitor_data', type_='foreignkey')
+
+    # 2. recorded_at 非空，主键包含分区键
+    op.execute("UPDATE monitor_data SET recorded_at = NOW() WHERE recorded_at IS NULL")
+    with op.batch_alter_table('monitor_data', schema=None) as batch_op:
+        batch_op.alter_column('recorded_at',
+               existing_type=mysql.DATETIME(),
+               nullable=False,
+               existing_comment='数据记录时间')
+    op.execute("ALTER TABLE monitor_data DROP PRIMARY KEY, ADD PRIMARY KEY (id, recorded_at)")
+
+    # 3. 按天分区：今天之前的历史数据放在 p_history，今天起每天一个分区，p_future 兜底
+    today = date.today()
+    partitions = [f"PARTITION p_history VALUES LESS THAN ({_to_days(today)})"]
+    for i in range(DAYS_AHEAD + 1):
+        day = today + timedelta(days=i)
+        partitions.append(f"PARTITION p{day:%Y%m%d} VALUES LESS THAN ({_to_days(day + timedelta(days=1))})")
+    partitions.append("PARTITION p_future VALUES LESS THAN MAXVALUE")
+    op.execute("ALTER TABLE monitor_data PARTITION BY RANGE (TO_DAYS(recorded_at)) (" + ", ".join(partitions) + ")")
+
+
+def downgrade():
+    op.execute("ALTER TABLE monitor_data REMOVE PARTITIONING")
+    op.execute("ALTER TABLE monitor_data DROP PRIMARY KEY, ADD PRIMARY KEY (id)")
+    with op.batch_alter_table('monitor_data', schema=None) as batch_op:
+        batch_op.alter_column('recorded_at',
+               existing_type=mysql.DATETIME(),
+               nullable=True,
+               existing_comment='数据记录时间')
+    # 恢复外键前清理已删除服务器遗留的监控数据
+    op.execute("DELETE FROM monitor_data WHERE server_id NOT IN (SELECT id FROM servers)")
+    op.create_foreign_key(None, 'monitor_data', 'servers', ['server_id'], ['id'])
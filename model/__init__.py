@@ -2,8 +2,11 @@ from .base import db
 from .associations import server_users
 from .user import User
 from .server import Server, ServerGroup
-from .monitor import MonitorData, AlertRule, AlertHistory
+from .monitor import MonitorData, ServerLatestMetrics, AlertRule, AlertHistory
+from .rollup import MonitorRollup1m, MonitorRollup5m, MonitorRollup1h, ROLLUP_MODELS
+from .chunk import MonitorChunk
 from .audit import AuditLog
+from .credential import ApiCredential
 
 # 定义函数：将 ORM 实例与app核心对象绑定
 def init_app_db(app):
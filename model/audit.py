@@ -12,6 +12,10 @@ class AuditLog(db.Model):
     即使删除了用户，日志中的 user_id 与 username_snapshot 依然保留，确保操作可追溯。
     """
     __tablename__ = 'audit_logs'
+    # 游标分页按 (created_at, id) 倒序翻页（见 lib/pagination.py）
+    __table_args__ = (
+        db.Index('ix_audit_logs_created_id', 'created_at', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     
     user_id = db.Column(db.Integer, comment='操作人ID(可为空,如系统自动任务)')
@@ -0,0 +1,51 @@
+from sqlalchemy.dialects.mysql import insert, MEDIUMBLOB
+from .base import db
+
+
+class MonitorChunk(db.Model):
+    """
+    【新增】监控数据压缩块表（METRICS_BACKEND=chunks 且 CHUNK_STORAGE=mysql 时使用）
+    每台服务器每个时间块一行，data 为 lib/chunk_store.py 编码的列式压缩数据（时间戳二阶差分 + 指标值XOR + zlib）
+    """
+    __tablename__ = 'monitor_chunks'
+    server_id = db.Column(db.Integer, primary_key=True, autoincrement=False, comment='服务器ID')
+    chunk_start = db.Column(db.DateTime, primary_key=True, comment='时间块起始时间')
+    point_count = db.Column(db.Integer, nullable=False, default=0, comment='块内数据点数')
+    data = db.Column(db.LargeBinary().with_variant(MEDIUMBLOB(), 'mysql'), nullable=False, comment='压缩数据')
+
+    #块不存在时插入空块占位（不提交事务）
+    @classmethod
+    def ensure(cls, server_id, chunk_start, empty_data):
+        stmt = insert(cls.__table__).prefix_with('IGNORE').values(
+            server_id=server_id, chunk_start=chunk_start, point_count=0, data=empty_data)
+        db.session.execute(stmt)
+
+    #读取块并加行锁，直到事务提交
+    @classmethod
+    def get_for_update(cls, server_id, chunk_start):
+        return cls.query.filter_by(server_id=server_id, chunk_start=chunk_start).with_for_update().populate_existing().first()
+
+    #写回块数据（不提交事务，由调用方与汇总表一起提交）
+    @classmethod
+    def save(cls, server_id, chunk_start, data, point_count):
+        db.session.execute(
+            cls.__table__.update()
+            .where(cls.server_id == server_id, cls.chunk_start == chunk_start)
+            .values(data=data, point_count=point_count)
+        )
+
+    #查询起始时间在 [start, end] 内的块
+    @classmethod
+    def get_range(cls, server_id, start, end):
+        return cls.query.filter(
+            cls.server_id == server_id,
+            cls.chunk_start >= start,
+            cls.chunk_start <= end
+        ).order_by(cls.chunk_start.asc()).all()
+
+    #删除起始时间早于 cutoff 的块，返回删除的块数
+    @classmethod
+    def delete_before(cls, cutoff):
+        deleted = cls.query.filter(cls.chunk_start < cutoff).delete()
+        db.session.commit()
+        return deleted
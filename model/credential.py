@@ -0,0 +1,85 @@
+import secrets
+from datetime import datetime
+from .base import db
+
+class ApiCredential(db.Model):
+    """
+    【新增】Agent上报凭证表（AppID + SecretKey）
+    解决痛点：凭证原先硬编码在 lib/api_auth.py 中，新增、轮换都要改代码重新部署
+    server_id 为空表示通用凭证，可为任意服务器上报；不为空时只能上报该服务器的数据
+    """
+    __tablename__ = 'api_credentials'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    app_id = db.Column(db.String(64), unique=True, nullable=False, comment='AppID')
+    secret_key = db.Column(db.String(128), nullable=False, comment='签名密钥')
+    server_id = db.Column(db.Integer, db.ForeignKey('servers.id', ondelete='CASCADE'), nullable=True,
+                          comment='绑定的服务器ID(为空表示通用凭证)')
+    description = db.Column(db.String(200), comment='备注')
+    is_enabled = db.Column(db.Boolean, default=True, comment='是否启用')
+
+    created_at = db.Column(db.DateTime, default=datetime.now, comment='创建时间')
+    rotated_at = db.Column(db.DateTime, nullable=True, comment='最近一次轮换密钥时间')
+
+    def keys(self):
+        """secret_key 不参与序列化，只在创建/轮换时返回一次"""
+        return ('id', 'app_id', 'server_id', 'description', 'is_enabled', 'created_at', 'rotated_at')
+
+    def __getitem__(self, key):
+        value = getattr(self, key)
+        if key in ('created_at', 'rotated_at') and value is not None:
+            return str(value)
+        return value
+
+    #生成随机密钥
+    @staticmethod
+    def generate_secret():
+        return f"sk_{secrets.token_urlsafe(32)}"
+
+    #创建凭证，未指定app_id时自动生成
+    @classmethod
+    def create(cls, app_id=None, server_id=None, description=None):
+        credential = cls(
+            app_id=app_id or f"app_{secrets.token_hex(8)}",
+            secret_key=cls.generate_secret(),
+            server_id=server_id,
+            description=description
+        )
+        db.session.add(credential)
+        db.session.commit()
+        return credential
+
+    #获取所有凭证
+    @classmethod
+    def get_all(cls):
+        return cls.query.order_by(cls.id).all()
+
+    #获取所有启用的凭证（供鉴权缓存加载）
+    @classmethod
+    def get_enabled(cls):
+        return cls.query.filter_by(is_enabled=True).all()
+
+    #根据id获取凭证
+    @classmethod
+    def get_by_id(cls, credential_id):
+        return cls.query.get(credential_id)
+
+    #轮换密钥，旧密钥立即失效（其它进程在鉴权缓存刷新后失效）
+    @classmethod
+    def rotate(cls, credential_id):
+        credential = cls.get_by_id(credential_id)
+        if not credential:
+            return None
+        credential.secret_key = cls.generate_secret()
+        credential.rotated_at = datetime.now()
+        db.session.commit()
+        return credential
+
+    #启用/停用凭证
+    @classmethod
+    def set_enabled(cls, credential_id, is_enabled):
+        credential = cls.get_by_id(credential_id)
+        if not credential:
+            return None
+        credential.is_enabled = is_enabled
+        db.session.commit()
+        return credential
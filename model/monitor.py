@@ -1,31 +1,73 @@
 from datetime import datetime
+from sqlalchemy.dialects.mysql import insert
 from .base import db
+from .types import ScaledPercent
+from .rollup import update_rollups
+from config.setting import METRICS_BACKEND
+
+# 快速读取路径（Core select，不构造ORM对象）的列转换：
+# 百分比列（ScaledPercent）读出即为 float，时间在MySQL中格式化为与 str(datetime) 相同的字符串，结果行无需逐字段再转换
+def _time_column(column):
+    return db.func.date_format(column, '%Y-%m-%d %H:%i:%s').label(column.key)
+
+
+#执行查询并把结果行直接转为字典列表
+def _fetch_dicts(stmt):
+    result = db.session.execute(stmt)
+    keys = tuple(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
+
+#服务器IP（压缩数据块不保存IP，从服务器身份缓存中取），服务器不存在时为None
+def _server_ip(server_id):
+    from lib.server_cache import server_cache
+    identity = server_cache.get_by_id(server_id)
+    return identity.ip_address if identity else None
+
+
+#把数据块的解码结果逐行转为与 get_history_rows 相同结构的字典（无 id 与扩展指标）
+def _chunk_dicts(server_id, ip_address, timestamps, values):
+    for timestamp, cpu_value, memory_value, disk_value in zip(
+            timestamps.tolist(), values['cpu'].tolist(), values['memory'].tolist(), values['disk'].tolist()):
+        yield {'id': None, 'server_id': server_id, 'ip_address': ip_address, 'cpu_value': cpu_value,
+               'memory_value': memory_value, 'disk_value': disk_value, 'extra_metrics': None,
+               'recorded_at': str(datetime.fromtimestamp(timestamp))}
+
 
 #创建监控数据模型，映射数据库中的monitor_data表
 class MonitorData(db.Model):
     __tablename__ = 'monitor_data'
+    # 按服务器查询时间范围（历史趋势、持续告警补齐）走 (server_id, recorded_at) 复合索引，范围扫描后无需再排序
+    __table_args__ = (
+        db.Index('ix_monitor_data_server_recorded', 'server_id', 'recorded_at'),
+    )
 
+    # 表按天分区（见 lib/partition.py）：分区键 recorded_at 必须包含在主键中，且分区表不支持外键，
+    # server_id 只保留原外键的索引，写入前由服务器身份缓存校验服务器存在，删除服务器时由 Server.delete 清理
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    # 外键关联，阻止插入不存在的服务器监控数据
-    server_id = db.Column(db.Integer, db.ForeignKey('servers.id'), nullable=False, comment='关联的服务器ID')
+    server_id = db.Column(db.Integer, nullable=False, comment='关联的服务器ID')
     ip_address = db.Column(db.String(45), nullable=False, comment='服务器IP地址') # 这里的 IP 其实是冗余字段，但为了方便查询保留
     # 监控数据
-    cpu_value = db.Column(db.DECIMAL(5, 2), nullable=False, comment='CPU使用率，保留2位小数')
-    memory_value = db.Column(db.DECIMAL(5, 2), nullable=False, comment='内存使用率，保留2位小数')
-    disk_value = db.Column(db.DECIMAL(5, 2), nullable=False, comment='磁盘使用率，保留2位小数')
-    recorded_at = db.Column(db.DateTime, default=datetime.now, comment='数据记录时间', index=True)
+    # 百分比按百分之一存为 SMALLINT，模型层读写为 float（见 model/types.py）
+    cpu_value = db.Column(ScaledPercent, nullable=False, comment='CPU使用率，单位0.01%')
+    memory_value = db.Column(ScaledPercent, nullable=False, comment='内存使用率，单位0.01%')
+    disk_value = db.Column(ScaledPercent, nullable=False, comment='磁盘使用率，单位0.01%')
+    # 扩展指标（负载、每核CPU、各文件系统、网络/磁盘IO等），Agent新增指标无需改表
+    extra_metrics = db.Column(db.JSON(none_as_null=True), nullable=True, comment='扩展指标，JSON对象')
+    recorded_at = db.Column(db.DateTime, primary_key=True, default=datetime.now, comment='数据记录时间', index=True)
 
     def keys(self):
         """
         返回字典序列化时的键列表
         用于支持 dict(monitor_data) 操作
         """
-        return ('id', 'server_id', 'ip_address', 'cpu_value', 'memory_value', 'disk_value', 'recorded_at')
+        return ('id', 'server_id', 'ip_address', 'cpu_value', 'memory_value', 'disk_value', 'extra_metrics', 'recorded_at')
 
     def __getitem__(self, key):
         """
         支持字典式访问对象属性
-        自动处理时间字段的字符串转换和Decimal类型转换
+        自动处理时间字段的字符串转换；百分比字段从数据库读出已是 float，
+        刚创建、尚未重新加载的对象保存的是原始输入，仍统一转为 float
         """
         value = getattr(self, key)
 
@@ -33,10 +75,10 @@ class MonitorData(db.Model):
         if key == 'recorded_at':
             return str(value)
 
-        # 处理Decimal类型字段
-        decimal_fields = ('cpu_value', 'memory_value', 'disk_value')
+        # 处理百分比字段
+        percent_fields = ('cpu_value', 'memory_value', 'disk_value')
 
-        if key in decimal_fields:
+        if key in percent_fields:
             if value is not None:
                 return float(value)
         return value
@@ -49,12 +91,49 @@ class MonitorData(db.Model):
             ip_address=ip_address,
             cpu_value=cpu_value,
             memory_value=memory_value,
-            disk_value=disk_value
+            disk_value=disk_value,
+            recorded_at=datetime.now()
         )
-        db.session.add(data)
+        row = {'server_id': server_id, 'ip_address': ip_address, 'cpu_value': cpu_value,
+               'memory_value': memory_value, 'disk_value': disk_value, 'recorded_at': data.recorded_at}
+        if METRICS_BACKEND == 'chunks':
+            from lib.chunk_store import get_chunk_store
+            get_chunk_store().append([row])
+        else:
+            db.session.add(data)
+            db.session.flush()
+        update_rollups([row])
+        ServerLatestMetrics.merge([row])
         db.session.commit()
         return data #返回监控记录对象
 
+    #批量创建监控记录，rows为字典列表，一次提交写入多行（供批量写入器使用）
+    @classmethod
+    def bulk_create(cls, rows):
+        if not rows:
+            return 0
+        if METRICS_BACKEND == 'chunks':
+            # 写入压缩数据块（按时间戳去重，写库失败重试时不会产生重复点）
+            from lib.chunk_store import get_chunk_store
+            get_chunk_store().append(rows)
+        else:
+            # 使用Core层insert + executemany，pymysql会将其合并为一条多行 INSERT ... VALUES (...), (...)
+            db.session.execute(cls.__table__.insert(), rows)
+        # 同一事务内增量更新 1m/5m/1h 汇总表与各服务器最新值
+        update_rollups(rows)
+        ServerLatestMetrics.merge(rows)
+        db.session.commit()
+        return len(rows)
+
+    #当前监控数据版本：最新样本ID，写入新样本后变化，用作总览接口的ETag（见 lib/response_cache.py）
+    # 压缩分块模式下没有样本ID，取各服务器最新样本的最大记录时间
+    @classmethod
+    def latest_version(cls):
+        if METRICS_BACKEND == 'chunks':
+            latest = db.session.execute(db.select(db.func.max(ServerLatestMetrics.recorded_at))).scalar()
+            return int(latest.timestamp()) if latest else 0
+        return db.session.execute(db.select(db.func.max(cls.id))).scalar() or 0
+
     #根据服务器id获取服务器最新监控数据
     @classmethod
     def get_latest_by_server(cls, server_id):
@@ -64,11 +143,11 @@ class MonitorData(db.Model):
     #根据IP地址创建监控数据记录（包含所有指标），复用create()方法
     @classmethod
     def create_by_ip(cls, ip_address, cpu_value, memory_value, disk_value):
-        # 需要在方法内部import避免循环依赖，因为Server也在model.server中
-        from .server import Server
-        
-        # 先根据IP查找服务器
-        server = Server.get_by_ip(ip_address)
+        # 需要在方法内部import避免循环依赖，服务器身份缓存依赖model
+        from lib.server_cache import server_cache
+
+        # 先根据IP查找服务器（走进程内缓存）
+        server = server_cache.get_by_ip(ip_address)
         if not server:
             raise ValueError(f'服务器 {ip_address} 不存在')
 
@@ -78,9 +157,9 @@ class MonitorData(db.Model):
     #根据IP地址查询指定时间范围的数据
     @classmethod
     def get_by_ip(cls, ip_address, start_time):
-        from .server import Server
-        
-        server = Server.get_by_ip(ip_address)
+        from lib.server_cache import server_cache
+
+        server = server_cache.get_by_ip(ip_address)
         if not server:
             return []
 
@@ -89,7 +168,7 @@ class MonitorData(db.Model):
             cls.recorded_at >= start_time
         ).order_by(cls.recorded_at.desc()).all()
 
-    #根据ID查询指定时间范围的数据（用于历史趋势图）
+    #根据ID查询指定时间范围的数据，返回 MonitorData 对象列表（ORM路径，仅用于逐行存储；接口使用 get_history_rows）
     @classmethod
     def get_history_by_server_id(cls, server_id, hours=1):
         from datetime import timedelta
@@ -99,13 +178,186 @@ class MonitorData(db.Model):
             cls.recorded_at >= start_time
         ).order_by(cls.recorded_at.asc()).all()
 
+    #历史趋势的快速读取路径：结构与 dict(MonitorData) 相同的字典列表，不构造ORM对象
+    # 使用压缩数据块存储时返回相同结构（数据块不保存 id 与扩展指标，这两项为 None）
+    @classmethod
+    def get_history_rows(cls, server_id, hours=1):
+        from datetime import timedelta
+        start_time = datetime.now() - timedelta(hours=hours)
+        if METRICS_BACKEND == 'chunks':
+            from lib.chunk_store import get_chunk_store
+            timestamps, values = get_chunk_store().scan(server_id, start_time, datetime.now())
+            return list(_chunk_dicts(server_id, _server_ip(server_id), timestamps, values))
+        return _fetch_dicts(
+            db.select(cls.id, cls.server_id, cls.ip_address, cls.cpu_value,
+                      cls.memory_value, cls.disk_value, cls.extra_metrics,
+                      _time_column(cls.recorded_at))
+            .where(cls.server_id == server_id, cls.recorded_at >= start_time)
+            .order_by(cls.recorded_at.asc())
+        )
+
+    #流式读取多台服务器的历史数据（导出、长时间范围），逐行产出与 get_history_rows 结构相同的字典
+    # 使用服务端游标（yield_per 隐含 stream_results），每次只从MySQL取 batch_size 行，内存占用与时间范围无关
+    # 按 (server_id, recorded_at) 排序，走复合索引范围扫描
+    @classmethod
+    def iter_history_rows(cls, server_ids, start_time, end_time=None, batch_size=1000):
+        end_time = end_time or datetime.now()
+        if METRICS_BACKEND == 'chunks':
+            yield from cls._iter_chunk_rows(server_ids, start_time, end_time)
+            return
+        stmt = (
+            db.select(cls.id, cls.server_id, cls.ip_address, cls.cpu_value,
+                      cls.memory_value, cls.disk_value, cls.extra_metrics,
+                      _time_column(cls.recorded_at))
+            .where(cls.server_id.in_(list(server_ids)),
+                   cls.recorded_at >= start_time, cls.recorded_at <= end_time)
+            .order_by(cls.server_id.asc(), cls.recorded_at.asc())
+        )
+        result = db.session.execute(stmt, execution_options={'yield_per': batch_size})
+        try:
+            keys = tuple(result.keys())
+            for partition in result.partitions():
+                for row in partition:
+                    yield dict(zip(keys, row))
+        finally:
+            # 提前结束（客户端断开）时关闭服务端游标，释放连接
+            result.close()
+
+    #压缩数据块模式的流式读取：按数据块时长逐段解码，每次只持有一个数据块的数据
+    @classmethod
+    def _iter_chunk_rows(cls, server_ids, start_time, end_time):
+        from datetime import timedelta
+        from lib.chunk_store import get_chunk_store
+        store = get_chunk_store()
+        for server_id in sorted(server_ids):
+            ip_address = _server_ip(server_id)
+            window_start = start_time
+            while window_start <= end_time:
+                # 每段与数据块边界对齐，只解码一个块；scan 区间两端都包含，样本时间精确到秒，下一段从下一秒开始
+                chunk_end = store.chunk_of(int(window_start.timestamp())) + store.chunk_seconds - 1
+                window_end = min(datetime.fromtimestamp(chunk_end), end_time)
+                timestamps, values = store.scan(server_id, window_start, window_end)
+                yield from _chunk_dicts(server_id, ip_address, timestamps, values)
+                window_start = window_end + timedelta(seconds=1)
+
+    #查询指定服务器 [start_time, end_time] 内的指标值，返回 [(recorded_at, cpu, memory, disk)]，与存储后端无关
+    @classmethod
+    def get_values(cls, server_id, start_time, end_time):
+        if METRICS_BACKEND == 'chunks':
+            from lib.chunk_store import get_chunk_store
+            timestamps, values = get_chunk_store().scan(server_id, start_time, end_time)
+            return [(datetime.fromtimestamp(timestamp), cpu_value, memory_value, disk_value)
+                    for timestamp, cpu_value, memory_value, disk_value in zip(
+                        timestamps.tolist(), values['cpu'].tolist(), values['memory'].tolist(), values['disk'].tolist())]
+        return cls.query.with_entities(cls.recorded_at, cls.cpu_value, cls.memory_value, cls.disk_value).filter(
+            cls.server_id == server_id,
+            cls.recorded_at >= start_time,
+            cls.recorded_at <= end_time
+        ).all()
+
     #清理7天前的旧数据，避免数据库过大
+    # 已分区时整分区删除（与数据量无关，不产生大事务），返回删除的分区；未分区时按时间删除
+    # 使用压缩数据块存储时整块删除过期的数据块
     @classmethod
     def delete_old_data(cls, days=7):
         from datetime import timedelta
+        from lib.partition import is_partitioned, drop_expired_partitions
+
+        if METRICS_BACKEND == 'chunks':
+            from lib.chunk_store import get_chunk_store
+            get_chunk_store().drop_before(datetime.now() - timedelta(days=days))
+            return []
+
+        if is_partitioned(db.session):
+            return drop_expired_partitions(db.session, retention_days=days)
+
         cutoff_date = datetime.now() - timedelta(days=days)
         cls.query.filter(cls.recorded_at < cutoff_date).delete()
         db.session.commit()
+        return []
+
+class ServerLatestMetrics(db.Model):
+    """
+    【新增】服务器最新监控数据表
+    解决痛点：总览页对每台服务器执行一次 ORDER BY recorded_at DESC LIMIT 1（N+1查询），服务器越多越慢
+    每台服务器一行，写入原始数据时在同一事务内更新（只接受比现有记录更新的样本），总览页一次查询读取全部
+    """
+    __tablename__ = 'server_latest_metrics'
+    server_id = db.Column(db.Integer, primary_key=True, autoincrement=False, comment='服务器ID')
+    ip_address = db.Column(db.String(45), nullable=False, comment='服务器IP地址')
+    cpu_value = db.Column(ScaledPercent, nullable=False, comment='CPU使用率，单位0.01%')
+    memory_value = db.Column(ScaledPercent, nullable=False, comment='内存使用率，单位0.01%')
+    disk_value = db.Column(ScaledPercent, nullable=False, comment='磁盘使用率，单位0.01%')
+    extra_metrics = db.Column(db.JSON(none_as_null=True), nullable=True, comment='扩展指标，JSON对象')
+    recorded_at = db.Column(db.DateTime, nullable=False, comment='最新样本的记录时间')
+
+    def keys(self):
+        return ('server_id', 'ip_address', 'cpu_value', 'memory_value', 'disk_value', 'extra_metrics', 'recorded_at')
+
+    def __getitem__(self, key):
+        value = getattr(self, key)
+        if key == 'recorded_at':
+            return str(value)
+        if key in ('cpu_value', 'memory_value', 'disk_value') and value is not None:
+            return float(value)
+        return value
+
+    #用一批原始数据更新各服务器的最新值（不提交事务，由调用方与原始数据一起提交）
+    @classmethod
+    def merge(cls, rows):
+        latest = {}
+        for row in rows:
+            current = latest.get(row['server_id'])
+            if current is None or row['recorded_at'] >= current['recorded_at']:
+                latest[row['server_id']] = row
+        if not latest:
+            return 0
+
+        columns = ('ip_address', 'cpu_value', 'memory_value', 'disk_value', 'extra_metrics')
+        # 按主键排序，固定加锁顺序
+        values = [dict({column: latest[server_id].get(column) for column in columns},
+                       server_id=server_id, recorded_at=latest[server_id]['recorded_at'])
+                  for server_id in sorted(latest)]
+
+        stmt = insert(cls.__table__)
+        table = cls.__table__.c
+        # 补传的旧样本不能覆盖更新的数据；MySQL按书写顺序赋值，recorded_at 放在最后更新
+        is_newer = stmt.inserted.recorded_at >= table.recorded_at
+        updates = [(column, db.case((is_newer, stmt.inserted[column]), else_=table[column])) for column in columns]
+        updates.append(('recorded_at', db.func.greatest(table.recorded_at, stmt.inserted.recorded_at)))
+        db.session.execute(stmt.on_duplicate_key_update(updates), values)
+        return len(values)
+
+    #获取指定服务器的最新数据
+    @classmethod
+    def get_by_server(cls, server_id):
+        return cls.query.get(server_id)
+
+    #一次查询获取多台服务器（默认全部）的最新数据，返回 {server_id: 最新数据}
+    @classmethod
+    def get_map(cls, server_ids=None):
+        query = cls.query
+        if server_ids is not None:
+            query = query.filter(cls.server_id.in_(list(server_ids)))
+        return {item.server_id: item for item in query.all()}
+
+    #获取所有已登记服务器的最新数据（排除已删除的服务器）
+    @classmethod
+    def get_all(cls):
+        from .server import Server
+        return cls.query.join(Server, Server.id == cls.server_id).order_by(cls.server_id).all()
+
+    #最新数据的快速读取路径：指定服务器或全部已登记服务器，返回结构与 dict(ServerLatestMetrics) 相同的字典列表
+    @classmethod
+    def get_rows(cls, server_id=None):
+        from .server import Server
+        stmt = db.select(
+            cls.server_id, cls.ip_address, cls.cpu_value, cls.memory_value,
+            cls.disk_value, cls.extra_metrics, _time_column(cls.recorded_at)
+        ).join(Server, Server.id == cls.server_id).order_by(cls.server_id)
+        if server_id is not None:
+            stmt = stmt.where(cls.server_id == server_id)
+        return _fetch_dicts(stmt)
 
 class AlertRule(db.Model):
     """
@@ -117,7 +369,7 @@ class AlertRule(db.Model):
     server_id = db.Column(db.Integer, db.ForeignKey('servers.id'), nullable=False, comment='关联服务器')
     
     metric_type = db.Column(db.Enum('cpu', 'memory', 'disk'), nullable=False, comment='指标类型')
-    threshold = db.Column(db.DECIMAL(5, 2), nullable=False, comment='触发阈值(%)')
+    threshold = db.Column(ScaledPercent, nullable=False, comment='触发阈值，单位0.01%')
     silence_minutes = db.Column(db.Integer, default=60, comment='静默时间(分钟)避免频繁轰炸')
     is_enabled = db.Column(db.Boolean, default=True, comment='是否启用')
     
@@ -130,12 +382,17 @@ class AlertHistory(db.Model):
     解决痛点：告警数据沉淀，支持SLA统计和故障复盘
     """
     __tablename__ = 'alert_history'
+    # 游标分页按 (triggered_at, id) 倒序翻页（见 lib/pagination.py），按服务器筛选时走带 server_id 前缀的索引
+    __table_args__ = (
+        db.Index('ix_alert_history_triggered_id', 'triggered_at', 'id'),
+        db.Index('ix_alert_history_server_triggered_id', 'server_id', 'triggered_at', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     server_id = db.Column(db.Integer, db.ForeignKey('servers.id'), nullable=False, comment='关联服务器')
     
     metric_type = db.Column(db.String(20), nullable=False, comment='告警指标')
-    current_value = db.Column(db.DECIMAL(5, 2), nullable=False, comment='当时数值')
-    threshold_snapshot = db.Column(db.DECIMAL(5, 2), comment='当时阈值快照')
+    current_value = db.Column(ScaledPercent, nullable=False, comment='当时数值，单位0.01%')
+    threshold_snapshot = db.Column(ScaledPercent, comment='当时阈值快照，单位0.01%')
     
     alert_content = db.Column(db.Text, comment='告警邮件内容')
     status = db.Column(db.Enum('firing', 'resolved', 'ignored'), default='firing', comment='状态')
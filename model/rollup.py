@@ -0,0 +1,187 @@
+from datetime import datetime, timedelta
+from sqlalchemy.dialects.mysql import insert
+from .base import db
+from .types import ScaledPercent, ScaledPercentSum
+from config.setting import METRICS_BACKEND
+
+# 参与汇总的指标：monitor_data 列名前缀
+ROLLUP_METRICS = ('cpu', 'memory', 'disk')
+
+
+class MonitorRollupMixin:
+    """
+    【新增】监控数据汇总表（1分钟 / 5分钟 / 1小时）
+    解决痛点：历史趋势图直接返回原始数据，30秒间隔每台服务器每天约2880行，查7天、30天的数据量过大
+    每台服务器每个时间桶一行，保存各指标的 最小/最大/总和/最后值 与样本数（平均值 = 总和/样本数）；
+    写入原始数据时在同一事务内增量更新（INSERT ... ON DUPLICATE KEY UPDATE），历史数据用 scripts/backfill_rollups.py 回填
+    """
+    bucket_seconds = None   # 时间桶长度（秒），子类定义
+    resolution = None       # 分辨率名称，如 '5m'
+
+    server_id = db.Column(db.Integer, primary_key=True, autoincrement=False, comment='服务器ID')
+    bucket_start = db.Column(db.DateTime, primary_key=True, comment='时间桶起始时间')
+    sample_count = db.Column(db.Integer, nullable=False, default=0, comment='样本数')
+    cpu_min = db.Column(ScaledPercent, nullable=False, comment='CPU最小值，单位0.01%')
+    cpu_max = db.Column(ScaledPercent, nullable=False, comment='CPU最大值，单位0.01%')
+    cpu_sum = db.Column(ScaledPercentSum, nullable=False, comment='CPU总和，单位0.01%')
+    cpu_last = db.Column(ScaledPercent, nullable=False, comment='CPU最后值，单位0.01%')
+    memory_min = db.Column(ScaledPercent, nullable=False, comment='内存最小值，单位0.01%')
+    memory_max = db.Column(ScaledPercent, nullable=False, comment='内存最大值，单位0.01%')
+    memory_sum = db.Column(ScaledPercentSum, nullable=False, comment='内存总和，单位0.01%')
+    memory_last = db.Column(ScaledPercent, nullable=False, comment='内存最后值，单位0.01%')
+    disk_min = db.Column(ScaledPercent, nullable=False, comment='磁盘最小值，单位0.01%')
+    disk_max = db.Column(ScaledPercent, nullable=False, comment='磁盘最大值，单位0.01%')
+    disk_sum = db.Column(ScaledPercentSum, nullable=False, comment='磁盘总和，单位0.01%')
+    disk_last = db.Column(ScaledPercent, nullable=False, comment='磁盘最后值，单位0.01%')
+    last_at = db.Column(db.DateTime, nullable=False, comment='桶内最后一个样本的记录时间')
+
+    #计算记录时间所在时间桶的起始时间
+    @classmethod
+    def bucket_of(cls, recorded_at):
+        seconds = int(recorded_at.timestamp()) // cls.bucket_seconds * cls.bucket_seconds
+        return datetime.fromtimestamp(seconds)
+
+    #把原始数据行（monitor_data 字典）按 (服务器, 时间桶) 预聚合，结果按主键排序
+    @classmethod
+    def aggregate(cls, rows):
+        buckets = {}
+        for row in rows:
+            key = (row['server_id'], cls.bucket_of(row['recorded_at']))
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = {'server_id': key[0], 'bucket_start': key[1], 'sample_count': 0,
+                                         'last_at': row['recorded_at']}
+                for metric in ROLLUP_METRICS:
+                    value = float(row[f'{metric}_value'])
+                    bucket.update({f'{metric}_min': value, f'{metric}_max': value,
+                                   f'{metric}_sum': 0.0, f'{metric}_last': value})
+            bucket['sample_count'] += 1
+            is_last = row['recorded_at'] >= bucket['last_at']
+            for metric in ROLLUP_METRICS:
+                value = float(row[f'{metric}_value'])
+                bucket[f'{metric}_min'] = min(bucket[f'{metric}_min'], value)
+                bucket[f'{metric}_max'] = max(bucket[f'{metric}_max'], value)
+                bucket[f'{metric}_sum'] += value
+                if is_last:
+                    bucket[f'{metric}_last'] = value
+            if is_last:
+                bucket['last_at'] = row['recorded_at']
+        # 固定加锁顺序，避免多个进程同时更新相同的桶时死锁
+        return [buckets[key] for key in sorted(buckets)]
+
+    #把预聚合结果合并进汇总表（不提交事务，由调用方与原始数据一起提交）
+    # replace=True 时直接覆盖已有的桶（回填时使用，结果由原始数据完整重算）
+    @classmethod
+    def merge(cls, buckets, replace=False):
+        if not buckets:
+            return 0
+        stmt = insert(cls.__table__)
+        inserted = stmt.inserted
+        table = cls.__table__.c
+        if replace:
+            updates = [(column, inserted[column]) for column in buckets[0] if column not in ('server_id', 'bucket_start')]
+        else:
+            # MySQL 按书写顺序执行赋值，最后值要在 last_at 更新之前根据旧的 last_at 判断
+            updates = [('sample_count', table.sample_count + inserted.sample_count)]
+            for metric in ROLLUP_METRICS:
+                updates += [
+                    (f'{metric}_min', db.func.least(table[f'{metric}_min'], inserted[f'{metric}_min'])),
+                    (f'{metric}_max', db.func.greatest(table[f'{metric}_max'], inserted[f'{metric}_max'])),
+                    (f'{metric}_sum', table[f'{metric}_sum'] + inserted[f'{metric}_sum']),
+                    (f'{metric}_last', db.case((inserted.last_at >= table.last_at, inserted[f'{metric}_last']),
+                                               else_=table[f'{metric}_last'])),
+                ]
+            updates.append(('last_at', db.func.greatest(table.last_at, inserted.last_at)))
+        db.session.execute(stmt.on_duplicate_key_update(updates), buckets)
+        return len(buckets)
+
+    #查询指定服务器从 start_time 起的汇总数据
+    @classmethod
+    def get_series(cls, server_id, start_time):
+        return cls.query.filter(
+            cls.server_id == server_id,
+            cls.bucket_start >= cls.bucket_of(start_time)
+        ).order_by(cls.bucket_start.asc()).all()
+
+    def to_point(self):
+        """转换为与原始数据相同结构的数据点（*_value 为平均值），附带最小/最大值与样本数"""
+        point = {'server_id': self.server_id, 'recorded_at': str(self.bucket_start), 'sample_count': self.sample_count}
+        for metric in ROLLUP_METRICS:
+            point[f'{metric}_value'] = round(getattr(self, f'{metric}_sum') / self.sample_count, 2)
+            point[f'{metric}_min'] = getattr(self, f'{metric}_min')
+            point[f'{metric}_max'] = getattr(self, f'{metric}_max')
+        return point
+
+
+class MonitorRollup1m(MonitorRollupMixin, db.Model):
+    __tablename__ = 'monitor_rollup_1m'
+    bucket_seconds = 60
+    resolution = '1m'
+
+
+class MonitorRollup5m(MonitorRollupMixin, db.Model):
+    __tablename__ = 'monitor_rollup_5m'
+    bucket_seconds = 300
+    resolution = '5m'
+
+
+class MonitorRollup1h(MonitorRollupMixin, db.Model):
+    __tablename__ = 'monitor_rollup_1h'
+    bucket_seconds = 3600
+    resolution = '1h'
+
+
+# 由细到粗排列
+ROLLUP_MODELS = (MonitorRollup1m, MonitorRollup5m, MonitorRollup1h)
+
+
+#在原始数据写入的同一事务内增量更新全部汇总表
+def update_rollups(rows):
+    for model in ROLLUP_MODELS:
+        model.merge(model.aggregate(rows))
+
+
+#选择满足点数要求的最粗分辨率：时间范围内的桶数不少于 points；都不满足时返回None（使用原始数据）
+def choose_rollup(hours, points):
+    for model in reversed(ROLLUP_MODELS):
+        if hours * 3600 / model.bucket_seconds >= points:
+            return model
+    return None
+
+
+#读取 [start, end) 内全部服务器的原始数据行（server_id、三项指标、recorded_at），与存储后端无关
+# 使用压缩数据块存储时按服务器逐台读取数据块（样本时间精确到秒，区间右端取 end 前一秒）
+def _raw_rows(start, end):
+    from .monitor import MonitorData
+    from .server import Server
+
+    if METRICS_BACKEND == 'chunks':
+        rows = []
+        for (server_id,) in db.session.execute(db.select(Server.id).order_by(Server.id)):
+            rows.extend({'server_id': server_id, 'cpu_value': cpu_value, 'memory_value': memory_value,
+                         'disk_value': disk_value, 'recorded_at': recorded_at}
+                        for recorded_at, cpu_value, memory_value, disk_value
+                        in MonitorData.get_values(server_id, start, end - timedelta(seconds=1)))
+        return rows
+
+    table = MonitorData.__table__
+    columns = [table.c.server_id, table.c.cpu_value, table.c.memory_value, table.c.disk_value, table.c.recorded_at]
+    return [row._asdict() for row in db.session.execute(
+        db.select(*columns).where(table.c.recorded_at >= start, table.c.recorded_at < end)
+    )]
+
+
+#用原始数据重算 [start, end) 范围内的汇总（按小时分块，每块一个事务），返回处理的原始数据行数
+def rebuild_rollups(start, end, chunk=timedelta(hours=1)):
+    # 块边界对齐到整小时，保证每个时间桶完整落在一个块内
+    chunk_start = MonitorRollup1h.bucket_of(start)
+    total = 0
+    while chunk_start < end:
+        chunk_end = chunk_start + chunk
+        rows = _raw_rows(chunk_start, chunk_end)
+        for model in ROLLUP_MODELS:
+            model.merge(model.aggregate(rows), replace=True)
+        db.session.commit()
+        total += len(rows)
+        chunk_start = chunk_end
+    return total
@@ -2,7 +2,9 @@ from datetime import datetime
 from .base import db
 from .associations import server_users
 from .user import User
-from .monitor import MonitorData
+from .monitor import MonitorData, ServerLatestMetrics
+from .rollup import ROLLUP_MODELS
+from config.setting import METRICS_BACKEND
 
 class ServerGroup(db.Model):
     """
@@ -68,7 +70,9 @@ class Server(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.now, comment='创建时间')
     
     # 关联关系：一个服务器可以有多个监控数据记录
-    monitor_data = db.relationship('MonitorData', backref='server', lazy='dynamic', cascade='all, delete-orphan')
+    # monitor_data 为分区表没有外键，通过 primaryjoin + foreign() 声明关联
+    monitor_data = db.relationship('MonitorData', primaryjoin='Server.id == foreign(MonitorData.server_id)',
+                                   backref='server', lazy='dynamic', cascade='all, delete-orphan')
     alert_rules = db.relationship('AlertRule', backref='server', lazy=True, cascade='all, delete-orphan')
     alert_history = db.relationship('AlertHistory', backref='server', lazy='dynamic', cascade='all, delete-orphan')
 
@@ -112,13 +116,25 @@ class Server(db.Model):
         return server       #返回服务器对象
 
     #获取所有服务器列表
+    # with_relations=True 时一并预加载关联用户与分组（joinedload，随主查询JOIN），逐个访问 server.users / server.group 不再各自触发查询
+    # 关联用户用 subqueryload：以主查询为子查询一次取出全部关联；selectinload 每500个主键一批，服务器多时查询数会增长
     @classmethod
-    def get_all(cls):
-        return cls.query.all()      #Returns:    List[Server]: 所有服务器对象列表
+    def get_all(cls, with_relations=False):
+        query = cls.query
+        if with_relations:
+            query = query.options(*cls._relation_options())
+        return query.order_by(cls.id).all()      #Returns:    List[Server]: 所有服务器对象列表
+
+    #预加载关联用户与分组的查询选项
+    @classmethod
+    def _relation_options(cls):
+        return (db.subqueryload(cls.users), db.joinedload(cls.group))
 
     #根据id获取服务器信息
     @classmethod
-    def get_by_id(cls, server_id):
+    def get_by_id(cls, server_id, with_relations=False):
+        if with_relations:
+            return cls.query.options(*cls._relation_options()).filter_by(id=server_id).first()
         return cls.query.get(server_id)#根据id返回一个服务器对象
 
     # 根据ip获取服务器信息
@@ -141,6 +157,12 @@ class Server(db.Model):
             # 理论上不需要手动删 MonitorData，但为了保险起见还是显式保留逻辑或简化它
             # 由于配置了 cascade，这里只需删 server 即可
             MonitorData.query.filter_by(server_id=server_id).delete()
+            for rollup in ROLLUP_MODELS:
+                rollup.query.filter_by(server_id=server_id).delete()
+            ServerLatestMetrics.query.filter_by(server_id=server_id).delete()
+            if METRICS_BACKEND == 'chunks':
+                from lib.chunk_store import get_chunk_store
+                get_chunk_store().drop_server(server_id)
             db.session.delete(server)
             db.session.commit()
             return True
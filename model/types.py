@@ -0,0 +1,54 @@
+import math
+from sqlalchemy.types import TypeDecorator, SmallInteger, Integer
+
+# 百分比指标的合法范围，接口层写入前校验（见 percent_value）
+PERCENT_MIN = 0.0
+PERCENT_MAX = 100.0
+
+
+class PercentValueError(ValueError):
+    """百分比指标值不是有限数或超出 [0, 100]"""
+
+
+#把上报值转换为百分比 float，非有限数（NaN/inf）或超出 [0, 100] 时抛出 PercentValueError
+def percent_value(value):
+    number = float(value)
+    if not math.isfinite(number) or not PERCENT_MIN <= number <= PERCENT_MAX:
+        raise PercentValueError(f"百分比指标值需在 {PERCENT_MIN:g} 到 {PERCENT_MAX:g} 之间: {value}")
+    return number
+
+
+class ScaledPercent(TypeDecorator):
+    """
+    【新增】百分比定点存储类型
+    解决痛点：DECIMAL(5,2) 每个值占3字节，读出时每个字段都要构造 decimal.Decimal 再转 float
+    数据库中按百分之一存为 SMALLINT（12.34% 存为 1234，占2字节），模型层读写仍是 float 百分比，
+    接口输出与原来一致；写入时四舍五入到两位小数，与 DECIMAL(5,2) 精度相同
+    值域由接口层校验（percent_value）；绕过校验的值在这里截断到列能存储的范围，避免整批多行INSERT因一行越界失败，
+    NaN/inf 无法截断，直接报错
+    """
+    impl = SmallInteger
+    cache_ok = True
+    scale = 100
+    stored_min = -32768
+    stored_max = 32767
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        number = float(value)
+        if not math.isfinite(number):
+            raise PercentValueError(f"百分比指标值不是有限数: {value}")
+        return min(max(int(round(number * self.scale)), self.stored_min), self.stored_max)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return value / self.scale
+
+
+class ScaledPercentSum(ScaledPercent):
+    """汇总表中百分比的总和，按百分之一存为 INT"""
+    impl = Integer
+    stored_min = -2147483648
+    stored_max = 2147483647
@@ -1,5 +1,6 @@
 from flask import Blueprint
 from flask_restful import Api
+from lib.serializer import output_json
 
 #创建蓝图实例，用于管理路由
 # 1. "mon_bp"：蓝图的唯一标识名称（内部使用，一般与变量名保持一致）
@@ -10,6 +11,9 @@ mon_bp = Blueprint("monitor",__name__,url_prefix="/api")
 #创建flask_restful  api实例并将其绑定到蓝图,这样所有通过该Api注册的路由都会自动归属到蓝图下
 api = Api(mon_bp)
 
+#所有接口的JSON响应改用 lib/serializer.py 序列化（orjson，未安装时回退标准库），替代 flask_restful 默认编码
+api.representation('application/json')(output_json)
+
 
 #将蓝图注册到flask核心对象进行绑定
 def init_app(app):
@@ -21,9 +25,10 @@ def init_app(app):
     from .auth import Auth
     from .user import UserManagement
     from .server import ServerManagement, UserServers, ServerUserAPI, ServerGroupManagement
-    from .monitor import MonitorDataAPI, MonitorStats
+    from .monitor import MonitorDataAPI, MonitorDataBatchAPI, MonitorStats, MonitorIngestStats
     from .alert import AlertRuleAPI, AlertRuleDetailAPI, AlertHistoryAPI
     from .audit import AuditLogAPI
+    from .credential import ApiCredentialAPI
 
     #
     # 资源类绑定api，注册路由
@@ -44,11 +49,19 @@ def init_app(app):
     # 服务器多用户关联管理（仅管理员）
     api.add_resource(ServerUserAPI, '/servers/<int:server_id>/users', '/servers/<int:server_id>/users/<int:user_id>')
 
+    # ==================== API凭证路由 ====================
+    # Agent上报凭证的创建、轮换与启停（仅管理员）
+    api.add_resource(ApiCredentialAPI, '/api-credentials', '/api-credentials/<int:credential_id>')
+
     # ==================== 监控数据路由 ====================
     # 监控数据提交（API密钥认证）和查询（管理员认证）
     api.add_resource(MonitorDataAPI, '/monitor/data')
+    # 监控数据批量提交（API密钥认证），支持多台服务器、多条样本一次上报
+    api.add_resource(MonitorDataBatchAPI, '/monitor/data/batch')
     # 监控数据统计（需要认证）
     api.add_resource(MonitorStats, '/monitor/stats')
+    # 监控数据写入链路统计（仅管理员）
+    api.add_resource(MonitorIngestStats, '/monitor/ingest-stats')
     
     # ==================== 告警管理路由 ====================
     # 告警规则 CRUD
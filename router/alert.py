@@ -5,6 +5,9 @@ from lib.response import response
 from model import AlertRule, AlertHistory, Server, User, AuditLog
 from model import db
 from lib.jwt_utils import admin_required
+from lib.server_cache import server_cache
+from lib.pagination import keyset_page, page_total, TOTAL_MODES
+from model.types import percent_value
 
 class AlertRuleAPI(Resource):
     @admin_required
@@ -44,6 +47,10 @@ class AlertRuleAPI(Resource):
             
             if not all([server_id, metric_type, threshold]):
                 return response(message="缺少必要参数", code=400)
+            try:
+                threshold = percent_value(threshold)
+            except (TypeError, ValueError):
+                return response(message="告警阈值需在 0 到 100 之间", code=400)
                 
             # 检查是否已存在相同规则
             existing = AlertRule.query.filter_by(
@@ -63,6 +70,8 @@ class AlertRuleAPI(Resource):
             )
             db.session.add(rule)
             db.session.commit()
+            # 告警阈值随服务器身份一起缓存，规则变更后使其失效
+            server_cache.invalidate(server_id=rule.server_id)
             
             # 审计日志
             current_user_id = get_jwt_identity()
@@ -83,13 +92,17 @@ class AlertRuleDetailAPI(Resource):
                 
             data = request.json
             if 'threshold' in data:
-                rule.threshold = data['threshold']
+                try:
+                    rule.threshold = percent_value(data['threshold'])
+                except (TypeError, ValueError):
+                    return response(message="告警阈值需在 0 到 100 之间", code=400)
             if 'silence_minutes' in data:
                 rule.silence_minutes = data['silence_minutes']
             if 'is_enabled' in data:
                 rule.is_enabled = data['is_enabled']
                 
             db.session.commit()
+            server_cache.invalidate(server_id=rule.server_id)
             
             # 审计日志
             current_user_id = get_jwt_identity()
@@ -107,8 +120,10 @@ class AlertRuleDetailAPI(Resource):
             if not rule:
                 return response(message="规则不存在", code=404)
                 
+            server_id = rule.server_id
             db.session.delete(rule)
             db.session.commit()
+            server_cache.invalidate(server_id=server_id)
             
             # 审计日志
             current_user_id = get_jwt_identity()
@@ -122,20 +137,34 @@ class AlertRuleDetailAPI(Resource):
 class AlertHistoryAPI(Resource):
     @admin_required
     def get(self):
+        """
+        获取告警历史（游标分页，按 (triggered_at, id) 倒序）
+        查询参数:
+        - server_id: 按服务器筛选
+        - cursor: 上一页返回的 next_cursor，不传为第一页
+        - per_page: 每页数量，默认20，最大100
+        - total: none(默认，不计数) / estimate(估算) / exact(精确计数)
+        """
         try:
-            server_id = request.args.get('server_id')
-            page = request.args.get('page', 1, type=int)
+            server_id = request.args.get('server_id', type=int)
+            cursor = request.args.get('cursor')
             per_page = request.args.get('per_page', 20, type=int)
-            
-            query = AlertHistory.query.order_by(AlertHistory.triggered_at.desc())
-            
+            total_mode = request.args.get('total', 'none')
+            if total_mode not in TOTAL_MODES:
+                return response(message=f"total 仅支持: {', '.join(TOTAL_MODES)}", code=400)
+
+            query = AlertHistory.query
             if server_id:
-                query = query.filter_by(server_id=server_id)
-                
-            pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-            
+                query = query.filter(AlertHistory.server_id == server_id)
+
+            try:
+                # 一次性连带加载服务器名称，避免逐行访问 item.server
+                items, next_cursor = keyset_page(query.options(db.joinedload(AlertHistory.server)), AlertHistory.triggered_at, AlertHistory.id, cursor, per_page)
+            except ValueError as e:
+                return response(message=str(e), code=400)
+
             result = []
-            for item in pagination.items:
+            for item in items:
                 item_dict = {
                     'id': item.id,
                     'server_id': item.server_id,
@@ -148,12 +177,12 @@ class AlertHistoryAPI(Resource):
                     'resolved_at': str(item.resolved_at) if item.resolved_at else None
                 }
                 result.append(item_dict)
-                
+
             return response(data={
                 'list': result,
-                'total': pagination.total,
-                'page': page,
-                'pages': pagination.pages
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
+                'total': page_total(query, AlertHistory.__tablename__, total_mode, filtered=bool(server_id))
             }, message="获取告警历史成功")
         except Exception as e:
             return response(message=f"获取告警历史失败: {str(e)}", code=500)
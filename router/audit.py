@@ -3,28 +3,34 @@ from flask_restful import Resource
 from lib.response import response
 from model import AuditLog
 from lib.jwt_utils import admin_required
+from lib.pagination import keyset_page, page_total, TOTAL_MODES
 
 class AuditLogAPI(Resource):
     @admin_required
     def get(self):
         """
-        获取审计日志列表（分页）
+        获取审计日志列表（游标分页，按 (created_at, id) 倒序）
         查询参数:
-        - page: 页码，默认1
-        - per_page: 每页数量，默认20
+        - cursor: 上一页返回的 next_cursor，不传为第一页
+        - per_page: 每页数量，默认20，最大100
+        - total: none(默认，不计数) / estimate(估算) / exact(精确计数)
         """
         try:
-            page = request.args.get('page', 1, type=int)
+            cursor = request.args.get('cursor')
             per_page = request.args.get('per_page', 20, type=int)
-            
-            # 按时间倒序查询
-            pagination = AuditLog.query.order_by(AuditLog.created_at.desc()).paginate(
-                page=page, per_page=per_page, error_out=False
-            )
-            
+            total_mode = request.args.get('total', 'none')
+            if total_mode not in TOTAL_MODES:
+                return response(message=f"total 仅支持: {', '.join(TOTAL_MODES)}", code=400)
+
+            # 按时间倒序查询，从游标位置继续
+            try:
+                items, next_cursor = keyset_page(AuditLog.query, AuditLog.created_at, AuditLog.id, cursor, per_page)
+            except ValueError as e:
+                return response(message=str(e), code=400)
+
             # 序列化结果
             logs = []
-            for log in pagination.items:
+            for log in items:
                 logs.append({
                     'id': log.id,
                     'user_id': log.user_id,
@@ -38,9 +44,9 @@ class AuditLogAPI(Resource):
                 
             return response(data={
                 'list': logs,
-                'total': pagination.total,
-                'pages': pagination.pages,
-                'current_page': page
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
+                'total': page_total(AuditLog.query, AuditLog.__tablename__, total_mode)
             })
             
         except Exception as e:
@@ -0,0 +1,89 @@
+"""
+API凭证管理接口
+Agent上报使用的 AppID/SecretKey 的创建、轮换与启停（仅管理员）
+SecretKey 只在创建和轮换时返回一次
+"""
+
+from flask import request
+from flask_restful import Resource
+from flask_jwt_extended import get_jwt_identity
+from lib.response import response
+from model import ApiCredential, Server, User, AuditLog
+from lib.jwt_utils import admin_required
+from lib.api_auth import credential_cache
+
+#API凭证管理资源类
+class ApiCredentialAPI(Resource):
+    #获取凭证列表（不含密钥）
+    @admin_required
+    def get(self):
+        try:
+            credentials = ApiCredential.get_all()
+            return response(data=[dict(credential) for credential in credentials], message="获取凭证列表成功")
+        except Exception as e:
+            return response(message="获取凭证列表失败", code=500)
+
+    #创建凭证
+    @admin_required
+    def post(self):
+        try:
+            data = request.json or {}
+            app_id = data.get('app_id')
+            server_id = data.get('server_id')
+            description = data.get('description')
+
+            if app_id and ApiCredential.query.filter_by(app_id=app_id).first():
+                return response(message="AppID已存在", code=400)
+            if server_id and not Server.get_by_id(server_id):
+                return response(message="服务器不存在", code=400)
+
+            credential = ApiCredential.create(app_id=app_id, server_id=server_id, description=description)
+            credential_cache.invalidate()
+
+            _audit('CREATE_API_CREDENTIAL', credential, f'server_id={server_id}')
+
+            result = dict(credential)
+            result['secret_key'] = credential.secret_key
+            return response(data=result, message="凭证创建成功，请妥善保存密钥")
+        except Exception as e:
+            return response(message=f"创建凭证失败: {str(e)}", code=500)
+
+    #轮换密钥或启停凭证
+    # 请求体: {"action": "rotate"} 或 {"is_enabled": true/false}
+    @admin_required
+    def put(self, credential_id=None):
+        try:
+            if not credential_id:
+                return response(message="缺少凭证ID", code=400)
+            data = request.json or {}
+
+            if data.get('action') == 'rotate':
+                credential = ApiCredential.rotate(credential_id)
+                if not credential:
+                    return response(message="凭证不存在", code=404)
+                credential_cache.invalidate()
+                _audit('ROTATE_API_CREDENTIAL', credential)
+
+                result = dict(credential)
+                result['secret_key'] = credential.secret_key
+                return response(data=result, message="密钥已轮换，请更新Agent配置")
+
+            if 'is_enabled' in data:
+                credential = ApiCredential.set_enabled(credential_id, bool(data['is_enabled']))
+                if not credential:
+                    return response(message="凭证不存在", code=404)
+                credential_cache.invalidate()
+                _audit('ENABLE_API_CREDENTIAL' if credential.is_enabled else 'DISABLE_API_CREDENTIAL', credential)
+                return response(data=dict(credential), message="凭证状态已更新")
+
+            return response(message="无效的操作", code=400)
+        except Exception as e:
+            return response(message=f"更新凭证失败: {str(e)}", code=500)
+
+
+# 记录凭证变更审计日志（不记录密钥）
+def _audit(action, credential, details=None):
+    current_user_id = get_jwt_identity()
+    current_user = User.get_by_id(current_user_id) if current_user_id else None
+    content = f'app_id={credential.app_id}' + (f', {details}' if details else '')
+    AuditLog.log(current_user, action, f'credential_id={credential.id}', details=content)
@@ -3,15 +3,33 @@
 支持批量数据提交和IP地址匹配
 """
 
-from flask import request, current_app
+import json
+from datetime import datetime, timedelta
+from flask import request, current_app, g, stream_with_context
 from flask_restful import Resource
 from lib.response import response
-from model import MonitorData, Server
+from model import MonitorData, ServerLatestMetrics, Server
+from model.rollup import choose_rollup
+from model.types import percent_value, PercentValueError
 from model import db
 from lib.jwt_utils import admin_required
+from lib.query_budget import query_budget
+from lib.response_cache import cached_response
 from lib.api_auth import api_key_required
 from mail.alert import check_and_send_alert_by_ip
-from lib.async_tasks import executor, async_process_monitor_data
+from lib.server_cache import server_cache
+from lib.async_tasks import IngestQueueFull, submit_samples, ingest_stats
+from lib.codec import decode_body, PayloadDecodeError
+from lib.downsample import downsample_rows, METHODS as DOWNSAMPLE_METHODS, MIN_POINTS as DOWNSAMPLE_MIN_POINTS
+from lib.serializer import dumps
+from config.setting import INGEST_BATCH_MAX_RECORDS, INGEST_MAX_BODY_BYTES, INGEST_EXTRA_MAX_KEYS, INGEST_EXTRA_MAX_BYTES
+from config.setting import HISTORY_STREAM_BATCH, HISTORY_STREAM_MAX_HOURS
+
+# 写入固定列的指标字段，其余指标（负载、网络IO、Agent自身开销等）存入 extra_metrics
+CORE_METRIC_KEYS = ('cpu', 'cpu_value', 'memory', 'memory_value', 'disk', 'disk_value')
+
+# 历史数据流式输出格式 -> Content-Type
+STREAM_FORMATS = {'ndjson': 'application/x-ndjson', 'json': 'application/json'}
 
 #监控数据API资源类
 class MonitorDataAPI(Resource):
@@ -19,7 +37,8 @@ class MonitorDataAPI(Resource):
     @api_key_required
     def post(self):
         try:
-            data = request.json
+            # 支持 gzip/zstd 压缩与 msgpack 编码，解码后与JSON请求结构一致
+            data = _request_body()
             server_id = data.get('server_id')
             ip_address = data.get('ip_address')
             metrics = data.get('metrics')  # 改为批量提交
@@ -28,37 +47,52 @@ class MonitorDataAPI(Resource):
             if not metrics:
                 return response(message="监控数据不能为空", code=400)
 
-            # 获取服务器
+            # 获取服务器（走进程内身份缓存）
             server = None
             if server_id:
-                # 优先使用server_id查找
-                server = Server.get_by_id(server_id)
+                # 优先使用server_id查找（兼容字符串形式的ID）
+                try:
+                    server_id = int(server_id)
+                except (TypeError, ValueError):
+                    return response(message="server_id 格式错误", code=400)
+                server = server_cache.get_by_id(server_id)
             elif ip_address:
                 # 根据IP地址查找服务器
-                server = Server.get_by_ip(ip_address)
+                server = server_cache.get_by_ip(ip_address)
             else:
                 return response(message="请提供server_id或ip_address", code=400)
 
             if not server:
                 return response(message="服务器不存在", code=400)
+            # 绑定了服务器的凭证只能上报该服务器的数据
+            if not _credential_allows(server):
+                return response(message="该凭证无权上报此服务器", code=403)
+
+            try:
+                row = _build_row(server, metrics, datetime.now())
+            except PercentValueError as e:
+                return response(message=str(e), code=400)
+            except (AttributeError, TypeError, ValueError):
+                return response(message="指标值格式错误", code=400)
 
-            # 异步处理：将数据入库和告警检查放入后台线程池
+            # 异步处理：将数据入库和告警检查放入后台线程池（开启落盘暂存时先落盘再返回）
             # 注意：需要传递当前的app对象，以便在线程中创建上下文
             # 使用 _get_current_object() 获取真实的 app 对象
-            executor.submit(
-                async_process_monitor_data, 
-                current_app._get_current_object(), 
-                server.ip_address, 
-                metrics
-            )
+            submit_samples(current_app._get_current_object(), [row])
 
             # 立即返回成功，不再等待数据库和邮件
             return response(message="监控数据已接收，正在后台处理")
 
+        except PayloadDecodeError as e:
+            return response(message=e.message, code=e.code), e.code
+        except IngestQueueFull as e:
+            return _queue_full_response(e)
         except Exception as e:
             return response(message="提交监控数据失败", code=500)
 
+    # 首页轮询：数据未变化时返回304（ETag取最新样本ID，见 lib/response_cache.py）
     @admin_required
+    @cached_response
     def get(self):
         """获取监控数据（仅管理员）"""
         try:
@@ -67,48 +101,260 @@ class MonitorDataAPI(Resource):
             metric_type = request.args.get('metric_type')
             hours = request.args.get('hours', 24, type=int)
             mode = request.args.get('mode', 'latest')  # 新增mode参数
+            points = request.args.get('points', type=int)  # 历史模式期望的最少数据点数，不传则返回原始数据
+            max_points = request.args.get('max_points', type=int)  # 历史模式最多返回的数据点数，超过时服务端降采样
+            downsample = request.args.get('downsample', 'lttb')  # 降采样方法：lttb / minmax
+            stream = request.args.get('stream')  # 流式输出原始数据：ndjson / json，可用 server_ids 指定多台服务器
+
+            if mode == 'history' and stream:
+                if stream not in STREAM_FORMATS:
+                    return response(message=f"stream 只支持 {', '.join(STREAM_FORMATS)}", code=400)
+                try:
+                    server_ids = [int(item) for item in request.args.get('server_ids', '').split(',') if item.strip()]
+                except ValueError:
+                    return response(message="server_ids 格式错误", code=400)
+                server_ids = server_ids or ([server_id] if server_id else [])
+                if not server_ids:
+                    return response(message="必须提供 server_id 或 server_ids 以获取历史数据", code=400)
+                if hours <= 0 or hours > HISTORY_STREAM_MAX_HOURS:
+                    return response(message=f"hours 需在 1 到 {HISTORY_STREAM_MAX_HOURS} 之间", code=400)
+                start_time = datetime.now() - timedelta(hours=hours)
+                rows = MonitorData.iter_history_rows(server_ids, start_time, batch_size=HISTORY_STREAM_BATCH)
+                return current_app.response_class(stream_with_context(_stream_rows(rows, stream)),
+                                                  mimetype=STREAM_FORMATS[stream])
 
             if mode == 'history':
                 # 获取指定服务器的历史趋势数据
                 if not server_id:
                     return response(message="必须提供 server_id 以获取历史数据", code=400)
-                data = MonitorData.get_history_by_server_id(server_id, hours)
-            elif server_id:
-                # 获取指定服务器的数据
-                data = MonitorData.get_latest_by_server(server_id)
-                if data:
-                    data = [data]  # 转换为列表格式
-                else:
-                    data = []
+                if downsample not in DOWNSAMPLE_METHODS:
+                    return response(message=f"downsample 只支持 {', '.join(DOWNSAMPLE_METHODS)}", code=400)
+                if max_points is not None and max_points < DOWNSAMPLE_MIN_POINTS[downsample]:
+                    return response(message=f"{downsample} 降采样的 max_points 不能小于 {DOWNSAMPLE_MIN_POINTS[downsample]}", code=400)
+                # 选择点数仍不少于 points 的最粗汇总分辨率，都不满足时使用原始数据
+                rollup = choose_rollup(hours, points) if points and points > 0 else None
+                if rollup:
+                    start_time = datetime.now() - timedelta(hours=hours)
+                    data_list = [item.to_point() for item in rollup.get_series(server_id, start_time)]
+                    data_list = downsample_rows(data_list, max_points, downsample)
+                    return response(data=data_list, message=f"获取监控数据成功（{rollup.resolution}汇总）")
+                # 快速读取路径：Core select 直接得到可序列化的字典，不构造ORM对象
+                data_list = MonitorData.get_history_rows(server_id, hours)
+                # 点数超过 max_points 时降采样（保留尖峰所在的原始样本）
+                data_list = downsample_rows(data_list, max_points, downsample)
             else:
-                # 获取所有最新数据
-
-                data = []
-                servers = Server.get_all()
-                for server in servers:
-                    latest = MonitorData.get_latest_by_server(server.id)
-                    if latest:
-                        data.append(latest)
-
-            # 转换为字典格式，处理Decimal类型
-            data_list = []
-            for item in data:
-                item_dict = dict(item)
-                # 将Decimal类型转换为float
-                for field in ['cpu_value', 'memory_value', 'disk_value']:
-                    if field in item_dict and item_dict[field] is not None:
-                        item_dict[field] = float(item_dict[field])
-                data_list.append(item_dict)
+                # 获取指定服务器或所有服务器的最新数据（读取最新值表，一次查询，与服务器数量无关）
+                data_list = ServerLatestMetrics.get_rows(server_id)
 
             return response(data=data_list, message="获取监控数据成功")
 
         except Exception as e:
             return response(message="获取监控数据失败", code=500)
 
+#批量监控数据上报API资源类
+class MonitorDataBatchAPI(Resource):
+    """
+    批量提交监控数据（需要API密钥）
+    请求体: {"records": [{"server": 1 或 "10.0.0.1", "timestamp": 1700000000, "metrics": {...}}, ...]}
+    也可使用 msgpack 或紧凑定长格式（application/x-monitor-packed）编码，并支持 gzip/zstd 压缩，见 lib/codec.py
+    - server 可为服务器ID(int)或IP地址(str)，也兼容 server_id / ip_address 字段
+    - timestamp 为Unix秒级时间戳，缺省取服务端接收时间
+    响应中逐条返回是否接收，客户端只需重发未接收的记录
+    """
+    @api_key_required
+    def post(self):
+        try:
+            # 支持 gzip/zstd 压缩、msgpack 编码与紧凑定长格式
+            data = _request_body()
+            records = data.get('records')
+
+            if not isinstance(records, list) or not records:
+                return response(message="records不能为空", code=400)
+            if len(records) > INGEST_BATCH_MAX_RECORDS:
+                return response(message=f"单次最多提交{INGEST_BATCH_MAX_RECORDS}条记录", code=400)
+
+            # 1. 收集所有服务器标识，先查身份缓存，未命中的合并为一次查询解析
+            server_ids, ip_addresses = set(), set()
+            for record in records:
+                server_key = _record_server_key(record)
+                if isinstance(server_key, int):
+                    server_ids.add(server_key)
+                elif isinstance(server_key, str):
+                    ip_addresses.add(server_key)
+
+            by_id, by_ip = server_cache.get_many(server_ids, ip_addresses)
+
+            # 2. 逐条校验，生成待入库数据与逐条结果
+            now = datetime.now()
+            rows = []
+            results = []
+            for index, record in enumerate(records):
+                server_key = _record_server_key(record)
+                if isinstance(server_key, int):
+                    server = by_id.get(server_key)
+                elif isinstance(server_key, str):
+                    server = by_ip.get(server_key)
+                else:
+                    results.append({'index': index, 'accepted': False, 'error': '缺少server'})
+                    continue
+                if not server:
+                    results.append({'index': index, 'accepted': False, 'error': '服务器不存在'})
+                    continue
+                if not _credential_allows(server):
+                    results.append({'index': index, 'accepted': False, 'error': '该凭证无权上报此服务器'})
+                    continue
+
+                metrics = record.get('metrics') if isinstance(record, dict) else None
+                if not metrics:
+                    results.append({'index': index, 'accepted': False, 'error': '监控数据不能为空'})
+                    continue
+
+                timestamp = record.get('timestamp')
+                if timestamp is None:
+                    recorded_at = now
+                else:
+                    try:
+                        recorded_at = datetime.fromtimestamp(float(timestamp))
+                    except (TypeError, ValueError, OverflowError, OSError):
+                        results.append({'index': index, 'accepted': False, 'error': '时间戳格式错误'})
+                        continue
+                    if recorded_at > now:
+                        # 客户端时钟超前时按接收时间记录，避免写入未来数据
+                        recorded_at = now
+
+                try:
+                    rows.append(_build_row(server, metrics, recorded_at))
+                except PercentValueError as e:
+                    results.append({'index': index, 'accepted': False, 'error': str(e)})
+                    continue
+                except (AttributeError, TypeError, ValueError):
+                    results.append({'index': index, 'accepted': False, 'error': '指标值格式错误'})
+                    continue
+                results.append({'index': index, 'accepted': True})
+
+            # 3. 整批交给后台一次写入
+            if rows:
+                submit_samples(current_app._get_current_object(), rows)
+
+            return response(data={
+                'accepted': len(rows),
+                'rejected': len(records) - len(rows),
+                'results': results
+            }, message="批量监控数据已接收，正在后台处理")
+
+        except PayloadDecodeError as e:
+            return response(message=e.message, code=e.code), e.code
+        except IngestQueueFull as e:
+            return _queue_full_response(e)
+        except Exception as e:
+            return response(message="批量提交监控数据失败", code=500)
+
+
+# 流式输出历史数据，每 HISTORY_STREAM_BATCH 行写出一次（不设 Content-Length，由服务器分块传输）
+# - ndjson：每行一个样本；中途出错时最后一行为 {"code": 500, "msg": ...}
+# - json：与普通接口相同的 code/msg/data 结构，data 放在最前面以便边查边写，code 在末尾按实际结果输出
+def _stream_rows(rows, fmt):
+    ndjson = fmt == 'ndjson'
+    separator = b'\n' if ndjson else b','
+    tail = b'\n' if ndjson else b''
+    buffer = []
+    count = 0
+    if not ndjson:
+        yield b'{"data":['
+    try:
+        for row in rows:
+            buffer.append(dumps(row, newline=False))
+            count += 1
+            if len(buffer) >= HISTORY_STREAM_BATCH:
+                # 批与批之间的分隔符放在下一批开头
+                yield separator.join(buffer) + tail
+                buffer = []
+                if not ndjson:
+                    buffer.append(b'')
+        status = {'code': 0, 'msg': f"获取监控数据成功（共{count}条）"}
+    except Exception as e:
+        print(f"流式输出历史数据失败（已读取{count}条）: {str(e)}")
+        status = {'code': 500, 'msg': "获取监控数据失败"}
+    if any(buffer):
+        yield separator.join(buffer) + tail
+    if ndjson:
+        if status['code'] != 0:
+            yield dumps(status)
+    else:
+        yield b'],' + dumps(status)[1:]
+
+
+# 按 Content-Type / Content-Encoding 解码上报请求体
+def _request_body():
+    return decode_body(
+        request.get_data(cache=False),
+        request.content_type,
+        request.headers.get('Content-Encoding'),
+        max_bytes=INGEST_MAX_BODY_BYTES
+    )
+
+
+# 由上报的指标字典生成一行监控数据，支持 cpu/cpu_value 两种字段名格式，其余指标存入 extra_metrics
+# 入队前逐条校验：百分比须为 [0, 100] 内的有限数，扩展指标不能含 NaN/inf（MySQL JSON不接受），
+# 否则一条坏样本会让整批多行INSERT失败，开启落盘暂存时回放会反复重试同一批
+def _build_row(server, metrics, recorded_at):
+    return {
+        'server_id': server.id,
+        'ip_address': server.ip_address,
+        'cpu_value': percent_value(metrics.get('cpu_value', metrics.get('cpu', 0.0))),
+        'memory_value': percent_value(metrics.get('memory_value', metrics.get('memory', 0.0))),
+        'disk_value': percent_value(metrics.get('disk_value', metrics.get('disk', 0.0))),
+        'extra_metrics': _extra_metrics(metrics),
+        'recorded_at': recorded_at
+    }
+
+
+# 提取扩展指标，按键数与序列化大小限制，防止单条样本过大
+def _extra_metrics(metrics):
+    extra = {key: value for key, value in metrics.items() if key not in CORE_METRIC_KEYS}
+    if not extra:
+        return None
+    if len(extra) > INGEST_EXTRA_MAX_KEYS or len(json.dumps(extra, allow_nan=False)) > INGEST_EXTRA_MAX_BYTES:
+        raise ValueError('扩展指标过多')
+    return extra
+
+
+# 当前请求的凭证是否允许上报该服务器（通用凭证不限制）
+def _credential_allows(server):
+    allowed_server_id = g.get('api_server_id')
+    return allowed_server_id is None or allowed_server_id == server.id
+
+
+# 上报队列已满时的响应：HTTP 503 + Retry-After，提示客户端稍后重试
+def _queue_full_response(e):
+    return response(message="服务繁忙，请稍后重试", code=503), 503, {'Retry-After': str(e.retry_after)}
+
+
+# 解析批量记录中的服务器标识：int 视为服务器ID，str 视为IP地址
+def _record_server_key(record):
+    if not isinstance(record, dict):
+        return None
+    server_key = record.get('server')
+    if server_key is None and record.get('server_id') is not None:
+        try:
+            server_key = int(record.get('server_id'))
+        except (TypeError, ValueError):
+            return None
+    elif server_key is None:
+        server_key = record.get('ip_address')
+    if isinstance(server_key, bool):
+        return None
+    return server_key
+
+
 #监控统计API资源类
 class MonitorStats(Resource):
     #获取监控统计信息
+    # SQL条数与服务器数量无关：鉴权1条 + 数据版本号1条（TTL内不查） + 服务器(JOIN分组)1条 + 关联用户1条 + 最新数据1条
+    # 数据未变化时返回304或复用已缓存的响应（见 lib/response_cache.py）
+    @query_budget(5)
     @admin_required
+    @cached_response
     def get(self):
         try:
             # 获取查询参数
@@ -116,9 +362,14 @@ class MonitorStats(Resource):
             hours = request.args.get('hours', 24, type=int)
 
             if server_id:
-                servers = [Server.get_by_id(server_id)]
+                server = Server.get_by_id(server_id, with_relations=True)
+                servers = [server] if server else []
             else:
-                servers = Server.get_all()
+                # 预加载关联用户，避免逐台查询 server.users
+                servers = Server.get_all(with_relations=True)
+
+            # 一次查询取出全部服务器的最新数据
+            latest_map = ServerLatestMetrics.get_map([server.id for server in servers] if server_id else None)
 
             stats = []
             for server in servers:
@@ -132,7 +383,7 @@ class MonitorStats(Resource):
                 }
 
                 # 获取最新监控数据
-                latest_data = MonitorData.get_latest_by_server(server.id)
+                latest_data = latest_map.get(server.id)
                 if latest_data:
                     from config.setting import DEFAULT_THRESHOLDS
                     server_stats['metrics'] = {
@@ -166,4 +417,12 @@ class MonitorStats(Resource):
         except Exception as e:
             return response(message="获取监控统计失败", code=500)
 
-
+#监控数据写入链路统计API资源类
+class MonitorIngestStats(Resource):
+    #获取批量写入器的配置与运行统计（攒批大小、写入间隔、单次写入耗时等）
+    @admin_required
+    def get(self):
+        try:
+            return response(data=ingest_stats(), message="获取写入统计成功")
+        except Exception as e:
+            return response(message="获取写入统计失败", code=500)
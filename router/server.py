@@ -9,17 +9,23 @@ from flask_jwt_extended import get_jwt_identity
 from lib.response import response
 from model import Server, User, ServerGroup, AuditLog
 from lib.jwt_utils import admin_required
+from lib.query_budget import query_budget
+from lib.server_cache import server_cache
+from lib.recent_samples import recent_samples
+from lib.response_cache import response_cache
 from model import db
 
 #服务器管理API资源类
 class ServerManagement(Resource):
     #获取服务器列表或指定服务器信息
+    # SQL条数与服务器数量无关：鉴权1条 + 服务器(JOIN分组)1条 + 关联用户1条
+    @query_budget(4)
     @admin_required
     def get(self, server_id=None):
         try:
             if server_id:
-                # 获取指定服务器信息
-                server = Server.get_by_id(server_id)
+                # 获取指定服务器信息（预加载关联用户与分组）
+                server = Server.get_by_id(server_id, with_relations=True)
                 if not server:
                     return response(message="服务器不存在", code=404)
 
@@ -33,8 +39,8 @@ class ServerManagement(Resource):
                     pass
                 return response(data=server_data, message="获取服务器信息成功")
             else:
-                # 获取所有服务器列表
-                servers = Server.get_all()
+                # 获取所有服务器列表（预加载关联用户与分组，避免逐台查询）
+                servers = Server.get_all(with_relations=True)
                 server_list = []
                 for server in servers:
                     server_data = dict(server)
@@ -94,6 +100,9 @@ class ServerManagement(Resource):
                 description=description,
                 user_ids=valid_user_ids
             )
+            # 清除该IP可能存在的"服务器不存在"负缓存，新Agent可立即上报
+            server_cache.invalidate(ip_address=ip_address)
+            response_cache.invalidate(metadata=True)
 
             # 构建返回数据
             server_data = dict(server)
@@ -163,6 +172,9 @@ class ServerManagement(Resource):
                     Server.update_users(server_id, valid_user_ids)
 
             db.session.commit()
+            # 服务器名称/IP/关联用户可能已变更，使身份缓存失效（同时清除新IP的负缓存）
+            server_cache.invalidate(server_id=server_id, ip_address=server.ip_address)
+            response_cache.invalidate(metadata=True)
 
             server_data = dict(server)
             try:
@@ -191,7 +203,11 @@ class ServerManagement(Resource):
             if not server:
                 return response(message="服务器不存在", code=404)
 
+            ip_address = server.ip_address
             Server.delete(server_id)
+            server_cache.invalidate(server_id=server_id, ip_address=ip_address)
+            response_cache.invalidate(metadata=True)
+            recent_samples.forget(server_id)
 
             # 记录审计日志
             current_user_id = get_jwt_identity()
@@ -237,6 +253,8 @@ class ServerUserAPI(Resource):
             # 添加用户关联
             server.users.append(user)
             db.session.commit()
+            server_cache.invalidate(server_id=server_id)
+            response_cache.invalidate(metadata=True)
 
             return response(message="用户添加成功")
 
@@ -263,6 +281,8 @@ class ServerUserAPI(Resource):
             # 移除用户关联
             server.users.remove(user)
             db.session.commit()
+            server_cache.invalidate(server_id=server_id)
+            response_cache.invalidate(metadata=True)
 
             return response(message="用户移除成功")
 
@@ -8,6 +8,8 @@ from flask_restful import Resource
 from model import db
 from model import User
 from lib.jwt_utils import admin_required
+from lib.server_cache import server_cache
+from lib.response_cache import response_cache
 
 #定义某个资源类，继承自Resource基类
 # 类里面每个方法对应一种HTTP请求方式，再为资源类注册路由
@@ -94,6 +96,9 @@ class UserManagement(Resource):
                 updated_user = user.update(**update_data)
                 if not updated_user:
                     return response(message="更新用户失败", code=500)
+                # 告警邮箱随服务器身份缓存，用户信息变更后整体失效
+                server_cache.clear()
+                response_cache.invalidate(metadata=True)
 
             user_data = dict(user)
             return response(data=user_data, message="用户更新成功")
@@ -116,6 +121,8 @@ class UserManagement(Resource):
             username = user.username
             if not user.delete():
                 return response(message="删除用户失败", code=500)
+            server_cache.clear()
+            response_cache.invalidate(metadata=True)
 
             return response(message="用户删除成功")
 
@@ -0,0 +1,37 @@
+# 监控数据汇总表回填脚本
+# 用原始数据重算 1m/5m/1h 汇总表（已存在的时间桶直接覆盖），用于上线汇总表前的历史数据或修复汇总数据
+# 按小时分块处理，每块一个事务，不会长时间锁表
+# 用法: python scripts/backfill_rollups.py [--days 7] 或 [--start "2026-10-01 00:00" --end "2026-10-08 00:00"]
+import os
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+
+# 将项目根目录添加到搜索路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='回填监控数据汇总表')
+    parser.add_argument('--days', type=int, default=7, help='回填最近N天（未指定 --start 时使用）')
+    parser.add_argument('--start', help='起始时间，格式 YYYY-MM-DD HH:MM')
+    parser.add_argument('--end', help='结束时间（不含），默认当前时间')
+    args = parser.parse_args()
+
+    end = datetime.strptime(args.end, '%Y-%m-%d %H:%M') if args.end else datetime.now()
+    start = datetime.strptime(args.start, '%Y-%m-%d %H:%M') if args.start else end - timedelta(days=args.days)
+
+    from app import create_app
+    from model.rollup import rebuild_rollups
+
+    app = create_app()
+    with app.app_context():
+        print(f"回填汇总表: {start} ~ {end}")
+        begin = time.perf_counter()
+        rows = rebuild_rollups(start, end)
+        print(f"回填完成: 处理原始数据 {rows} 行，耗时 {time.perf_counter() - begin:.1f}秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# 历史数据读取路径对比基准
+# 对比 ORM 路径（构造 MonitorData 对象 -> dict() -> 逐字段转 float，即原接口的处理方式）
+# 与 Core select 快速路径（MonitorData.get_history_rows）的每秒行数，均包含 JSON 序列化
+# 需要连接真实数据库且使用逐行存储（METRICS_BACKEND=rdbms）；默认选取最近 hours 小时内数据最多的服务器
+# 用法: python scripts/bench_read_path.py [--server-id 1] [--hours 24] [--repeat 5]
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timedelta
+
+# 将项目根目录添加到搜索路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def orm_path(server_id, hours):
+    from model import MonitorData
+
+    data_list = []
+    for item in MonitorData.get_history_by_server_id(server_id, hours):
+        item_dict = dict(item)
+        for field in ['cpu_value', 'memory_value', 'disk_value']:
+            if field in item_dict and item_dict[field] is not None:
+                item_dict[field] = float(item_dict[field])
+        data_list.append(item_dict)
+    return data_list
+
+
+def core_path(server_id, hours):
+    from model import MonitorData
+
+    return MonitorData.get_history_rows(server_id, hours)
+
+
+def bench(func, server_id, hours, repeat):
+    from model import db
+
+    best_query, best_total, rows = None, None, 0
+    for _ in range(repeat):
+        # 每轮清空会话，避免ORM路径直接命中身份映射中已加载的对象
+        db.session.expunge_all()
+        start = time.perf_counter()
+        data_list = func(server_id, hours)
+        queried = time.perf_counter()
+        json.dumps(data_list, ensure_ascii=False, default=str)
+        done = time.perf_counter()
+        rows = len(data_list)
+        best_query = min(best_query or float('inf'), queried - start)
+        best_total = min(best_total or float('inf'), done - start)
+        db.session.rollback()
+    return rows, best_query, best_total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='历史数据读取路径对比基准')
+    parser.add_argument('--server-id', type=int, help='服务器ID，默认选取数据最多的服务器')
+    parser.add_argument('--hours', type=int, default=24, help='查询最近N小时')
+    parser.add_argument('--repeat', type=int, default=5, help='每种路径重复次数（取最好成绩）')
+    args = parser.parse_args()
+
+    from app import create_app
+    from model import db, MonitorData
+    from config.setting import METRICS_BACKEND
+
+    if METRICS_BACKEND == 'chunks':
+        print("ORM路径只适用于逐行存储（METRICS_BACKEND=rdbms），压缩数据块模式无法对比")
+        return
+
+    app = create_app()
+    with app.app_context():
+        server_id = args.server_id
+        if server_id is None:
+            start_time = datetime.now() - timedelta(hours=args.hours)
+            server_id = db.session.execute(
+                db.select(MonitorData.server_id)
+                .where(MonitorData.recorded_at >= start_time)
+                .group_by(MonitorData.server_id)
+                .order_by(db.func.count().desc())
+                .limit(1)
+            ).scalar()
+            if server_id is None:
+                print(f"最近 {args.hours} 小时没有监控数据")
+                return
+
+        print(f"服务器 {server_id}，最近 {args.hours} 小时，重复 {args.repeat} 次取最好成绩")
+        print(f"{'路径':<8}{'行数':>8}{'查询ms':>10}{'含序列化ms':>14}{'行/秒':>12}")
+        baseline = None
+        for name, func in (('orm', orm_path), ('core', core_path)):
+            rows, query_seconds, total_seconds = bench(func, server_id, args.hours, args.repeat)
+            rate = rows / total_seconds if total_seconds else 0
+            baseline = baseline or rate
+            speedup = f"  x{rate / baseline:.2f}" if baseline else ""
+            print(f"{name:<8}{rows:>8}{query_seconds * 1000:>10.1f}{total_seconds * 1000:>14.1f}{rate:>12.0f}{speedup}")
+
+
+if __name__ == "__main__":
+    main()
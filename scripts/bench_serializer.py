@@ -0,0 +1,104 @@
+# JSON序列化基准
+# 每 rows 行监控数据的序列化耗时，分两种场景：
+# 1. ORM结果（datetime、Decimal）：原方式逐字段 str()/float() 转换（即 dict(MonitorData) 的处理）后经 flask_restful
+#    默认的标准库 json 编码；新方式由 lib/serializer.py 直接序列化
+# 2. Core快速读取路径的结果（时间已在SQL中格式化、百分比已是float）：标准库 json 与 lib/serializer.py 对比
+# lib/serializer.py 同时测 orjson 与标准库回退实现；不连接数据库
+# 用法: python scripts/bench_serializer.py [行数] [重复次数]
+import os
+import sys
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# 将项目根目录添加到搜索路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib import serializer
+
+
+def make_rows(count):
+    """模拟 monitor_data 的ORM查询结果：时间为 datetime，指标值为 Decimal"""
+    start = datetime.now().replace(microsecond=0) - timedelta(seconds=count * 30)
+    return [{
+        'id': i + 1,
+        'server_id': i % 20 + 1,
+        'ip_address': f'192.168.10.{i % 20 + 1}',
+        'cpu_value': Decimal(f'{random.uniform(0, 100):.2f}'),
+        'memory_value': Decimal(f'{random.uniform(0, 100):.2f}'),
+        'disk_value': Decimal(f'{random.uniform(0, 100):.2f}'),
+        'extra_metrics': {'load1': round(random.uniform(0, 4), 2)} if i % 4 == 0 else None,
+        'recorded_at': start + timedelta(seconds=i * 30)
+    } for i in range(count)]
+
+
+#逐字段转换，与 dict(MonitorData) 的输出相同（也是 Core 快速读取路径直接得到的结果）
+def convert(rows):
+    data_list = []
+    for row in rows:
+        item = dict(row)
+        item['recorded_at'] = str(item['recorded_at'])
+        for field in ['cpu_value', 'memory_value', 'disk_value']:
+            item[field] = float(item[field])
+        data_list.append(item)
+    return data_list
+
+
+def payload(data_list):
+    return {'code': 0, 'msg': '获取监控数据成功', 'data': data_list}
+
+
+#flask_restful 默认的 output_json：标准库 json.dumps + 换行
+def restful_dumps(data):
+    return (json.dumps(data) + '\n').encode('utf-8')
+
+
+def bench(func, repeat):
+    best = float('inf')
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = len(func())
+        best = min(best, time.perf_counter() - start)
+    return best, size
+
+
+def report(title, cases, count, repeat):
+    print(title)
+    baseline = None
+    for name, func in cases:
+        seconds, size = bench(func, repeat)
+        baseline = baseline or seconds
+        print(f"  {name:<34}{seconds * 1000:>10.2f}{seconds * 1000 * 10000 / count:>12.2f}{size:>12}"
+              f"  x{baseline / seconds:.1f}")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    rows = make_rows(count)
+    converted = convert(rows)
+
+    # 各方式输出的数据必须一致
+    expected = json.loads(restful_dumps(payload(converted)))
+    assert json.loads(serializer.dumps(payload(rows))) == expected
+    assert json.loads(serializer.stdlib_dumps(payload(rows))) == expected
+
+    print(f"{count} 行，重复 {repeat} 次取最好成绩，serializer 当前实现: {serializer.BACKEND}")
+    print(f"  {'方式':<32}{'耗时ms':>10}{'每万行ms':>12}{'字节':>12}")
+    report('ORM结果（datetime / Decimal）', [
+        ('原方式: 逐字段转换 + 标准库json', lambda: restful_dumps(payload(convert(rows)))),
+        ('serializer(标准库回退)', lambda: serializer.stdlib_dumps(payload(rows))),
+        (f'serializer({serializer.BACKEND})', lambda: serializer.dumps(payload(rows))),
+    ], count, repeat)
+    report('Core快速读取路径结果（str / float）', [
+        ('原方式: 标准库json', lambda: restful_dumps(payload(converted))),
+        ('serializer(标准库回退)', lambda: serializer.stdlib_dumps(payload(converted))),
+        (f'serializer({serializer.BACKEND})', lambda: serializer.dumps(payload(converted))),
+    ], count, repeat)
+
+
+if __name__ == "__main__":
+    main()
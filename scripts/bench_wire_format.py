@@ -0,0 +1,71 @@
+# 上报编码格式对比基准
+# 对比 json / msgpack / packed 三种编码在不同压缩方式下的每条样本字节数与编解码耗时
+# 用法: python scripts/bench_wire_format.py [每批样本数] [重复次数]
+import os
+import sys
+import random
+import time
+
+# 将项目根目录添加到搜索路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.codec import decode_body
+from scripts.monitor_client import encode_body, msgpack, zstandard
+
+
+def make_records(count, ip_address='192.168.10.21', interval=30):
+    """模拟Agent缓冲的一段连续样本"""
+    now = int(time.time()) - count * interval
+    cpu, memory, disk = 35.0, 60.0, 70.0
+    records = []
+    for i in range(count):
+        cpu = min(100.0, max(0.0, cpu + random.uniform(-5, 5)))
+        memory = min(100.0, max(0.0, memory + random.uniform(-1, 1)))
+        disk = min(100.0, disk + random.uniform(0, 0.01))
+        records.append({
+            'server': ip_address,
+            'timestamp': now + i * interval,
+            'metrics': {'cpu': round(cpu, 2), 'memory': round(memory, 2), 'disk': round(disk, 2)}
+        })
+    return records
+
+
+def bench(records, wire_format, compression, repeat):
+    body = {'records': records}
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        data, headers = encode_body(body, wire_format, compression)
+    encode_seconds = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        decode_body(data, headers.get('Content-Type'), headers.get('Content-Encoding'))
+    decode_seconds = (time.perf_counter() - start) / repeat
+
+    count = len(records)
+    return len(data) / count, encode_seconds / count * 1e6, decode_seconds / count * 1e6
+
+
+def main():
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 120
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    records = make_records(batch_size)
+
+    formats = ['json', 'packed'] + (['msgpack'] if msgpack else [])
+    compressions = [None, 'gzip'] + (['zstd'] if zstandard else [])
+
+    print(f"每批 {batch_size} 条样本，重复 {repeat} 次")
+    print(f"{'格式':<10}{'压缩':<8}{'字节/条':>10}{'编码us/条':>12}{'解码us/条':>12}")
+    baseline = None
+    for wire_format in formats:
+        for compression in compressions:
+            size, encode_us, decode_us = bench(records, wire_format, compression, repeat)
+            if baseline is None:
+                baseline = size
+            print(f"{wire_format:<10}{compression or '-':<8}{size:>10.1f}{encode_us:>12.2f}{decode_us:>12.2f}"
+                  f"   ({baseline / size:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
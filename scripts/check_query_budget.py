@@ -0,0 +1,105 @@
+# 接口SQL条数检查脚本
+# 在内存SQLite中分别造 10 / 100 / 1000 台服务器（带分组、关联用户、最新监控数据），调用列表接口并统计SQL条数，
+# 检查：1. 条数不随服务器数量增长（无N+1查询）；2. 不超过接口 @query_budget 声明的预算
+# 不连接业务数据库，可在CI中运行；任一检查失败时退出码为1
+# 用法: python scripts/check_query_budget.py [服务器数量,逗号分隔]
+import os
+import sys
+from datetime import datetime
+
+# 内存SQLite中没有 monitor_data 表，无法读取数据版本号；关闭响应缓存，统计的SQL条数不含版本号查询（每个TTL周期至多1条）
+os.environ.setdefault('RESPONSE_CACHE_ENABLED', 'false')
+
+# 将项目根目录添加到搜索路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def build_app():
+    """与 create_app 相同的路由与JWT配置，数据库换成内存SQLite"""
+    from flask import Flask
+    from flask_jwt_extended import JWTManager
+    from model import db
+    import router
+
+    app = Flask(__name__)
+    app.config.from_object('config.setting')
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['JWT_SECRET_KEY'] = 'query-budget-check-jwt-secret-key-0001'
+    db.init_app(app)
+    JWTManager(app)
+    router.init_app(app)
+    return app
+
+
+def seed(target):
+    """把服务器补足到 target 台，每台属于一个分组、关联2个用户并有一条最新数据"""
+    from model import db, User, Server, ServerGroup, ServerLatestMetrics
+
+    groups = ServerGroup.query.order_by(ServerGroup.id).all()
+    users = User.query.filter_by(role='user').order_by(User.id).all()
+    for index in range(Server.query.count(), target):
+        server = Server(server_name=f'server-{index}', ip_address=f'10.{index // 65536}.{index // 256 % 256}.{index % 256}',
+                        group_id=groups[index % len(groups)].id)
+        server.users.extend([users[index % len(users)], users[(index + 1) % len(users)]])
+        db.session.add(server)
+        db.session.flush()
+        db.session.add(ServerLatestMetrics(server_id=server.id, ip_address=server.ip_address, cpu_value=12.5,
+                                           memory_value=40.25, disk_value=70.0, recorded_at=datetime.now()))
+    db.session.commit()
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1].split(',')] if len(sys.argv) > 1 else [10, 100, 1000]
+
+    from flask_jwt_extended import create_access_token
+    from model import db, User, ServerGroup
+    from lib.query_budget import QueryCounter
+    from router.server import ServerManagement
+    from router.monitor import MonitorStats
+
+    endpoints = [
+        ('/api/servers', ServerManagement.get.query_budget),
+        ('/api/servers/1', ServerManagement.get.query_budget),
+        ('/api/monitor/stats', MonitorStats.get.query_budget),
+        ('/api/monitor/stats?server_id=1', MonitorStats.get.query_budget),
+    ]
+
+    app = build_app()
+    with app.app_context():
+        # monitor_data 的 (id自增, recorded_at) 复合主键SQLite不支持，列表接口也不读取该表
+        db.metadata.create_all(db.engine, tables=[table for table in db.metadata.sorted_tables
+                                                  if table.name != 'monitor_data'])
+        admin = User(username='admin', password='-', email='admin@example.com', role='admin')
+        db.session.add(admin)
+        db.session.add_all([ServerGroup(name=f'group-{i}') for i in range(10)])
+        db.session.add_all([User(username=f'user-{i}', password='-', email=f'user-{i}@example.com') for i in range(50)])
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {create_access_token(identity=str(admin.id))}'}
+
+        counts = {path: [] for path, _ in endpoints}
+        client = app.test_client()
+        for size in sizes:
+            seed(size)
+            for path, budget in endpoints:
+                db.session.remove()
+                with QueryCounter() as counter:
+                    result = client.get(path, headers=headers).get_json()
+                # 超出预算且开启 QUERY_BUDGET_STRICT 时接口返回500，由下面的预算检查报告
+                if result.get('code') != 0 and counter.count <= budget:
+                    print(f"{path} 请求失败: {result}")
+                    return 1
+                counts[path].append(counter.count)
+
+    failed = False
+    print(f"{'接口':<34}{'预算':>6}  " + ''.join(f"{f'{size}台':>10}" for size in sizes))
+    for path, budget in endpoints:
+        stable = len(set(counts[path])) == 1
+        within = max(counts[path]) <= budget
+        status = 'OK' if stable and within else ('随服务器数量增长' if not stable else '超出预算')
+        failed = failed or status != 'OK'
+        print(f"{path:<34}{budget:>6}  " + ''.join(f"{count:>10}" for count in counts[path]) + f"  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -1,33 +1,77 @@
 # 监控数据自动清理脚本
-# 删除7天前的旧数据，避免数据库过大
+# 按分级保留策略清理过期数据：原始数据、1m/5m/1h汇总、告警历史、审计日志（保留天数见 config/setting.py）
+# 原始数据已分区时整分区删除，其余按主键范围分批删除并在批之间休眠，不会长时间阻塞上报写入
+# 用法: python scripts/cleanup_data.py [--only raw,alert_history] [--batch-size 5000] [--sleep-ms 100] [--dry-run]
 import os
 import sys
+import argparse
 
 # 将项目根目录添加到搜索路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def cleanup_old_data(days=7):
+def cleanup_old_data(only=None, batch_size=None, sleep_ms=None, dry_run=False):
     try:
         # 导入数据库模型
-        from model import MonitorData
+        from model import db
         from app import create_app
+        from lib.retention import RetentionEngine, DEFAULT_POLICIES
+        from config.setting import RETENTION_BATCH_SIZE, RETENTION_SLEEP_MS
 
         # 创建Flask应用上下文
         app = create_app()
 
         with app.app_context():
+            policies = [policy for policy in DEFAULT_POLICIES if not only or policy.name in only]
+            engine = RetentionEngine(
+                db.session,
+                batch_size=batch_size or RETENTION_BATCH_SIZE,
+                sleep_ms=RETENTION_SLEEP_MS if sleep_ms is None else sleep_ms,
+                dry_run=dry_run
+            )
             # 执行数据清理
-            MonitorData.delete_old_data(days=days)
-            return True
+            report = engine.run(policies)
+            print_report(report, dry_run)
+            return not any(result.get('error') for result in report['policies'])
 
     except Exception as e:
+        print(f"数据清理失败: {e}")
         return False
 
 
+def print_report(report, dry_run=False):
+    prefix = "[dry-run] " if dry_run else ""
+    for result in report['policies']:
+        if result.get('skipped'):
+            print(f"{prefix}{result['name']:<14} 跳过（{result['skipped']}）")
+            continue
+        line = (f"{prefix}{result['name']:<14} 保留{result['days']}天  删除 {result['rows']} 行  "
+                f"{result['batches']} 批  耗时 {result['elapsed_ms']}ms  最慢一批 {result['max_batch_ms']}ms  "
+                f"锁超时 {result['lock_timeouts']} 次")
+        if result.get('partitions') is not None:
+            line += f"  删除分区 {', '.join(result['partitions']) or '无'}"
+        if result.get('error'):
+            line += f"  错误: {result['error']}"
+        print(line)
+
+    if report['row_lock_wait_ms'] is None:
+        lock_wait = '未知'
+    else:
+        lock_wait = f"{report['row_lock_wait_ms']}ms / {report['row_lock_waits']}次"
+    print(f"{prefix}总耗时 {report['elapsed_ms']}ms，期间InnoDB行锁等待(全库) {lock_wait}")
+
+
 def main():
+    parser = argparse.ArgumentParser(description='按分级保留策略清理过期数据')
+    parser.add_argument('--only', help='只执行指定策略，逗号分隔：raw,rollup_1m,rollup_5m,rollup_1h,alert_history,audit_logs')
+    parser.add_argument('--batch-size', type=int, help='单批删除的最大行数')
+    parser.add_argument('--sleep-ms', type=int, help='批之间的休眠时间（毫秒）')
+    parser.add_argument('--dry-run', action='store_true', help='只统计将要删除的范围，不实际删除')
+    args = parser.parse_args()
+
     try:
         # 执行数据清理
-        success = cleanup_old_data(days=7)
+        only = [name.strip() for name in args.only.split(',')] if args.only else None
+        success = cleanup_old_data(only, args.batch_size, args.sleep_ms, args.dry_run)
         if success:
             exit(0)  # 数据清理成功，正常退出
         else:
@@ -38,4 +82,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,429 @@
+# 上报接口压测工具
+# 模拟大量Agent按固定间隔上报监控数据，评估一套部署能承载多少Agent
+# 请求头与真实Agent一致（X-App-ID / X-Timestamp / X-Sign），签名直接复用 lib/api_auth.py 的 generate_signature，走真实鉴权路径
+# 输出：接收速率、p50/p99延迟、4xx/5xx比例、发送滞后，以及从发送到数据落库的端到端耗时
+# 用法示例:
+#   python scripts/load_generator.py --agents 2000 --interval 30 --duration 300 --setup
+#   python scripts/load_generator.py --agents 5000 --mode batch --batch-size 10 --no-persist
+# 说明：
+# - 模拟的服务器IP为 {ip-prefix}.x.y，需已在系统中登记；--setup 会自动登记缺失的服务器（名称前缀 loadgen-），--cleanup 结束后删除
+# - 落库耗时通过应用上下文直接轮询数据库得到，需在能连上同一数据库的环境中运行，否则使用 --no-persist
+import os
+import sys
+import argparse
+import heapq
+import json
+import queue
+import random
+import secrets
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 将项目根目录添加到搜索路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.api_auth import generate_signature, SIGN_METHOD_HMAC, SIGN_METHOD_LEGACY
+
+
+def agent_ip(prefix, index):
+    """第 index 个模拟Agent的IP，每个 /24 网段放250台"""
+    return f"{prefix}.{index // 250}.{index % 250 + 1}"
+
+
+class MetricModel:
+    """
+    单个Agent的指标生成模型：每台服务器有各自的基准负载，在基准附近随机游走，偶尔出现尖峰
+    distribution: uniform（基准在10~90之间均匀分布）/ normal（基准集中在mean附近）
+    """
+
+    def __init__(self, distribution='normal', mean=40.0, stddev=15.0, spike_rate=0.01):
+        if distribution == 'uniform':
+            base = lambda: random.uniform(10, 90)
+        else:
+            base = lambda: min(95.0, max(1.0, random.gauss(mean, stddev)))
+        self.levels = {'cpu': base(), 'memory': base(), 'disk': base()}
+        self.spike_rate = spike_rate
+
+    def sample(self):
+        metrics = {}
+        for key, level in self.levels.items():
+            step = 0.2 if key == 'disk' else 3.0
+            level = min(99.0, max(0.5, level + random.uniform(-step, step)))
+            self.levels[key] = level
+            value = level
+            if key == 'cpu' and random.random() < self.spike_rate:
+                value = random.uniform(90, 100)
+            metrics[key] = round(value, 2)
+        return metrics
+
+
+class LoadStats:
+    """压测统计，所有发送线程共享"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.statuses = Counter()      # 按结果分类计数：2xx / 4xx / 5xx / error
+        self.latencies = []            # 请求耗时（毫秒）
+        self.lags = []                 # 计划发送时间到实际发送时间的滞后（毫秒），反映压测端自身是否跟得上
+        self.accepted_samples = 0
+        self.sent_samples = 0
+        self.persist_ms = []           # 发送到落库的耗时（毫秒）
+        self.persist_pending = 0
+
+    def record(self, status_class, latency_ms, lag_ms, samples, accepted):
+        with self._lock:
+            self.statuses[status_class] += 1
+            self.latencies.append(latency_ms)
+            self.lags.append(lag_ms)
+            self.sent_samples += samples
+            self.accepted_samples += accepted
+
+    def snapshot(self, reset=False):
+        with self._lock:
+            data = {
+                'statuses': dict(self.statuses),
+                'latencies': self.latencies,
+                'lags': self.lags,
+                'sent_samples': self.sent_samples,
+                'accepted_samples': self.accepted_samples
+            }
+            if reset:
+                self.statuses = Counter()
+                self.latencies = []
+                self.lags = []
+                self.sent_samples = 0
+                self.accepted_samples = 0
+            return data
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[index]
+
+
+def classify(response):
+    """
+    按结果分类：接口鉴权失败等错误以 HTTP 200 + 响应体 code 返回，因此优先看响应体中的 code
+    """
+    status = response.status_code
+    if status == 200:
+        try:
+            status = int(response.json().get('code') or 200)
+        except (ValueError, AttributeError):
+            pass
+    if 200 <= status < 300 or status == 0:
+        return '2xx'
+    if 400 <= status < 500:
+        return '4xx'
+    return '5xx'
+
+
+class LoadGenerator:
+    def __init__(self, args):
+        self.args = args
+        self.stats = LoadStats()
+        self.models = [MetricModel(args.distribution, args.mean, args.stddev, args.spike_rate)
+                       for _ in range(args.agents)]
+        self.ips = [agent_ip(args.ip_prefix, i) for i in range(args.agents)]
+        self.tasks = queue.Queue(maxsize=args.workers * 4)
+        self.running = True
+        self.sending_done = threading.Event()   # 所有发送线程已退出，不会再产生新的探针
+        self._local = threading.local()
+
+        # 落库探针：(服务器IP, 样本时间) 列表，由轮询线程确认落库
+        self.probes = []
+        self.probe_lock = threading.Lock()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._local.session = session
+        return session
+
+    def _headers(self):
+        timestamp = str(int(time.time()))
+        nonce = secrets.token_hex(16)
+        return {
+            'Content-Type': 'application/json',
+            'X-App-ID': self.args.app_id,
+            'X-Timestamp': timestamp,
+            'X-Nonce': nonce,
+            'X-Sign-Method': self.args.sign_method,
+            'X-Sign': generate_signature(self.args.app_id, self.args.secret_key, timestamp, nonce, self.args.sign_method)
+        }
+
+    def _send(self, agent_indexes, scheduled_at):
+        send_wall = time.time()
+        lag_ms = max(0.0, (time.monotonic() - scheduled_at) * 1000)
+        timestamp = int(send_wall)
+
+        if self.args.mode == 'batch':
+            # 模拟离线补传：一个请求携带多台服务器各 batch-size 条样本
+            records = []
+            for index in agent_indexes:
+                for offset in range(self.args.batch_size - 1, -1, -1):
+                    records.append({
+                        'server': self.ips[index],
+                        'timestamp': timestamp - offset * self.args.interval,
+                        'metrics': self.models[index].sample()
+                    })
+            path, body = '/monitor/data/batch', {'records': records}
+        else:
+            index = agent_indexes[0]
+            records = [None]
+            path, body = '/monitor/data', {'ip_address': self.ips[index], 'metrics': self.models[index].sample()}
+
+        start = time.perf_counter()
+        try:
+            response = self._session().post(f"{self.args.url}{path}", data=json.dumps(body),
+                                            headers=self._headers(), timeout=self.args.timeout)
+            latency_ms = (time.perf_counter() - start) * 1000
+            status_class = classify(response)
+        except requests.RequestException:
+            latency_ms = (time.perf_counter() - start) * 1000
+            status_class = 'error'
+
+        accepted = 0
+        if status_class == '2xx':
+            if self.args.mode == 'batch':
+                accepted = response.json().get('data', {}).get('accepted', 0)
+            else:
+                accepted = 1
+            # 按采样率挑选请求作为落库探针，记录该请求中最新的样本
+            if self.args.persist and random.random() < self.args.probe_rate:
+                with self.probe_lock:
+                    self.probes.append((self.ips[agent_indexes[-1]], timestamp, send_wall))
+
+        self.stats.record(status_class, latency_ms, lag_ms, len(records), accepted)
+
+    def _worker(self):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                return
+            try:
+                self._send(*task)
+            except Exception as e:
+                print(f"发送异常: {e}")
+
+    def _scheduler(self, deadline):
+        """按各Agent的间隔（随机初始相位）把发送任务放入队列；batch模式下每次合并 agents-per-request 台Agent"""
+        group = self.args.agents_per_request if self.args.mode == 'batch' else 1
+        groups = [list(range(i, min(i + group, self.args.agents))) for i in range(0, self.args.agents, group)]
+        now = time.monotonic()
+        heap = [(now + random.uniform(0, self.args.interval), i) for i in range(len(groups))]
+        heapq.heapify(heap)
+
+        while self.running and heap:
+            due, group_index = heap[0]
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            if due > now:
+                time.sleep(min(due - now, 0.05))
+                continue
+            heapq.heapreplace(heap, (due + self.args.interval, group_index))
+            # 队列满说明发送线程跟不上，阻塞在这里，滞后会体现在 lag 统计中
+            self.tasks.put((groups[group_index], due))
+
+    def _persist_poller(self, app):
+        """轮询数据库，确认探针样本已落库，记录端到端耗时（精度为轮询间隔）"""
+        from model import db, MonitorData, Server
+
+        with app.app_context():
+            ip_to_id = {}
+            while not self.sending_done.is_set() or self.probes:
+                time.sleep(self.args.poll_interval)
+                with self.probe_lock:
+                    pending, self.probes = self.probes, []
+                if not pending:
+                    continue
+
+                missing = [ip for ip in {probe[0] for probe in pending} if ip not in ip_to_id]
+                if missing:
+                    for server in Server.query.filter(Server.ip_address.in_(missing)).all():
+                        ip_to_id[server.ip_address] = server.id
+
+                # 一次查询取各服务器已落库的最新时间，不低于探针样本时间即视为已落库
+                server_ids = [ip_to_id[ip] for ip in {probe[0] for probe in pending} if ip in ip_to_id]
+                latest = dict(db.session.query(
+                    MonitorData.server_id, db.func.max(MonitorData.recorded_at)
+                ).filter(MonitorData.server_id.in_(server_ids)).group_by(MonitorData.server_id).all())
+                db.session.rollback()  # 结束只读事务，下次轮询读取最新数据
+
+                now_wall = time.time()
+                remaining = []
+                for ip_address, timestamp, send_wall in pending:
+                    recorded = latest.get(ip_to_id.get(ip_address))
+                    if recorded and recorded >= datetime.fromtimestamp(timestamp):
+                        self.stats.persist_ms.append((now_wall - send_wall) * 1000)
+                    elif now_wall - send_wall < self.args.persist_timeout:
+                        remaining.append((ip_address, timestamp, send_wall))
+                with self.probe_lock:
+                    self.probes.extend(remaining)
+                    self.stats.persist_pending = len(self.probes)
+                if self.sending_done.is_set() and not remaining:
+                    return
+
+    def report(self, data, elapsed, title):
+        statuses = data['statuses']
+        requests_total = sum(statuses.values()) or 1
+        latencies, lags = data['latencies'], data['lags']
+        persist = self.stats.persist_ms
+        print(f"[{title}] 请求 {sum(statuses.values())} ({requests_total / elapsed:.1f}/s)  "
+              f"接收样本 {data['accepted_samples']}/{data['sent_samples']} ({data['accepted_samples'] / elapsed:.1f}/s)  "
+              f"4xx {statuses.get('4xx', 0) / requests_total:.2%}  5xx {statuses.get('5xx', 0) / requests_total:.2%}  "
+              f"错误 {statuses.get('error', 0) / requests_total:.2%}")
+        print(f"    延迟 p50 {percentile(latencies, 50):.1f}ms  p99 {percentile(latencies, 99):.1f}ms  "
+              f"发送滞后 p99 {percentile(lags, 99):.1f}ms")
+        if self.args.persist:
+            print(f"    落库耗时 p50 {percentile(persist, 50):.0f}ms  p99 {percentile(persist, 99):.0f}ms  "
+                  f"已确认 {len(persist)}  待确认 {self.stats.persist_pending}")
+
+    def run(self, app=None):
+        args = self.args
+        print(f"模拟 {args.agents} 个Agent，间隔 {args.interval}秒，模式 {args.mode}，"
+              f"预计 {args.agents / args.interval:.1f} 请求/秒，持续 {args.duration}秒")
+
+        workers = [threading.Thread(target=self._worker, daemon=True) for _ in range(args.workers)]
+        for worker in workers:
+            worker.start()
+        poller = None
+        if app is not None:
+            poller = threading.Thread(target=self._persist_poller, args=(app,), daemon=True)
+            poller.start()
+
+        start = time.monotonic()
+        deadline = start + args.duration
+        scheduler = threading.Thread(target=self._scheduler, args=(deadline,), daemon=True)
+        scheduler.start()
+
+        total = {'statuses': Counter(), 'latencies': [], 'lags': [], 'sent_samples': 0, 'accepted_samples': 0}
+        last = start
+        try:
+            while scheduler.is_alive():
+                scheduler.join(args.report_interval)
+                now = time.monotonic()
+                data = self.stats.snapshot(reset=True)
+                self.report(data, now - last, f"{now - start:.0f}s")
+                last = now
+                total['statuses'].update(data['statuses'])
+                for key in ('latencies', 'lags'):
+                    total[key].extend(data[key])
+                for key in ('sent_samples', 'accepted_samples'):
+                    total[key] += data[key]
+        except KeyboardInterrupt:
+            print("收到停止信号，等待已发出的请求完成...")
+        finally:
+            self.running = False
+
+        for _ in workers:
+            self.tasks.put(None)
+        for worker in workers:
+            worker.join()
+        self.sending_done.set()
+        data = self.stats.snapshot(reset=True)
+        total['statuses'].update(data['statuses'])
+        for key in ('latencies', 'lags'):
+            total[key].extend(data[key])
+        for key in ('sent_samples', 'accepted_samples'):
+            total[key] += data[key]
+        elapsed = time.monotonic() - start
+
+        if poller is not None:
+            print("等待落库确认...")
+            poller.join(args.persist_timeout)
+        self.report(total, elapsed, "汇总")
+
+
+def setup_servers(app, ips):
+    """登记缺失的模拟服务器"""
+    from model import db, Server
+
+    with app.app_context():
+        existing = {server.ip_address for server in Server.query.filter(Server.ip_address.in_(ips)).all()}
+        missing = [ip for ip in ips if ip not in existing]
+        for ip_address in missing:
+            db.session.add(Server(server_name=f"loadgen-{ip_address}", ip_address=ip_address,
+                                  description='压测模拟服务器'))
+        db.session.commit()
+        print(f"已登记 {len(missing)} 台模拟服务器（已存在 {len(existing)} 台）")
+
+
+def cleanup_servers(app, ips):
+    """删除模拟服务器及其监控数据"""
+    from model import Server
+
+    with app.app_context():
+        servers = Server.query.filter(Server.ip_address.in_(ips), Server.server_name.like('loadgen-%')).all()
+        for server in servers:
+            Server.delete(server.id)
+        print(f"已删除 {len(servers)} 台模拟服务器")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='监控上报接口压测工具')
+    parser.add_argument('--url', default='http://127.0.0.1:5000/api', help='服务端API地址')
+    parser.add_argument('--app-id', default='default_client')
+    parser.add_argument('--secret-key', default='sk_default_123456')
+    parser.add_argument('--sign-method', choices=[SIGN_METHOD_HMAC, SIGN_METHOD_LEGACY], default=SIGN_METHOD_HMAC,
+                        help='签名方式，与真实Agent一致默认使用 hmac-sha256')
+    parser.add_argument('--agents', type=int, default=1000, help='模拟的Agent数量')
+    parser.add_argument('--interval', type=float, default=30, help='每个Agent的上报间隔（秒）')
+    parser.add_argument('--duration', type=float, default=120, help='压测时长（秒）')
+    parser.add_argument('--workers', type=int, default=64, help='并发发送线程数')
+    parser.add_argument('--timeout', type=float, default=10, help='单次请求超时（秒）')
+    parser.add_argument('--mode', choices=['single', 'batch'], default='single',
+                        help='single: 每台单条上报 /monitor/data；batch: 批量上报 /monitor/data/batch')
+    parser.add_argument('--batch-size', type=int, default=1, help='batch模式下每台Agent每次携带的样本数')
+    parser.add_argument('--agents-per-request', type=int, default=1, help='batch模式下每个请求合并的Agent数')
+    parser.add_argument('--ip-prefix', default='10.250', help='模拟服务器IP前缀（前两段）')
+    parser.add_argument('--distribution', choices=['normal', 'uniform'], default='normal', help='各服务器基准负载分布')
+    parser.add_argument('--mean', type=float, default=40.0, help='normal分布的均值')
+    parser.add_argument('--stddev', type=float, default=15.0, help='normal分布的标准差')
+    parser.add_argument('--spike-rate', type=float, default=0.01, help='CPU尖峰（>90%%）出现概率，用于触发告警链路')
+    parser.add_argument('--report-interval', type=float, default=5, help='阶段统计输出间隔（秒）')
+    parser.add_argument('--no-persist', dest='persist', action='store_false', help='不统计落库耗时（不连接数据库）')
+    parser.add_argument('--probe-rate', type=float, default=0.05, help='作为落库探针的请求比例')
+    parser.add_argument('--poll-interval', type=float, default=0.2, help='落库轮询间隔（秒）')
+    parser.add_argument('--persist-timeout', type=float, default=60, help='超过该时间仍未落库的探针视为丢失（秒）')
+    parser.add_argument('--setup', action='store_true', help='压测前登记缺失的模拟服务器')
+    parser.add_argument('--cleanup', action='store_true', help='压测后删除模拟服务器及其监控数据')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    args.url = args.url.rstrip('/')
+    if args.mode == 'single':
+        args.batch_size = args.agents_per_request = 1
+
+    app = None
+    if args.persist or args.setup or args.cleanup:
+        from app import create_app
+        app = create_app()
+
+    generator = LoadGenerator(args)
+    if args.setup:
+        setup_servers(app, generator.ips)
+    try:
+        generator.run(app if args.persist else None)
+    finally:
+        if args.cleanup:
+            cleanup_servers(app, generator.ips)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# monitor_data 分区维护脚本
+# 预建未来N天的日分区，删除超出保留期的分区（整分区删除，不锁表、不产生大事务）
+# 建议每天执行一次，例如 crontab: 10 0 * * * python /app/scripts/maintain_partitions.py
+# 用法: python scripts/maintain_partitions.py [--retention-days 7] [--days-ahead 7] [--dry-run]
+import os
+import sys
+import argparse
+
+# 将项目根目录添加到搜索路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    from config.setting import MONITOR_RETENTION_DAYS, PARTITION_DAYS_AHEAD
+
+    parser = argparse.ArgumentParser(description='monitor_data 分区维护')
+    parser.add_argument('--retention-days', type=int, default=MONITOR_RETENTION_DAYS, help='数据保留天数')
+    parser.add_argument('--days-ahead', type=int, default=PARTITION_DAYS_AHEAD, help='预建未来分区的天数')
+    parser.add_argument('--dry-run', action='store_true', help='只打印将执行的操作')
+    args = parser.parse_args()
+
+    from model import db
+    from app import create_app
+    from lib.partition import is_partitioned, maintain, list_partitions
+
+    app = create_app()
+    with app.app_context():
+        if not is_partitioned(db.session):
+            print("monitor_data 未分区，请先执行数据库迁移（flask db upgrade）")
+            exit(1)
+
+        result = maintain(db.session, args.retention_days, args.days_ahead, dry_run=args.dry_run)
+        prefix = "[dry-run] " if args.dry_run else ""
+        print(f"{prefix}新建分区: {', '.join(result['created']) or '无'}")
+        print(f"{prefix}删除分区: {', '.join(f'{name}(约{rows}行)' for name, rows in result['dropped']) or '无'}")
+
+        partitions = list_partitions(db.session)
+        print(f"当前分区 {len(partitions)} 个: {partitions[0][0]} ~ {partitions[-1][0]}")
+    exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,21 +4,508 @@
 
 import psutil
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import sys
 import os
 import socket
 import hashlib
+import hmac
+import secrets
+import json
+import struct
+import gzip
+import random
+import threading
+from collections import deque
+
+try:
+    import msgpack
+except ImportError:  # 未安装时只能使用 json / packed 格式
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # 未安装时不支持 zstd 压缩
+    zstandard = None
+
+# ==================== 上报编码 ====================
+# 与服务端 lib/codec.py 保持一致
+# 紧凑定长格式（application/x-monitor-packed）：每帧对应一台服务器的一段连续样本
+# 帧头: | b'MP' | 版本 uint8 | IP长度 uint8 | IP | 基准时间戳 uint32 | 样本数 uint16 |
+# 样本: | 时间增量 uint16 | CPU uint16 | 内存 uint16 | 磁盘 uint16 |（指标以百分之一为单位）
+PACKED_FRAME_HEAD = struct.Struct('<2sBB')
+PACKED_FRAME_META = struct.Struct('<IH')
+PACKED_SAMPLE = struct.Struct('<HHHH')
+PACKED_MAX_DELTA = 0xFFFF
+PACKED_MAX_COUNT = 0xFFFF
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'msgpack': 'application/msgpack',
+    'packed': 'application/x-monitor-packed'
+}
+
+
+def _packed_value(metrics, key):
+    value = metrics.get(key, 0.0) or 0.0
+    return max(0, min(0xFFFF, int(round(float(value) * 100))))
+
+
+def encode_packed(records):
+    """
+    把批量记录 [{"server": ip, "timestamp": ts, "metrics": {...}}, ...] 编码为紧凑定长格式
+    同一服务器的连续记录放在同一帧，时间倒退、间隔超过uint16或条数超限时另起一帧
+    """
+    frames = []
+    frame_ip, base_ts, last_ts, samples = None, None, None, []
+
+    def close_frame():
+        if samples:
+            ip_bytes = frame_ip.encode('ascii')
+            frames.append(PACKED_FRAME_HEAD.pack(b'MP', 1, len(ip_bytes)) + ip_bytes
+                          + PACKED_FRAME_META.pack(base_ts, len(samples)) + b''.join(samples))
+
+    for record in records:
+        ip_address = record['server']
+        timestamp = int(record['timestamp'])
+        metrics = record['metrics']
+        if (ip_address != frame_ip or timestamp < last_ts or timestamp - last_ts > PACKED_MAX_DELTA
+                or len(samples) >= PACKED_MAX_COUNT):
+            close_frame()
+            frame_ip, base_ts, last_ts, samples = ip_address, timestamp, timestamp, []
+        samples.append(PACKED_SAMPLE.pack(
+            timestamp - last_ts,
+            _packed_value(metrics, 'cpu'),
+            _packed_value(metrics, 'memory'),
+            _packed_value(metrics, 'disk')
+        ))
+        last_ts = timestamp
+    close_frame()
+    return b''.join(frames)
+
+
+def encode_body(body, wire_format='json', compression=None):
+    """按上报格式与压缩方式编码请求体，返回 (字节串, 额外请求头)"""
+    if wire_format == 'packed':
+        data = encode_packed(body['records'])
+    elif wire_format == 'msgpack':
+        if msgpack is None:
+            raise RuntimeError('未安装msgpack，无法使用msgpack格式')
+        data = msgpack.packb(body, use_bin_type=True)
+    else:
+        data = json.dumps(body, separators=(',', ':')).encode('utf-8')
+
+    headers = {'Content-Type': CONTENT_TYPES.get(wire_format, CONTENT_TYPES['json'])}
+    if compression == 'gzip':
+        data = gzip.compress(data, compresslevel=6)
+        headers['Content-Encoding'] = 'gzip'
+    elif compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('未安装zstandard，无法使用zstd压缩')
+        data = zstandard.ZstdCompressor(level=3).compress(data)
+        headers['Content-Encoding'] = 'zstd'
+    return data, headers
+
+
+class SampleBuffer:
+    """
+    待发送样本的有界环形缓冲区
+    服务端不可达时样本（带原始采集时间戳）暂存在这里，恢复后分批补传；
+    超过容量时丢弃最旧的样本。指定 path 时变更以追加方式写入本地日志文件，Agent重启后重放日志继续补传：
+    - 新样本追加一行JSON，发送成功后追加一行 "#discard N"，不再每次整体重写文件
+    - 缓冲清空时截断文件；日志行数超过容量的两倍时按当前缓冲内容重写一次（压缩）
+    """
+
+    DISCARD_PREFIX = '#discard '
+
+    def __init__(self, maxlen=2880, path=None):
+        self.path = path
+        self._records = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self._journal = None        # 追加写入的日志文件
+        self._journal_lines = 0     # 日志文件当前行数
+        self.compact_lines = 2 * maxlen
+        self.dropped = 0
+        self._load()
+
+    def _load(self):
+        if not self.path:
+            return
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        line = line.strip()
+                        if line.startswith(self.DISCARD_PREFIX):
+                            for _ in range(min(int(line[len(self.DISCARD_PREFIX):]), len(self._records))):
+                                self._records.popleft()
+                        elif line:
+                            self._records.append(json.loads(line))
+                print(f"从缓冲文件恢复 {len(self._records)} 条未发送样本")
+            except Exception as e:
+                print(f"读取缓冲文件失败: {e}")
+        # 启动时按恢复的内容重写一次，之后只追加
+        self._compact()
+
+    def _write(self, line):
+        """追加一行到日志文件，行数过多时压缩"""
+        if not self.path:
+            return
+        try:
+            if self._journal is None:
+                self._journal = open(self.path, 'a', encoding='utf-8')
+            self._journal.write(line + '\n')
+            self._journal.flush()
+            self._journal_lines += 1
+        except Exception as e:
+            print(f"写入缓冲文件失败: {e}")
+            return
+        if self._journal_lines > self.compact_lines:
+            self._compact()
+
+    def _compact(self):
+        """按当前缓冲内容重写日志文件（写临时文件后原子替换）"""
+        if not self.path:
+            return
+        try:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                for record in self._records:
+                    f.write(json.dumps(record, separators=(',', ':')) + '\n')
+            os.replace(tmp, self.path)
+            self._journal_lines = len(self._records)
+        except Exception as e:
+            print(f"写入缓冲文件失败: {e}")
+
+    def append(self, record):
+        with self._lock:
+            if len(self._records) == self._records.maxlen:
+                self.dropped += 1
+            self._records.append(record)
+            self._write(json.dumps(record, separators=(',', ':')))
+
+    def peek(self, count):
+        """取出最旧的 count 条样本（不移除）"""
+        with self._lock:
+            return [self._records[i] for i in range(min(count, len(self._records)))]
+
+    def discard(self, count):
+        """移除最旧的 count 条样本（发送成功后调用）"""
+        with self._lock:
+            count = min(count, len(self._records))
+            for _ in range(count):
+                self._records.popleft()
+            if not self._records:
+                self._compact()
+            elif count:
+                self._write(f"{self.DISCARD_PREFIX}{count}")
+
+    def __len__(self):
+        return len(self._records)
+
+
+# ==================== 采集插件 ====================
+# 每个采集器独立配置采集间隔 interval（秒，None 表示跟随Agent采集周期）与单次耗时预算 budget_ms；
+# 单次采集耗时超过预算时自动把该采集器的间隔加倍（最多放大到 max_throttle 倍），耗时回落到预算一半以下后逐步恢复。
+# 自定义采集器：继承 Collector 实现 collect()，返回 {指标名: 数值/列表/字典}，再用 @register_collector 注册；
+# cpu/memory/disk 以外的指标由服务端存入 monitor_data.extra_metrics，无需为每个指标改表。
+COLLECTORS = {}
+
+# 默认启用的采集器，可通过环境变量 MONITOR_COLLECTORS（逗号分隔）调整
+DEFAULT_COLLECTORS = ('cpu', 'memory', 'disk', 'load', 'percpu', 'filesystems', 'netio', 'diskio', 'agent')
+
+
+def register_collector(cls):
+    """注册采集器类，同名时后注册的覆盖先注册的"""
+    COLLECTORS[cls.name] = cls
+    return cls
+
+
+class Collector:
+    name = None
+    interval = None     # 采集间隔（秒），None 表示每个周期都采集
+    budget_ms = 20.0    # 单次采集耗时预算（毫秒）
+    max_throttle = 8    # 超出预算时采集间隔最多放大的倍数
+
+    def setup(self):
+        """首次采集前调用，用于建立差值类指标的基准"""
+
+    def collect(self):
+        raise NotImplementedError
+
+
+class RateCollector(Collector):
+    """累计计数器类指标的基类：两次采集的差值除以时间间隔得到速率"""
+
+    def setup(self):
+        self._last = self.read_counters()
+        self._last_time = time.monotonic()
+
+    def read_counters(self):
+        """返回 {指标名: 累计值}，不支持时返回None"""
+        raise NotImplementedError
+
+    def collect(self):
+        counters = self.read_counters()
+        now = time.monotonic()
+        last, elapsed = self._last, now - self._last_time
+        self._last, self._last_time = counters, now
+        if not counters or not last or elapsed <= 0:
+            return {}
+        # 计数器回绕或网卡/磁盘重置时差值为负，此时跳过一个周期
+        return {key: round((value - last[key]) / elapsed, 2)
+                for key, value in counters.items() if key in last and value >= last[key]}
+
+
+@register_collector
+class CpuCollector(Collector):
+    name = 'cpu'
+    budget_ms = 5.0
+
+    def setup(self):
+        # 以非阻塞方式计算CPU使用率：先取一次基准，之后每次返回距上次调用的增量
+        psutil.cpu_percent(interval=None)
+
+    def collect(self):
+        return {'cpu': round(psutil.cpu_percent(interval=None), 2)}
+
+
+@register_collector
+class MemoryCollector(Collector):
+    name = 'memory'
+    budget_ms = 5.0
+
+    def collect(self):
+        return {'memory': round(psutil.virtual_memory().percent, 2)}
+
+
+@register_collector
+class DiskCollector(Collector):
+    """根分区使用率（告警与趋势图使用的磁盘指标）"""
+    name = 'disk'
+    budget_ms = 10.0
+
+    def collect(self):
+        path = 'C:\\' if os.name == 'nt' else '/'
+        disk = psutil.disk_usage(path)
+        return {'disk': round((disk.used / disk.total) * 100, 2)}
+
+
+@register_collector
+class LoadAvgCollector(Collector):
+    name = 'load'
+    budget_ms = 5.0
+
+    def collect(self):
+        load1, load5, load15 = psutil.getloadavg()
+        return {'load1': round(load1, 2), 'load5': round(load5, 2), 'load15': round(load15, 2)}
+
+
+@register_collector
+class PerCpuCollector(Collector):
+    name = 'percpu'
+    budget_ms = 10.0
+
+    def setup(self):
+        psutil.cpu_percent(interval=None, percpu=True)
+
+    def collect(self):
+        return {'cpu_per_core': [round(value, 1) for value in psutil.cpu_percent(interval=None, percpu=True)]}
+
+
+@register_collector
+class FilesystemCollector(Collector):
+    """所有已挂载文件系统的使用率，变化缓慢且网络文件系统可能较慢，默认5分钟采集一次"""
+    name = 'filesystems'
+    interval = 300
+    budget_ms = 50.0
+
+    def collect(self):
+        usage = {}
+        for partition in psutil.disk_partitions(all=False):
+            try:
+                disk = psutil.disk_usage(partition.mountpoint)
+            except (OSError, PermissionError):
+                continue
+            if disk.total:
+                usage[partition.mountpoint] = round(disk.used / disk.total * 100, 2)
+        return {'filesystems': usage}
+
+
+@register_collector
+class NetIOCollector(RateCollector):
+    name = 'netio'
+    budget_ms = 10.0
+
+    def read_counters(self):
+        counters = psutil.net_io_counters()
+        if counters is None:
+            return None
+        return {'net_rx_bps': counters.bytes_recv, 'net_tx_bps': counters.bytes_sent}
+
+
+@register_collector
+class DiskIOCollector(RateCollector):
+    name = 'diskio'
+    budget_ms = 10.0
+
+    def read_counters(self):
+        counters = psutil.disk_io_counters()
+        if counters is None:
+            return None
+        return {
+            'disk_read_bps': counters.read_bytes,
+            'disk_write_bps': counters.write_bytes,
+            'disk_read_iops': counters.read_count,
+            'disk_write_iops': counters.write_count
+        }
+
+
+@register_collector
+class AgentCollector(Collector):
+    """Agent进程自身的资源占用，使用 oneshot() 让多个进程指标共用一次 /proc 读取"""
+    name = 'agent'
+    budget_ms = 5.0
+
+    def setup(self):
+        self._process = psutil.Process()
+
+    def collect(self):
+        with self._process.oneshot():
+            memory = self._process.memory_info()
+            return {
+                'agent_rss_mb': round(memory.rss / 1024 / 1024, 2),
+                'agent_threads': self._process.num_threads()
+            }
+
+
+class CollectorRunner:
+    """
+    按各自的间隔调度采集器，记录每次耗时并自动降频
+    间隔按Agent采集周期取整：interval=300、周期30秒时每10个周期采集一次
+    """
+
+    def __init__(self, collectors, cycle_interval):
+        self.cycle_interval = cycle_interval
+        self._states = []
+        for collector in collectors:
+            try:
+                collector.setup()
+            except Exception as e:
+                print(f"采集器 {collector.name} 初始化失败，已禁用: {e}")
+                continue
+            every = max(1, int(round((collector.interval or cycle_interval) / cycle_interval)))
+            self._states.append({
+                'collector': collector,
+                'base_every': every,   # 配置的采集间隔（周期数）
+                'every': every,        # 当前实际采集间隔（周期数），超预算时放大
+                'countdown': 0,        # 距下次采集还需的周期数
+                'last_ms': None,
+                'errors': 0
+            })
+
+    def collect(self):
+        """执行本周期到期的采集器，合并返回全部指标"""
+        metrics = {}
+        for state in self._states:
+            if state['countdown'] > 0:
+                state['countdown'] -= 1
+                continue
+
+            collector = state['collector']
+            start = time.perf_counter()
+            try:
+                values = collector.collect()
+            except Exception as e:
+                state['errors'] += 1
+                print(f"采集器 {collector.name} 采集失败: {e}")
+                values = None
+            cost_ms = (time.perf_counter() - start) * 1000
+            state['last_ms'] = round(cost_ms, 2)
+            self._throttle(state, cost_ms)
+            state['countdown'] = state['every'] - 1
+
+            if values:
+                metrics.update(values)
+        return metrics
+
+    def _throttle(self, state, cost_ms):
+        collector = state['collector']
+        every = state['every']
+        if cost_ms > collector.budget_ms:
+            every = min(state['base_every'] * collector.max_throttle, every * 2)
+        elif cost_ms < collector.budget_ms / 2 and every > state['base_every']:
+            every = max(state['base_every'], every // 2)
+        if every != state['every']:
+            print(f"采集器 {collector.name} 耗时 {cost_ms:.1f}ms（预算 {collector.budget_ms}ms），"
+                  f"采集间隔调整为 {every * self.cycle_interval}秒")
+            state['every'] = every
+
+    def stats(self):
+        return {
+            state['collector'].name: {
+                'interval': state['every'] * self.cycle_interval,
+                'throttled': state['every'] > state['base_every'],
+                'last_ms': state['last_ms'],
+                'errors': state['errors']
+            }
+            for state in self._states
+        }
+
+
+def build_collectors(names=None):
+    """按名称创建采集器实例，未知名称忽略并提示"""
+    collectors = []
+    for name in names or DEFAULT_COLLECTORS:
+        cls = COLLECTORS.get(name)
+        if cls is None:
+            print(f"未知的采集器: {name}")
+            continue
+        collectors.append(cls())
+    return collectors
+
 
 class MonitorClient:
-    def __init__(self, api_url, app_id=None, secret_key=None, collect_interval=30, ip_address=None):
+    def __init__(self, api_url, app_id=None, secret_key=None, collect_interval=30, ip_address=None,
+                 wire_format='json', compression=None, buffer_size=2880, buffer_file=None,
+                 batch_size=200, max_backoff=600, collectors=None):
         self.api_url = api_url.rstrip('/')
         self.app_id = app_id
         self.secret_key = secret_key
         self.collect_interval = collect_interval
         self.ip_address = ip_address or self._get_local_ip()
+        self.wire_format = wire_format      # 上报格式：json / msgpack / packed
+        self.compression = compression      # 压缩方式：None / gzip / zstd
         self.running = False
 
+        # 离线缓冲与补传：发送失败的样本保留在缓冲区，按指数退避（带随机抖动）分批补传
+        self.buffer = SampleBuffer(buffer_size, buffer_file)
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self._failures = 0           # 连续发送失败次数
+        self._next_attempt = 0.0     # 下次允许发送的时间（单调时钟）
+        self._retry_after = None     # 服务端 503 响应中建议的重试间隔
+
+        # 复用同一个长连接会话，避免每次上报都重新建立TCP/TLS连接
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # 采集器：collectors 为采集器名称列表或 Collector 实例列表，缺省使用 DEFAULT_COLLECTORS
+        if collectors and all(isinstance(item, Collector) for item in collectors):
+            self.collectors = CollectorRunner(collectors, collect_interval)
+        else:
+            self.collectors = CollectorRunner(build_collectors(collectors), collect_interval)
+
+        # Agent自身开销：上一周期的耗时与CPU时间，随下一次样本一起上报
+        self.last_cycle_ms = None
+        self.last_cycle_cpu_ms = None
+
         print(f"服务器IP: {self.ip_address}")
         # self._test_connection()
 
@@ -33,22 +520,19 @@ class MonitorClient:
             return "127.0.0.1"
     
     # 生成签名 Sign
-    def _generate_sign(self, timestamp):
-        """生成签名: sha256(appid + secret_key + timestamp)"""
+    def _generate_sign(self, timestamp, nonce):
+        """生成签名: hmac_sha256(secret_key, appid + "\n" + timestamp + "\n" + nonce)，与服务端 lib/api_auth.py 一致"""
         if not self.app_id or not self.secret_key:
             return ""
-        
-        # 拼接原始字符串
-        raw_str = f"{self.app_id}{self.secret_key}{timestamp}"
-        
-        # 计算SHA256
-        return hashlib.sha256(raw_str.encode('utf-8')).hexdigest()
+
+        message = f"{self.app_id}\n{timestamp}\n{nonce}"
+        return hmac.new(self.secret_key.encode('utf-8'), message.encode('utf-8'), hashlib.sha256).hexdigest()
 
     def _test_connection(self):
         try:
             # 简单的联通性测试，不带鉴权
             base_url = self.api_url.replace('/api', '')
-            response = requests.get(f"{base_url}", timeout=5) # 访问根路径通常不需要鉴权
+            response = self.session.get(f"{base_url}", timeout=5) # 访问根路径通常不需要鉴权
             if response.status_code == 200:
                 print("API服务连通性检查：成功")
             else:
@@ -57,102 +541,150 @@ class MonitorClient:
             print(f"API服务连接失败: {e}")
             # sys.exit(1) # 不强制退出，允许重试
 
-    def collect_cpu(self):
-        try:
-            return round(psutil.cpu_percent(interval=1), 2)
-        except:
-            return None
-
-    def collect_memory(self):
-        try:
-            return round(psutil.virtual_memory().percent, 2)
-        except:
-            return None
-
-    def collect_disk(self):
-        try:
-            path = 'C:\\' if os.name == 'nt' else '/'
-            disk = psutil.disk_usage(path)
-            return round((disk.used / disk.total) * 100, 2)
-        except:
-            return None
-
     def send_data(self, metrics):
         if not metrics:
             return False
 
+        # 紧凑定长格式只能走批量接口
+        if self.wire_format == 'packed':
+            return self.send_batch([{
+                "server": self.ip_address,
+                "timestamp": int(time.time()),
+                "metrics": metrics
+            }])
+
         data = {
             "metrics": metrics,
             "ip_address": self.ip_address
         }
+        result = self._post("/monitor/data", data)
+        if result is None:
+            return False
+        print(f"数据发送成功: {list(metrics.keys())}")
+        return True
 
+    def send_batch(self, records):
+        """批量上报，records 为 [{"server": ip, "timestamp": ts, "metrics": {...}}, ...]"""
+        if not records:
+            return False
+
+        result = self._post("/monitor/data/batch", {"records": records})
+        if result is None:
+            return False
+        print(f"批量数据发送成功: {result.get('data', {}).get('accepted', 0)}/{len(records)}条")
+        return True
+
+    def _post(self, path, body):
+        """签名并按配置的格式编码后提交，成功返回响应JSON，失败返回None"""
         try:
             timestamp = str(int(time.time()))
-            sign = self._generate_sign(timestamp)
-            
-            headers = {
-                'Content-Type': 'application/json',
+            # 每个请求使用唯一的nonce，服务端在签名有效期内拒绝重复的nonce（防重放）
+            nonce = secrets.token_hex(16)
+            sign = self._generate_sign(timestamp, nonce)
+
+            payload, headers = encode_body(body, self.wire_format, self.compression)
+            headers.update({
                 'X-App-ID': self.app_id,
                 'X-Timestamp': timestamp,
+                'X-Nonce': nonce,
+                'X-Sign-Method': 'hmac-sha256',
                 'X-Sign': sign
-            }
+            })
 
-            response = requests.post(
-                f"{self.api_url}/monitor/data",
-                json=data,
+            response = self.session.post(
+                f"{self.api_url}{path}",
+                data=payload,
                 headers=headers,
                 timeout=10
             )
 
+            self._retry_after = None
             if response.status_code == 200:
                 result = response.json()
                 if result.get('code') == 0:
-                    print(f"数据发送成功: {list(metrics.keys())}")
-                    return True
+                    return result
                 else:
-                    print(f"数据发送失败: {result.get('message')}")
-                    return False
+                    print(f"数据发送失败: {result.get('msg')}")
+                    return None
             else:
+                if response.status_code in (429, 503) and response.headers.get('Retry-After', '').isdigit():
+                    self._retry_after = int(response.headers['Retry-After'])
                 print(f"数据发送失败: HTTP {response.status_code}")
-                return False
+                return None
         except Exception as e:
             print(f"数据发送异常: {e}")
-            return False
-
-    def collect_and_send(self):
-        metrics = {}
+            return None
 
-        cpu_value = self.collect_cpu()
-        if cpu_value is not None:
-            metrics["cpu"] = cpu_value
+    def flush_buffer(self):
+        """
+        分批补传缓冲区中的样本，直到缓冲区为空或发送失败
+        失败后按 min(max_backoff, collect_interval * 2^失败次数) 计算退避上限，在 [0.5, 1] 倍之间随机抖动，
+        避免服务端恢复时所有Agent同时补传；服务端返回 Retry-After 时不早于该时间重试
+        """
+        if time.monotonic() < self._next_attempt:
+            return False
 
-        memory_value = self.collect_memory()
-        if memory_value is not None:
-            metrics["memory"] = memory_value
+        while len(self.buffer):
+            records = self.buffer.peek(self.batch_size)
+            if not self.send_batch(records):
+                self._failures += 1
+                backoff = min(self.max_backoff, self.collect_interval * (2 ** (self._failures - 1)))
+                delay = backoff * random.uniform(0.5, 1.0)
+                if self._retry_after:
+                    delay = max(delay, self._retry_after)
+                self._next_attempt = time.monotonic() + delay
+                print(f"发送失败，缓冲 {len(self.buffer)} 条样本，{delay:.0f}秒后重试")
+                return False
+            # 服务端已逐条处理（被拒绝的记录重发也无法成功），整批从缓冲区移除
+            self.buffer.discard(len(records))
+            self._failures = 0
+        return True
 
-        disk_value = self.collect_disk()
-        if disk_value is not None:
-            metrics["disk"] = disk_value
+    def collect_and_send(self):
+        # cpu/memory/disk 以外的指标随样本一起上报（紧凑定长格式只携带这三项）
+        metrics = self.collectors.collect()
 
         if metrics:
-            self.send_data(metrics)
+            # 附带Agent上一周期自身的开销
+            if self.last_cycle_ms is not None:
+                metrics["agent_cycle_ms"] = self.last_cycle_ms
+                metrics["agent_cpu_ms"] = self.last_cycle_cpu_ms
+
+            # 先进入缓冲区（保留采集时的时间戳），再尝试补传
+            self.buffer.append({
+                "server": self.ip_address,
+                "timestamp": int(time.time()),
+                "metrics": metrics
+            })
+            self.flush_buffer()
 
     def run(self):
         print(f"监控客户端启动 - 服务器IP: {self.ip_address}, 采集间隔: {self.collect_interval}秒")
         self.running = True
 
+        # 按单调时钟的固定节拍采集，不受系统时间调整和单次耗时影响；
+        # 启动时随机错开相位，避免同一宿主机上的大量Agent（如容器）同时采集、同时上报
+        next_run = time.monotonic() + random.uniform(0, self.collect_interval)
+
         try:
             while self.running:
-                start_time = time.time()
-                self.collect_and_send()
-
-                elapsed_time = time.time() - start_time
-                sleep_time = max(0, self.collect_interval - elapsed_time)
-
+                sleep_time = next_run - time.monotonic()
                 if sleep_time > 0:
                     time.sleep(sleep_time)
-                else:
-                    print("采集耗时超过间隔时间，立即进行下次采集")
+
+                wall_start = time.perf_counter()
+                cpu_start = time.process_time()
+                self.collect_and_send()
+                self.last_cycle_ms = round((time.perf_counter() - wall_start) * 1000, 2)
+                self.last_cycle_cpu_ms = round((time.process_time() - cpu_start) * 1000, 2)
+
+                next_run += self.collect_interval
+                now = time.monotonic()
+                if next_run <= now:
+                    # 耗时超过采集间隔时跳过错过的节拍，不连续补采
+                    skipped = int((now - next_run) // self.collect_interval) + 1
+                    next_run += skipped * self.collect_interval
+                    print(f"采集耗时超过间隔时间，跳过 {skipped} 个周期")
 
         except KeyboardInterrupt:
             print("收到停止信号，正在关闭监控客户端...")
@@ -160,15 +692,22 @@ class MonitorClient:
         except Exception as e:
             print(f"监控客户端运行异常: {e}")
             self.running = False
+        finally:
+            self.session.close()
 
 
 def main():
     API_URL = "http://127.0.0.1:5000/api"
-    # 鉴权配置 (必须与服务端 api_auth.py 中的 API_CREDENTIALS 一致)
+    # 鉴权配置 (必须与服务端 api_credentials 表中的凭证一致，可在凭证管理接口中创建/轮换)
     APP_ID = "default_client" 
     SECRET_KEY = "sk_default_123456"
     COLLECT_INTERVAL = 30
     IP_ADDRESS = None
+    WIRE_FORMAT = os.getenv('MONITOR_WIRE_FORMAT', 'json')     # json / msgpack / packed
+    COMPRESSION = os.getenv('MONITOR_COMPRESSION') or None     # gzip / zstd
+    BUFFER_SIZE = int(os.getenv('MONITOR_BUFFER_SIZE', '2880'))  # 离线缓冲条数，默认约1天（30秒间隔）
+    BUFFER_FILE = os.getenv('MONITOR_BUFFER_FILE') or None      # 离线缓冲持久化文件，不设置则仅保存在内存
+    COLLECTOR_NAMES = [name.strip() for name in os.getenv('MONITOR_COLLECTORS', '').split(',') if name.strip()] or None  # 启用的采集器
 
     # 支持命令行传参覆盖默认配置
     if len(sys.argv) > 1:
@@ -182,7 +721,9 @@ def main():
     print(f"服务端地址: {API_URL}")
     print(f"AppID: {APP_ID}")
 
-    client = MonitorClient(API_URL, APP_ID, SECRET_KEY, COLLECT_INTERVAL, IP_ADDRESS)
+    client = MonitorClient(API_URL, APP_ID, SECRET_KEY, COLLECT_INTERVAL, IP_ADDRESS,
+                           wire_format=WIRE_FORMAT, compression=COMPRESSION,
+                           buffer_size=BUFFER_SIZE, buffer_file=BUFFER_FILE, collectors=COLLECTOR_NAMES)
     client.run()
 
 
@@ -0,0 +1,53 @@
+# 历史数据读取测试：压缩数据块模式返回的字典与逐行存储的 Core 查询结构相同
+import os
+import sys
+from datetime import datetime, timedelta
+
+os.environ.setdefault('RESPONSE_CACHE_ENABLED', 'false')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'scripts'))
+
+import pytest
+import lib.chunk_store
+import model.monitor
+from check_query_budget import build_app
+from lib.chunk_store import ChunkStore, FileChunkBackend
+from model import db, Server, MonitorData
+
+# 逐行存储时 get_history_rows / iter_history_rows 的查询列
+ROW_KEYS = ['id', 'server_id', 'ip_address', 'cpu_value', 'memory_value', 'disk_value', 'extra_metrics', 'recorded_at']
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(model.monitor, 'METRICS_BACKEND', 'chunks')
+    monkeypatch.setattr(lib.chunk_store, '_chunk_store', ChunkStore(FileChunkBackend(str(tmp_path))))
+    app = build_app()
+    with app.app_context():
+        db.metadata.create_all(db.engine, tables=[table for table in db.metadata.sorted_tables
+                                                  if table.name != 'monitor_data'])
+        db.session.add(Server(server_name='web-1', ip_address='10.0.0.1'))
+        db.session.commit()
+        now = datetime.now().replace(microsecond=0)
+        lib.chunk_store.get_chunk_store().append([
+            {'server_id': 1, 'recorded_at': now - timedelta(seconds=30 * i),
+             'cpu_value': 10.5, 'memory_value': 20.25, 'disk_value': 30.0}
+            for i in range(5)
+        ])
+        yield app
+        db.session.remove()
+
+
+def test_chunk_history_rows_match_row_shape(app):
+    rows = MonitorData.get_history_rows(1, hours=1)
+    assert len(rows) == 5
+    assert all(list(row) == ROW_KEYS for row in rows)
+    assert rows[0]['ip_address'] == '10.0.0.1'
+    assert rows[0]['id'] is None and rows[0]['extra_metrics'] is None
+
+
+def test_chunk_stream_rows_match_history_rows(app):
+    streamed = list(MonitorData.iter_history_rows([1], datetime.now() - timedelta(hours=1)))
+    assert streamed == MonitorData.get_history_rows(1, hours=1)
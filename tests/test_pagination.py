@@ -0,0 +1,66 @@
+# 游标分页测试：逐页翻完审计日志，检查顺序、不重不漏，以及时间为 NULL 的行
+import os
+import sys
+from datetime import datetime, timedelta
+
+os.environ.setdefault('RESPONSE_CACHE_ENABLED', 'false')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'scripts'))
+
+import pytest
+from check_query_budget import build_app
+from lib.pagination import keyset_page
+from model import db, AuditLog
+
+
+@pytest.fixture
+def app():
+    app = build_app()
+    with app.app_context():
+        db.metadata.create_all(db.engine, tables=[AuditLog.__table__])
+        yield app
+        db.session.remove()
+
+
+def add_logs(times):
+    logs = [AuditLog(action='TEST', created_at=created_at) for created_at in times]
+    db.session.add_all(logs)
+    db.session.commit()
+    # created_at 为 None 时ORM会填入默认值，历史数据中的 NULL 直接写库
+    null_ids = [log.id for log, created_at in zip(logs, times) if created_at is None]
+    if null_ids:
+        db.session.execute(db.update(AuditLog).where(AuditLog.id.in_(null_ids)).values(created_at=None))
+        db.session.commit()
+
+
+def fetch_all(per_page):
+    ids, cursor = [], None
+    while True:
+        items, cursor = keyset_page(AuditLog.query, AuditLog.created_at, AuditLog.id, cursor, per_page)
+        ids.extend(item.id for item in items)
+        if cursor is None:
+            return ids
+
+
+def test_pages_cover_rows_in_order(app):
+    now = datetime(2024, 1, 1, 12, 0, 0)
+    # 存在相同时间的行，需按 id 继续排序
+    add_logs([now - timedelta(minutes=i // 2) for i in range(7)])
+
+    expected = [log.id for log in AuditLog.query.order_by(AuditLog.created_at.desc(), AuditLog.id.desc())]
+    assert fetch_all(per_page=3) == expected
+
+
+def test_null_timestamp_rows_are_skipped(app):
+    now = datetime(2024, 1, 1, 12, 0, 0)
+    add_logs([now, None, now - timedelta(minutes=1), None, now - timedelta(minutes=2)])
+    null_ids = [log.id for log in AuditLog.query.filter(AuditLog.created_at.is_(None))]
+    assert null_ids
+
+    # MySQL 倒序时 NULL 排在最后，任一页以 NULL 行结尾且还有下一页时都不能出错
+    for per_page in range(1, 6):
+        ids = fetch_all(per_page)
+        assert len(ids) == 3
+        assert not set(ids) & set(null_ids)
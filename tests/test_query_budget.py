@@ -0,0 +1,73 @@
+# 接口SQL条数测试
+# 在内存SQLite中分别造 1 台与 50 台服务器，调用声明了 @query_budget 的列表接口，
+# 检查SQL条数不随服务器数量变化（无N+1查询）且不超过声明的预算；环境与 scripts/check_query_budget.py 相同
+import os
+import sys
+
+os.environ.setdefault('RESPONSE_CACHE_ENABLED', 'false')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'scripts'))
+
+import pytest
+from flask_jwt_extended import create_access_token
+from check_query_budget import build_app, seed
+from lib.query_budget import QueryCounter
+from model import db, User, ServerGroup
+from router.server import ServerManagement
+from router.monitor import MonitorStats
+
+ENDPOINTS = [
+    ('/api/servers', ServerManagement.get.query_budget),
+    ('/api/servers/1', ServerManagement.get.query_budget),
+    ('/api/monitor/stats', MonitorStats.get.query_budget),
+    ('/api/monitor/stats?server_id=1', MonitorStats.get.query_budget),
+]
+
+
+@pytest.fixture
+def app():
+    app = build_app()
+    with app.app_context():
+        db.metadata.create_all(db.engine, tables=[table for table in db.metadata.sorted_tables
+                                                  if table.name != 'monitor_data'])
+        db.session.add(User(username='admin', password='-', email='admin@example.com', role='admin'))
+        db.session.add_all([ServerGroup(name=f'group-{i}') for i in range(5)])
+        db.session.add_all([User(username=f'user-{i}', password='-', email=f'user-{i}@example.com') for i in range(10)])
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+def count_queries(app, path):
+    admin = User.query.filter_by(username='admin').first()
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(admin.id))}'}
+    db.session.remove()
+    with QueryCounter() as counter:
+        result = app.test_client().get(path, headers=headers).get_json()
+    assert result['code'] == 0, result
+    return counter.count
+
+
+@pytest.mark.parametrize('path,budget', ENDPOINTS)
+def test_query_count_independent_of_server_count(app, path, budget):
+    seed(1)
+    single = count_queries(app, path)
+    seed(50)
+    many = count_queries(app, path)
+
+    assert single == many
+    assert many <= budget
+
+
+def test_overrun_is_logged(app, caplog):
+    from lib.query_budget import query_budget
+
+    @query_budget(0)
+    def list_groups():
+        return {'code': 0, 'data': len(ServerGroup.query.all())}
+
+    with app.test_request_context():
+        list_groups()
+    assert 'list_groups 执行了 1 条SQL，超出预算 0 条' in caplog.text
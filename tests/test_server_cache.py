@@ -0,0 +1,44 @@
+# 服务器身份缓存测试：字符串形式的ID与整数ID命中同一条缓存
+import os
+import sys
+
+os.environ.setdefault('RESPONSE_CACHE_ENABLED', 'false')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'scripts'))
+
+import pytest
+from check_query_budget import build_app
+from lib.server_cache import ServerIdentityCache
+from model import db, Server
+
+
+@pytest.fixture
+def app():
+    app = build_app()
+    with app.app_context():
+        db.metadata.create_all(db.engine, tables=[table for table in db.metadata.sorted_tables
+                                                  if table.name != 'monitor_data'])
+        db.session.add(Server(server_name='web-1', ip_address='10.0.0.1'))
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+def test_string_id_is_found_on_repeated_lookups(app):
+    cache = ServerIdentityCache()
+    first = cache.get_by_id('1')
+    second = cache.get_by_id('1')
+
+    assert first is not None and first.server_name == 'web-1'
+    assert second == first
+    assert cache.get_by_id(1) == first
+    assert cache.stats()['misses'] == 1
+
+
+def test_get_many_normalizes_ids(app):
+    cache = ServerIdentityCache()
+    by_id, _ = cache.get_many(server_ids=['1', 'abc'])
+    assert list(by_id) == [1]
+    assert cache.get_by_id('abc') is None